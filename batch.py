@@ -1,57 +1,104 @@
 import asyncio
-import numpy as np
-from typing import List, Dict, Any, TYPE_CHECKING
+import statistics
+from typing import List, Dict, Any, Iterable, AsyncIterable, AsyncIterator, Optional, Union, TYPE_CHECKING
+
+from config import BATCH_MAX_IN_FLIGHT
 
 if TYPE_CHECKING:
     from pdf_processor import PdfProcessor
 
+UrlSource = Union[Iterable[str], AsyncIterable[str]]
+
+async def _aiter_urls(urls: UrlSource) -> AsyncIterator[str]:
+    """Iterate plain and async iterables of URLs alike."""
+    if hasattr(urls, '__aiter__'):
+        async for url in urls:
+            yield url
+    else:
+        for url in urls:
+            yield url
+
+async def _next_or_none(source: AsyncIterator[str]) -> Optional[str]:
+    """The source's next URL, or None once it is exhausted."""
+    try:
+        return await source.__anext__()
+    except StopAsyncIteration:
+        return None
+
 class PdfBatch:
     """Handle batch processing of multiple PDFs."""
     
-    def __init__(self, processor: 'PdfProcessor'):
+    def __init__(self, processor: 'PdfProcessor', max_in_flight: Optional[int] = None):
         self.processor = processor
+        self.max_in_flight = max_in_flight or BATCH_MAX_IN_FLIGHT
         self.results: Dict[str, Any] = {}
         self.errors: Dict[str, str] = {}
     
-    async def process_stream(self, urls: List[str], word_or_phrase: str):
+    async def process_stream(self, urls: UrlSource, word_or_phrase: str):
         """
-        Process multiple URLs concurrently and yield results as they complete.
+        Process URLs with bounded concurrency and yield results as they complete.
         Returns an AsyncGenerator yielding (url, result, error_message).
+        
+        At most max_in_flight URLs are worked on at once (downloads and CPU jobs
+        are further bounded by the processor). `urls` may be a plain or async
+        iterable; the next URL is only requested while a slot is free, and that
+        request is awaited alongside the running work, so a slow source never
+        holds back finished results. At most one URL is read ahead of the
+        window, so memory stays flat regardless of the input length.
         """
-        tasks = []
-        # Create a mapping from task to URL to track which URL completed
-        task_to_url = {}
+        source = _aiter_urls(urls)
+        pending = set()
+        next_url: Optional[asyncio.Task] = None
+        exhausted = False
         
-        for url in urls:
-            # We wrap the internal call to return the URL with the result/error
-            task = asyncio.create_task(self._safe_process(url, word_or_phrase))
-            tasks.append(task)
-            task_to_url[task] = url
-            
-        for completed_task in asyncio.as_completed(tasks):
-            url, result, error = await completed_task
-            
-            if error:
-                self.errors[url] = error
-            else:
-                self.results[url] = result
+        try:
+            while True:
+                if next_url is None and not exhausted and len(pending) < self.max_in_flight:
+                    next_url = asyncio.create_task(_next_or_none(source))
                 
-            yield url, result, error
-
+                waiting = pending | {next_url} if next_url is not None else pending
+                if not waiting:
+                    break
+                
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                if next_url in done:
+                    done.discard(next_url)
+                    url = next_url.result()
+                    next_url = None
+                    if url is None:
+                        exhausted = True
+                    else:
+                        pending.add(asyncio.create_task(self._safe_process(url, word_or_phrase)))
+                
+                for completed_task in done:
+                    pending.discard(completed_task)
+                    yield completed_task.result()
+        finally:
+            # The consumer stopped early (or failed): do not leave work running
+            if next_url is not None:
+                pending.add(next_url)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await source.aclose()
+    
     async def _safe_process(self, url: str, word_or_phrase: str):
         try:
             result = await self.processor.process_url(url, word_or_phrase)
             return url, result, None
         except Exception as e:
             return url, None, str(e)
-
+    
     async def process_urls(self, urls: List[str], word_or_phrase: str) -> Dict[str, Any]:
         """
         Process multiple URLs concurrently (Legacy Method).
         WARNING: Accumulates all results in memory.
         """
-        async for _ in self.process_stream(urls, word_or_phrase):
-            pass # We just consume the stream to populate self.results/self.errors
+        async for url, result, error in self.process_stream(urls, word_or_phrase):
+            if error:
+                self.errors[url] = error
+            else:
+                self.results[url] = result
         
         return {
             'results': self.results,
@@ -68,7 +115,7 @@ class PdfBatch:
             'total_processed': len(self.results),
             'total_errors': len(self.errors),
             'success_rate': (len(self.results) / total_docs * 100) if total_docs > 0 else 0,
-            'average_processing_time': np.mean([
+            'average_processing_time': statistics.fmean([
                 result['statistics']['processing_time']
                 for result in self.results.values()
             ]) if self.results else 0,
@@ -1,6 +1,20 @@
+import hashlib
+import pickle
+import sqlite3
+import sys
+import threading
 import time
+import weakref
+import zlib
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Optional, Dict, Any
+from collections import OrderedDict
+from pathlib import Path
+from typing import Generic, TypeVar, Optional, Dict, Any, List
+
+from config import (
+    CACHE_SIZE, CACHE_MAX_BYTES, CACHE_SWEEP_INTERVAL, CACHE_STALE_TTL,
+    DISK_CACHE_TTL, DISK_CACHE_MAX_BYTES
+)
 
 # Type variables
 CacheKey = TypeVar('CacheKey')
@@ -23,25 +37,287 @@ class Cache(Generic[CacheKey, CacheValue], ABC):
     def invalidate(self, key: CacheKey) -> None:
         """Remove a value from cache."""
         pass
+    
+    def get_stale(self, key: CacheKey) -> Optional[CacheValue]:
+        """
+        Retrieve a value even if its TTL has expired, as long as the cache
+        still holds it. Used to revalidate expired entries with the origin.
+        """
+        return self.get(key)
+    
+    def close(self) -> None:
+        """Release resources held by the cache."""
+        pass
+
+def approximate_size(value: Any) -> int:
+    """Approximate the memory held by a (nested) result structure, in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item) for item in value)
+    return size
+
+def _sweep_periodically(cache_ref: "weakref.ref[SimpleMemoryCache]", stop: threading.Event, interval: float) -> None:
+    # Holds only a weak reference so an abandoned cache can still be collected
+    while not stop.wait(interval):
+        cache = cache_ref()
+        if cache is None:
+            return
+        cache.sweep()
+        del cache
 
 class SimpleMemoryCache(Cache[str, Any]):
-    """Simple in-memory cache implementation with TTL."""
+    """
+    In-memory LRU cache with TTL.
     
-    def __init__(self, ttl_seconds: int = 3600):
-        self._cache: Dict[str, tuple[Any, float]] = {}
+    Capped both by the number of distinct stored values and by their
+    approximate size; a value stored under several keys (e.g. a result under
+    its URL and its content hash) is counted once. The least recently used
+    entries are evicted first. Expired
+    entries are kept for stale_ttl_seconds so they can be revalidated
+    (see get_stale), then dropped when read or by a background sweep.
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_entries: int = CACHE_SIZE,
+        max_bytes: int = CACHE_MAX_BYTES,
+        sweep_interval: float = CACHE_SWEEP_INTERVAL,
+        stale_ttl_seconds: int = CACHE_STALE_TTL
+    ):
+        self._cache: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+        # id of each stored value -> [number of keys holding it, its size]
+        self._shared: Dict[int, List[int]] = {}
         self._ttl_seconds = ttl_seconds
+        self._stale_ttl_seconds = stale_ttl_seconds
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        self._stop_sweeping = threading.Event()
+        if sweep_interval:
+            threading.Thread(
+                target=_sweep_periodically,
+                args=(weakref.ref(self), self._stop_sweeping, sweep_interval),
+                name="SimpleMemoryCache-sweeper",
+                daemon=True
+            ).start()
     
     def get(self, key: str) -> Optional[Any]:
-        if key not in self._cache:
-            return None
-        value, timestamp = self._cache[key]
-        if time.time() - timestamp > self._ttl_seconds:
-            del self._cache[key]
-            return None
-        return value
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, timestamp = entry
+            age = time.time() - timestamp
+            if age > self._ttl_seconds:
+                if age > self._ttl_seconds + self._stale_ttl_seconds:
+                    self._remove(key)
+                    self.expirations += 1
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def get_stale(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or time.time() - entry[1] > self._ttl_seconds + self._stale_ttl_seconds:
+                return None
+            return entry[0]
     
     def put(self, key: str, value: Any) -> None:
-        self._cache[key] = (value, time.time())
+        size = approximate_size(value)
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+            self._cache[key] = (value, time.time())
+            share = self._shared.setdefault(id(value), [0, 0])
+            share[0] += 1
+            # A value stored again may have changed since: charge its current size
+            self._bytes += size - share[1]
+            share[1] = size
+            while self._cache and (len(self._shared) > self._max_entries or self._bytes > self._max_bytes):
+                self._remove(next(iter(self._cache)))
+                self.evictions += 1
     
     def invalidate(self, key: str) -> None:
-        self._cache.pop(key, None)
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+    
+    def sweep(self) -> int:
+        """Drop all entries past their stale window; returns how many were removed."""
+        cutoff = time.time() - self._ttl_seconds - self._stale_ttl_seconds
+        with self._lock:
+            expired = [key for key, (_, timestamp) in self._cache.items() if timestamp < cutoff]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and current occupancy."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._cache),
+                'values': len(self._shared),
+                'bytes': self._bytes
+            }
+    
+    def close(self) -> None:
+        """Stop the background sweep."""
+        self._stop_sweeping.set()
+    
+    def _remove(self, key: str) -> None:
+        value, _ = self._cache.pop(key)
+        share = self._shared[id(value)]
+        share[0] -= 1
+        if not share[0]:
+            del self._shared[id(value)]
+            self._bytes -= share[1]
+
+class SqliteCache(Cache[str, Any]):
+    """
+    Persistent cache stored in a SQLite database.
+    
+    Values are pickled and zlib-compressed, then stored once per distinct
+    payload (keyed by its SHA-256), so several keys for the same result -
+    e.g. a URL and the hash of the PDF bytes - share one blob. Entries expire
+    after ttl_seconds; once the blobs exceed max_bytes the least recently
+    used entries are evicted. Expired entries are kept for stale_ttl_seconds
+    so they can be revalidated (see get_stale).
+    """
+    
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed);
+        CREATE INDEX IF NOT EXISTS entries_digest ON entries(digest);
+        CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+        INSERT OR IGNORE INTO usage VALUES (0, 0);
+        CREATE TRIGGER IF NOT EXISTS blobs_added AFTER INSERT ON blobs
+            BEGIN UPDATE usage SET bytes = bytes + NEW.size; END;
+        CREATE TRIGGER IF NOT EXISTS blobs_removed AFTER DELETE ON blobs
+            BEGIN UPDATE usage SET bytes = bytes - OLD.size; END;
+    """
+    
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl_seconds: int = DISK_CACHE_TTL,
+        max_bytes: int = DISK_CACHE_MAX_BYTES,
+        stale_ttl_seconds: int = CACHE_STALE_TTL
+    ):
+        self.path = path or Path.home() / ".pdfprocessor" / "cache.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_seconds = ttl_seconds
+        self._max_bytes = max_bytes
+        self._stale_ttl_seconds = stale_ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        # WAL lets several worker processes share one cache file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+    
+    def get(self, key: str) -> Optional[Any]:
+        return self._read(key, allow_stale=False)
+    
+    def get_stale(self, key: str) -> Optional[Any]:
+        return self._read(key, allow_stale=True)
+    
+    def _read(self, key: str, allow_stale: bool) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.created, b.data FROM entries e JOIN blobs b ON b.digest = e.digest WHERE e.key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            created, data = row
+            now = time.time()
+            age = now - created
+            if age > self._ttl_seconds + self._stale_ttl_seconds:
+                self._delete_entries([key])
+                return None
+            if age > self._ttl_seconds and not allow_stale:
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(zlib.decompress(data))
+    
+    def put(self, key: str, value: Any) -> None:
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO blobs (digest, data, size) VALUES (?, ?, ?)",
+                    (digest, data, len(data))
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, digest, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, digest, now, now)
+                )
+                if previous and previous[0] != digest:
+                    self._drop_orphan(previous[0])
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._delete_entries([key])
+    
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def _delete_entries(self, keys: List[str]) -> None:
+        for key in keys:
+            row = self._conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._drop_orphan(row[0])
+    
+    def _drop_orphan(self, digest: str) -> None:
+        self._conn.execute(
+            "DELETE FROM blobs WHERE digest = ? AND NOT EXISTS (SELECT 1 FROM entries WHERE digest = ?)",
+            (digest, digest)
+        )
+    
+    def _evict(self) -> None:
+        """Drop least recently used entries until the stored blobs fit in max_bytes."""
+        while self._conn.execute("SELECT bytes FROM usage").fetchone()[0] > self._max_bytes:
+            row = self._conn.execute("SELECT key FROM entries ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._delete_entries([row[0]])
@@ -3,6 +3,87 @@ MAX_PDF_SIZE = 100 * 1024 * 1024  # 100MB
 DOWNLOAD_TIMEOUT = 30  # seconds
 MAX_RETRIES = 3
 BACKOFF_FACTOR = 2
-CACHE_SIZE = 100
-CHUNK_SIZE = 8192
+CACHE_SIZE = 100  # max distinct values (documents) in the in-memory cache
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # approximate size cap of the in-memory cache
+CACHE_SWEEP_INTERVAL = 60  # seconds between background expiry sweeps (0 disables)
+CACHE_STALE_TTL = 7 * 24 * 3600  # seconds expired entries are kept for revalidation
+DISK_CACHE_TTL = 30 * 24 * 3600  # seconds
+DISK_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1GB of compressed results
+CHUNK_SIZE = 8192  # bytes per streamed download read
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024  # larger downloads are spooled to disk
 ALLOWED_CONTENT_TYPES = {'application/pdf', 'application/x-pdf'}
+
+# Shared HTTP connection pool
+CONNECTION_LIMIT = 100  # total open connections
+CONNECTION_LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 30  # seconds an idle connection is kept for reuse
+
+# Concurrency limits
+MAX_CONCURRENT_DOWNLOADS = 16  # per processor
+BATCH_MAX_IN_FLIGHT = 64  # URLs a batch stream works on at once
+
+# Pool used for CPU-bound extraction/analysis: "thread" or "process"
+EXECUTOR_BACKEND = "thread"
+
+# How worker processes start: "fork", "spawn" or "forkserver" (None for the
+# platform default). A fork server loads the NLP models once (preload.py) and
+# forks each worker warm from it. The process pool is replaced once it has
+# been given WORKER_MAX_TASKS tasks per worker, to bound leaks, with any start
+# method (None keeps it).
+WORKER_START_METHOD = None
+WORKER_MAX_TASKS = None
+
+# Documents with at least this many pages are extracted page-parallel
+# across the process pool (0 disables the split)
+PAGE_PARALLEL_THRESHOLD = 500
+
+# Search ranking (BM25)
+BM25_K1 = 1.2  # term frequency saturation
+BM25_B = 0.75  # document length normalization
+
+# Persistent search index segments
+SEGMENT_FLUSH_DOCS = 10000  # buffered documents written as one segment
+SEGMENT_MERGE_FACTOR = 8  # merge the smallest segments once there are more than this
+
+# Sharded search engine
+SEARCH_SHARDS = 4  # hash partitions, one worker each
+SHARD_MAX_PENDING = 256  # unacknowledged add_document calls before add_document blocks
+BULK_BATCH_DOCS = 1000  # documents inverted and written together by add_documents
+BULK_PARALLEL_MIN_DOCS = 64  # smaller batches are inverted in-process; a tokenizing pool costs more than it saves
+
+# Search doc store: content and token offsets, zlib-compressed in blocks
+DOCSTORE_BLOCK_SIZE = 64 * 1024  # uncompressed bytes per block
+DOCSTORE_COMPRESSION_LEVEL = 6
+DOCSTORE_CACHE_BLOCKS = 32  # decompressed blocks kept per store for snippets
+
+# Word tokenization for text analysis: "regex" (one compiled pattern over the
+# whole text) or "nltk" (nltk.word_tokenize, sentence by sentence)
+TOKENIZER_MODE = "regex"
+
+# Keyword ranking: "tf" (term frequency within the document) or "idf"
+# (TF-IDF against a per-language corpus table updated as documents arrive)
+KEYWORD_MODE = "tf"
+KEYWORD_IDF_SAVE_DOCS = 1000  # documents between saves of a persisted IDF table
+KEYWORD_IDF_MAX_TERMS = 2_000_000  # table size beyond which single-document n-grams are pruned
+
+# Results carry the extracted text as full_text; when False, pages are
+# analyzed as they are extracted and the full text is never assembled
+KEEP_FULL_TEXT = True
+LANGUAGE_SAMPLE_CHARS = 10000  # leading characters language detection reads
+STREAM_MAX_CARRY = 1_000_000  # characters held without a sentence boundary before a forced cut
+# Streamed documents keep their text zlib-compressed in the cached record, so
+# any later phrase can be counted without another download; when False only
+# the phrases asked for while a document streams are counted
+KEEP_COMPRESSED_TEXT = False
+TEXT_SCAN_CHUNK = 64 * 1024  # bytes decompressed at a time when kept text is scanned for phrases
+
+# Language detection: a short probe is tried first and accepted at this
+# confidence; seeding makes langdetect's sampling deterministic
+LANGUAGE_DETECT_SEED = 0
+LANGUAGE_PROBE_CHARS = 1000
+LANGUAGE_CONFIDENCE = 0.999
+# Trust the PDF's declared /Lang, or a clear stopword majority, without running langdetect
+LANGUAGE_FAST_PATH = False
+LANGUAGE_STOPWORD_RATIO = 0.3  # share of probe words that must be the winner's stopwords
+LANGUAGE_STOPWORD_MIN_WORDS = 20
@@ -0,0 +1,149 @@
+"""
+Block-compressed document content for snippets.
+
+Only the top-k results of a search need their text, so each document's
+content is kept as a record (token start gaps as uint32, then the UTF-8
+content) packed with its neighbours into zlib-compressed blocks of about
+DOCSTORE_BLOCK_SIZE bytes. A lookup decompresses one block, and recently
+used blocks are cached. ContentStore holds the blocks of the in-memory
+index buffer; segments write the same blocks to disk.
+"""
+from array import array
+from functools import lru_cache
+from itertools import accumulate, chain
+from operator import sub
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+import zlib
+
+from config import DOCSTORE_BLOCK_SIZE, DOCSTORE_COMPRESSION_LEVEL, DOCSTORE_CACHE_BLOCKS
+from index import COMPACT_RATIO
+
+def utf8_offsets(content: str, starts: Sequence[int]) -> array:
+    """Convert ascending character offsets into byte offsets of content's UTF-8 encoding."""
+    if content.isascii():
+        return array('I', starts)
+    offsets = array('I')
+    position = byte = 0
+    for start in starts:
+        byte += len(content[position:start].encode())
+        position = start
+        offsets.append(byte)
+    return offsets
+
+def encode_record(content: bytes, token_starts: Sequence[int]) -> bytes:
+    """Pack UTF-8 content and its tokens' byte offsets into one record."""
+    gaps = array('I', map(sub, token_starts, chain((0,), token_starts)))
+    return gaps.tobytes() + content
+
+def decode_record(record: bytes, token_count: int) -> Tuple[bytes, array]:
+    """Unpack a record into (UTF-8 content, token byte offsets)."""
+    gaps = array('I')
+    gaps.frombytes(record[:4 * token_count])
+    return record[4 * token_count:], array('I', accumulate(gaps))
+
+class BlockWriter:
+    """Packs records into blocks, handing each compressed block to `emit`."""
+    
+    def __init__(self, emit: Callable[[bytes], None], block_size: int = DOCSTORE_BLOCK_SIZE,
+                 level: int = DOCSTORE_COMPRESSION_LEVEL):
+        self._emit = emit
+        self.block_size = block_size
+        self.level = level
+        self.block = 0  # number of the block being filled
+        self.buffer = bytearray()
+    
+    def add(self, record: bytes) -> Tuple[int, int]:
+        """Append a record; returns its (block, offset within the block)."""
+        if self.buffer and len(self.buffer) + len(record) > self.block_size:
+            self.flush()
+        location = (self.block, len(self.buffer))
+        self.buffer += record
+        return location
+    
+    def flush(self) -> None:
+        """Compress and emit the current block (records never span blocks)."""
+        if self.buffer:
+            self._emit(zlib.compress(self.buffer, self.level))
+            self.buffer = bytearray()
+            self.block += 1
+
+class ContentStore:
+    """
+    In-memory, block-compressed content and token offsets, keyed by document.
+    Level 0 stores blocks uncompressed, for staging records that are about
+    to be written to a segment anyway.
+    """
+    
+    def __init__(self, block_size: int = DOCSTORE_BLOCK_SIZE, level: int = DOCSTORE_COMPRESSION_LEVEL):
+        self.block_size = block_size
+        self.level = level
+        self._entries: Dict[str, Tuple[int, int, int, int]] = {}  # key -> block, offset, size, tokens
+        self._reset()
+    
+    def _reset(self) -> None:
+        self._blocks: List[bytes] = []
+        self._writer = BlockWriter(self._blocks.append, self.block_size, self.level)
+        self._written = 0  # record bytes in the blocks, live or not
+        self._dead = 0  # bytes of records that were removed or replaced
+        self._block = lru_cache(maxsize=DOCSTORE_CACHE_BLOCKS)(self._decompress)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes held: compressed blocks plus the block being filled."""
+        return sum(map(len, self._blocks)) + len(self._writer.buffer)
+    
+    def put(self, key: str, content: str, token_starts: Sequence[int]) -> None:
+        """Store a document's content and its tokens' character offsets."""
+        self._put(key, encode_record(content.encode(), utf8_offsets(content, token_starts)), len(token_starts))
+    
+    def _put(self, key: str, record: bytes, token_count: int) -> None:
+        self.remove(key)
+        block, offset = self._writer.add(record)
+        self._entries[key] = (block, offset, len(record), token_count)
+        self._written += len(record)
+    
+    def remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._dead += entry[2]
+        if self._dead > self._written * COMPACT_RATIO:
+            self._compact()
+        return True
+    
+    def record(self, key: str) -> Tuple[bytes, int]:
+        """A document's encoded record and token count."""
+        block, offset, size, token_count = self._entries[key]
+        data = self._writer.buffer if block == self._writer.block else self._block(block)
+        return bytes(data[offset:offset + size]), token_count
+    
+    def get(self, key: str) -> Tuple[bytes, array]:
+        """Decompress a document's (UTF-8 content, token byte offsets)."""
+        return decode_record(*self.record(key))
+    
+    def records(self) -> Iterator[Tuple[str, bytes, int]]:
+        """Yield (key, record, token count) for every stored document."""
+        for key in list(self._entries):
+            yield (key, *self.record(key))
+    
+    def merge(self, other: 'ContentStore') -> None:
+        """Copy every document of another store here, replacing earlier versions."""
+        for key, record, token_count in other.records():
+            self._put(key, record, token_count)
+    
+    def _decompress(self, block: int) -> bytes:
+        return zlib.decompress(self._blocks[block])
+    
+    def _compact(self) -> None:
+        """Rewrite the live records once removed ones dominate the blocks."""
+        live = list(self.records())
+        self._entries = {}
+        self._reset()
+        for key, record, token_count in live:
+            self._put(key, record, token_count)
@@ -0,0 +1,449 @@
+"""
+Inverted index with compact postings for PdfSearchEngine.
+
+Documents are mapped to dense integer ids in insertion order, so adding a
+document only ever appends to posting lists and keeps them sorted. Each
+posting list stores delta-encoded doc ids and term frequencies in parallel
+`array('I')` buffers, with a skip entry every SKIP_INTERVAL postings so
+cursors can jump ahead without decoding everything in between.
+
+Postings can also carry token positions (delta-encoded within each
+document) for phrase and proximity queries; a document's positions are
+found from the block's skip entry plus the frequencies before it.
+
+Re-adding or deleting a document tombstones its old id; tombstoned postings
+are skipped when reading and dropped by compact().
+"""
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, chain
+from operator import sub
+from typing import Dict, List, Optional, Set, Iterator, Iterable, Mapping, Sequence, Tuple, Union
+
+from tokenizer import TextTokens
+
+SKIP_INTERVAL = 128
+COMPACT_RATIO = 0.25  # compact once this share of doc ids are tombstones
+EXHAUSTED = sys.maxsize
+
+def invert(text: Union[str, TextTokens]) -> Tuple[List[str], array, array, array]:
+    """
+    Invert one document (or its existing tokenization) by sorting its token
+    positions by term.
+    
+    Returns the sorted distinct terms, their frequencies, the gap-encoded
+    positions grouped by term (freq entries each) and each token's start
+    offset in text. Runs in bulk-indexing worker processes.
+    """
+    if not isinstance(text, TextTokens):
+        text = TextTokens(text)
+    tokens = text.terms
+    starts = array('I', text.term_starts)
+    
+    terms: List[str] = []
+    freqs = array('I')
+    gaps = array('I')
+    previous_term = None
+    previous_position = 0
+    for position in sorted(range(len(tokens)), key=tokens.__getitem__):
+        term = tokens[position]
+        if term != previous_term:
+            terms.append(term)
+            freqs.append(0)
+            previous_term = term
+            previous_position = 0
+        freqs[-1] += 1
+        gaps.append(position - previous_position)
+        previous_position = position
+    return terms, freqs, gaps, starts
+
+class PostingList:
+    """Postings of one term, ordered by doc id."""
+    
+    __slots__ = ('deltas', 'freqs', 'skip_docs', 'skip_positions', 'positions', 'last_doc', 'max_freq')
+    
+    def __init__(self):
+        self.deltas = array('I')  # doc id minus the previous doc id
+        self.freqs = array('I')  # term frequency per posting
+        self.skip_docs = array('I')  # absolute doc id at the start of each block
+        self.skip_positions = array('I')  # offset into positions at the start of each block
+        self.positions = array('I')  # token position gaps, freq entries per posting
+        self.last_doc = -1
+        self.max_freq = 0  # bounds the term's score contribution
+    
+    @classmethod
+    def from_buffers(cls, deltas, freqs, skip_docs, skip_positions, positions, max_freq: int) -> 'PostingList':
+        """Wrap existing uint32 buffers (e.g. memory-mapped) as a read-only posting list."""
+        postings = cls.__new__(cls)
+        postings.deltas = deltas
+        postings.freqs = freqs
+        postings.skip_docs = skip_docs
+        postings.skip_positions = skip_positions
+        postings.positions = positions
+        postings.max_freq = max_freq
+        postings.last_doc = None
+        return postings
+    
+    def __len__(self) -> int:
+        return len(self.deltas)
+    
+    @property
+    def has_positions(self) -> bool:
+        return len(self.positions) > 0
+    
+    def append(self, doc: int, freq: int, positions: Sequence[int] = ()) -> None:
+        """Append a posting, optionally with its ascending token positions."""
+        previous = 0
+        gaps = array('I')
+        for position in positions:
+            gaps.append(position - previous)
+            previous = position
+        self.append_encoded(doc, freq, gaps)
+    
+    def append_encoded(self, doc: int, freq: int, position_gaps: Sequence[int] = ()) -> None:
+        """Append a posting whose positions are already gap-encoded; doc ids must increase."""
+        if doc <= self.last_doc:
+            raise ValueError("Postings must be appended in increasing doc id order")
+        if len(self.deltas) % SKIP_INTERVAL == 0:
+            self.skip_docs.append(doc)
+            self.skip_positions.append(len(self.positions))
+        self.deltas.append(doc - self.last_doc)
+        self.freqs.append(freq)
+        self.positions.extend(position_gaps)
+        self.last_doc = doc
+        if freq > self.max_freq:
+            self.max_freq = freq
+    
+    def extend(self, docs: Sequence[int], freqs: Sequence[int], position_gaps: bytes = b'') -> None:
+        """
+        Append many postings at once: ascending doc ids, their frequencies and
+        the concatenated gap-encoded positions (native uint32 bytes, or empty).
+        """
+        if not docs:
+            return
+        if docs[0] <= self.last_doc:
+            raise ValueError("Postings must be appended in increasing doc id order")
+        first = len(self.deltas)
+        position_base = len(self.positions)
+        cumulative = list(accumulate(freqs, initial=0))
+        for index in range(-first % SKIP_INTERVAL, len(docs), SKIP_INTERVAL):
+            self.skip_docs.append(docs[index])
+            self.skip_positions.append(position_base + cumulative[index])
+        self.deltas.extend(map(sub, docs, chain((self.last_doc,), docs)))
+        self.freqs.extend(freqs)
+        self.positions.frombytes(position_gaps)
+        self.last_doc = docs[-1]
+        self.max_freq = max(self.max_freq, max(freqs))
+    
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        doc = -1
+        for delta, freq in zip(self.deltas, self.freqs):
+            doc += delta
+            yield doc, freq
+    
+    def entries(self) -> Iterator[Tuple[int, int, Sequence[int]]]:
+        """Yield (doc, freq, gap-encoded positions) for copying postings elsewhere."""
+        offset = 0
+        with_positions = self.has_positions
+        for doc, freq in self:
+            if with_positions:
+                yield doc, freq, self.positions[offset:offset + freq]
+                offset += freq
+            else:
+                yield doc, freq, ()
+
+class PostingCursor:
+    """Forward-only cursor over a PostingList supporting skips."""
+    
+    __slots__ = ('postings', 'index', 'doc', '_size')
+    
+    def __init__(self, postings: PostingList):
+        self.postings = postings
+        self.index = 0
+        self._size = len(postings.deltas)
+        self.doc = postings.skip_docs[0] if self._size else EXHAUSTED
+    
+    @property
+    def freq(self) -> int:
+        return self.postings.freqs[self.index]
+    
+    def positions(self) -> List[int]:
+        """Decode the token positions of the current document."""
+        postings = self.postings
+        block_start = self.index - self.index % SKIP_INTERVAL
+        offset = postings.skip_positions[self.index // SKIP_INTERVAL]
+        offset += sum(postings.freqs[block_start:self.index])
+        decoded = []
+        position = 0
+        for gap in postings.positions[offset:offset + postings.freqs[self.index]]:
+            position += gap
+            decoded.append(position)
+        return decoded
+    
+    def next(self) -> int:
+        """Move to the next posting and return its doc id (EXHAUSTED at the end)."""
+        self.index += 1
+        if self.index >= self._size:
+            self.index = self._size
+            self.doc = EXHAUSTED
+        elif self.index % SKIP_INTERVAL == 0:
+            self.doc = self.postings.skip_docs[self.index // SKIP_INTERVAL]
+        else:
+            self.doc += self.postings.deltas[self.index]
+        return self.doc
+    
+    def advance(self, target: int) -> int:
+        """Move to the first posting with doc id >= target and return its doc id."""
+        if self.doc >= target:
+            return self.doc
+        block = bisect_right(self.postings.skip_docs, target) - 1
+        if block > self.index // SKIP_INTERVAL:
+            self.index = block * SKIP_INTERVAL
+            self.doc = self.postings.skip_docs[block]
+        while self.doc < target:
+            self.next()
+        return self.doc
+
+class IndexReader(ABC):
+    """
+    Query operations shared by the in-memory index and on-disk segments.
+    
+    Subclasses provide lookup(), key_of(), doc_lengths, total_length,
+    __len__ and a `_deleted` set of tombstoned doc ids.
+    """
+    
+    _deleted: Set[int]
+    total_length: int
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of live (non-tombstoned) documents."""
+        pass
+    
+    @abstractmethod
+    def lookup(self, term: str) -> Optional[PostingList]:
+        """Return the posting list of a term, or None if it is not indexed."""
+        pass
+    
+    @abstractmethod
+    def key_of(self, doc: int) -> Optional[str]:
+        """Return the external key of a live doc id (None if deleted)."""
+        pass
+    
+    @property
+    def max_doc(self) -> int:
+        """Number of doc ids, including tombstoned ones (the population doc_freq counts)."""
+        return len(self) + len(self._deleted)
+    
+    @property
+    def average_length(self) -> float:
+        """Mean token count of the live documents."""
+        live = len(self)
+        return self.total_length / live if live else 0.0
+    
+    def is_live(self, doc: int) -> bool:
+        return doc not in self._deleted
+    
+    def doc_freq(self, term: str) -> int:
+        """
+        Number of postings for a term. Like other tombstone-based indexes this
+        still counts deleted documents until they are compacted away.
+        """
+        postings = self.lookup(term)
+        return len(postings) if postings is not None else 0
+    
+    def cursor(self, term: str) -> Optional[PostingCursor]:
+        postings = self.lookup(term)
+        return PostingCursor(postings) if postings is not None else None
+    
+    def documents(self, term: str) -> Iterator[Tuple[int, int]]:
+        """Yield (doc id, term frequency) for the live documents containing term."""
+        postings = self.lookup(term)
+        if postings is None:
+            return
+        deleted = self._deleted
+        for doc, freq in postings:
+            if doc not in deleted:
+                yield doc, freq
+    
+    def intersect(self, terms: Iterable[str]) -> List[int]:
+        """Return the live doc ids containing every term, via leapfrogging cursors."""
+        cursors = [self.cursor(term) for term in set(terms)]
+        if not cursors or any(cursor is None for cursor in cursors):
+            return []
+        # Drive the intersection from the rarest term
+        cursors.sort(key=lambda cursor: cursor._size)
+        matches = []
+        doc = cursors[0].doc
+        while doc != EXHAUSTED:
+            for cursor in cursors:
+                if cursor.advance(doc) != doc:
+                    doc = cursor.doc
+                    break
+            else:
+                if doc not in self._deleted:
+                    matches.append(doc)
+                doc = cursors[0].advance(doc + 1)
+        return matches
+
+class InvertedIndex(IndexReader):
+    """Mutable in-memory term -> PostingList map with document id management."""
+    
+    def __init__(self):
+        self.postings: Dict[str, PostingList] = {}
+        self._doc_ids: Dict[str, int] = {}
+        self._doc_keys: List[Optional[str]] = []
+        self._deleted: Set[int] = set()
+        self.doc_lengths = array('I')  # token count per doc id
+        self.total_length = 0  # token count over live documents
+    
+    def __len__(self) -> int:
+        """Number of live documents."""
+        return len(self._doc_ids)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._doc_ids
+    
+    def lookup(self, term: str) -> Optional[PostingList]:
+        return self.postings.get(term)
+    
+    def add(self, key: str, term_freqs: Mapping[str, int],
+            positions: Optional[Mapping[str, Sequence[int]]] = None) -> int:
+        """
+        Index a document's term frequencies (and optionally each term's token
+        positions), replacing any earlier version.
+        """
+        self.delete(key)
+        doc = len(self._doc_keys)
+        length = sum(term_freqs.values())
+        self._doc_keys.append(key)
+        self._doc_ids[key] = doc
+        self.doc_lengths.append(length)
+        self.total_length += length
+        for term, freq in term_freqs.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = PostingList()
+            postings.append(doc, freq, positions[term] if positions is not None else ())
+        return doc
+    
+    def add_batch(self, documents: Iterable[Tuple[str, Sequence[str], Sequence[int], array]]) -> None:
+        """
+        Index many documents already inverted by invert(): (key, terms,
+        frequencies, gap-encoded positions grouped by term). Postings are
+        collected per term across the batch and appended in bulk.
+        """
+        grouped: Dict[str, Tuple[List[int], List[int], List[bytes]]] = {}
+        for key, terms, freqs, position_gaps in documents:
+            self._tombstone(key)
+            doc = len(self._doc_keys)
+            length = sum(freqs)
+            self._doc_keys.append(key)
+            self._doc_ids[key] = doc
+            self.doc_lengths.append(length)
+            self.total_length += length
+            
+            gaps = position_gaps.tobytes()
+            offset = 0
+            for term, freq in zip(terms, freqs):
+                entry = grouped.get(term)
+                if entry is None:
+                    entry = grouped[term] = ([], [], [])
+                entry[0].append(doc)
+                entry[1].append(freq)
+                entry[2].append(gaps[offset:offset + 4 * freq])
+                offset += 4 * freq
+        
+        for term, (docs, freqs, gaps) in grouped.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = PostingList()
+            postings.extend(docs, freqs, b''.join(gaps))
+        self._maybe_compact()
+    
+    def delete(self, key: str) -> bool:
+        """Remove a document; returns False if it was not indexed."""
+        if not self._tombstone(key):
+            return False
+        self._maybe_compact()
+        return True
+    
+    def _tombstone(self, key: str) -> bool:
+        doc = self._doc_ids.pop(key, None)
+        if doc is None:
+            return False
+        self._doc_keys[doc] = None
+        self._deleted.add(doc)
+        self.total_length -= self.doc_lengths[doc]
+        return True
+    
+    def _maybe_compact(self) -> None:
+        if len(self._deleted) > COMPACT_RATIO * len(self._doc_keys):
+            self.compact()
+    
+    def key_of(self, doc: int) -> Optional[str]:
+        """Return the external key of a live doc id (None if deleted)."""
+        return self._doc_keys[doc]
+    
+    def doc_of(self, key: str) -> Optional[int]:
+        """Return the doc id of a live key."""
+        return self._doc_ids.get(key)
+    
+    def merge(self, other: 'InvertedIndex') -> None:
+        """
+        Append the live documents of another index after this one's, in their
+        order there, replacing any earlier versions here.
+        """
+        remap = {}
+        for doc, key in enumerate(other._doc_keys):
+            if key is not None:
+                self._tombstone(key)
+                remap[doc] = len(self._doc_keys)
+                self._doc_keys.append(key)
+                self._doc_ids[key] = remap[doc]
+                self.doc_lengths.append(other.doc_lengths[doc])
+                self.total_length += other.doc_lengths[doc]
+        
+        for term, postings in other.postings.items():
+            docs, freqs, gaps = [], [], array('I')
+            for doc, freq, positions in postings.entries():
+                new_doc = remap.get(doc)
+                if new_doc is not None:
+                    docs.append(new_doc)
+                    freqs.append(freq)
+                    gaps.extend(positions)
+            if docs:
+                merged = self.postings.get(term)
+                if merged is None:
+                    merged = self.postings[term] = PostingList()
+                merged.extend(docs, freqs, gaps.tobytes())
+        self._maybe_compact()
+    
+    def compact(self) -> None:
+        """Rewrite postings without tombstoned documents and renumber doc ids."""
+        remap = {}
+        keys: List[Optional[str]] = []
+        lengths = array('I')
+        for doc, key in enumerate(self._doc_keys):
+            if key is not None:
+                remap[doc] = len(keys)
+                keys.append(key)
+                lengths.append(self.doc_lengths[doc])
+        
+        compacted: Dict[str, PostingList] = {}
+        for term, postings in self.postings.items():
+            rebuilt = PostingList()
+            for doc, freq, gaps in postings.entries():
+                new_doc = remap.get(doc)
+                if new_doc is not None:
+                    rebuilt.append_encoded(new_doc, freq, gaps)
+            if len(rebuilt):
+                compacted[term] = rebuilt
+        
+        self.postings = compacted
+        self._doc_keys = keys
+        self.doc_lengths = lengths
+        self._doc_ids = {key: doc for doc, key in enumerate(keys)}
+        self._deleted = set()
@@ -0,0 +1,183 @@
+"""
+Corpus-level keyword extraction.
+
+A KeywordEngine ranks a document's n-grams (TextProfile.ngram_counts) in one
+of two modes. "tf" scores by term frequency alone, exactly as the former
+one-document TfidfVectorizer did. "idf" weighs each count by its inverse
+document frequency in the corpus seen so far, so n-grams common to every
+document sink and distinctive ones rise.
+
+Document frequencies are kept in one IdfTable per language and updated
+incrementally as documents are scored; a document identified by its content
+digest is counted once, however often it is analyzed. Given a directory, each table is
+persisted as a compressed file and reloaded on first use, so corpus
+statistics accumulate across runs.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import KEYWORD_MODE, KEYWORD_IDF_SAVE_DOCS, KEYWORD_IDF_MAX_TERMS
+from text_analysis import tf_keywords
+from utils import setup_logging
+
+logger = setup_logging(__name__)
+
+KEYWORD_MODES = ("tf", "idf")
+
+@dataclass
+class IdfTable:
+    """Document frequencies of n-grams across a language's corpus."""
+    documents: int = 0
+    df: Dict[str, int] = field(default_factory=dict)
+    seen: Set[str] = field(default_factory=set)  # digests of the documents counted
+    unsaved: int = 0  # documents added since the table was last persisted
+    
+    def add(self, terms, document: Optional[str] = None) -> bool:
+        """
+        Count one document containing each of the distinct `terms`, unless
+        the document (a content digest) was counted before. Returns whether
+        it was counted.
+        """
+        if document is not None:
+            if document in self.seen:
+                return False
+            self.seen.add(document)
+        df = self.df
+        for term in terms:
+            df[term] = df.get(term, 0) + 1
+        self.documents += 1
+        self.unsaved += 1
+        return True
+    
+    def idf(self, term: str) -> float:
+        """Smoothed inverse document frequency, as TfidfVectorizer computes it."""
+        return math.log((1 + self.documents) / (1 + self.df.get(term, 0))) + 1
+    
+    def prune(self, max_terms: int) -> None:
+        """Drop n-grams seen in a single document once the table outgrows max_terms."""
+        if len(self.df) > max_terms:
+            self.df = {term: count for term, count in self.df.items() if count > 1}
+    
+    def to_bytes(self) -> bytes:
+        state = {'documents': self.documents, 'df': self.df, 'seen': sorted(self.seen)}
+        return zlib.compress(json.dumps(state).encode('utf-8'))
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "IdfTable":
+        state = json.loads(zlib.decompress(data))
+        return cls(documents=state['documents'], df=state['df'], seen=set(state.get('seen', ())))
+
+class KeywordEngine:
+    """Keyword ranking by term frequency or against per-language corpus IDF tables."""
+    
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        mode: Optional[str] = None,
+        save_every: int = KEYWORD_IDF_SAVE_DOCS,
+        max_terms: int = KEYWORD_IDF_MAX_TERMS
+    ):
+        """
+        Args:
+            path: Directory the IDF tables are persisted in (in memory only if None).
+            mode: "tf" or "idf" (defaults to KEYWORD_MODE).
+            save_every: Documents added to a table between automatic saves.
+            max_terms: Table size beyond which single-document n-grams are pruned.
+        """
+        self.mode = mode or KEYWORD_MODE
+        if self.mode not in KEYWORD_MODES:
+            raise ValueError(f"Unknown keyword mode: {self.mode}")
+        self.path = Path(path) if path is not None else None
+        self.save_every = save_every
+        self.max_terms = max_terms
+        self.tables: Dict[str, IdfTable] = {}
+        self._lock = threading.Lock()
+    
+    def keywords(self, language: str, ngram_counts: Dict[str, int], top_n: int = 10,
+                 document: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Rank a document's n-gram counts. In "idf" mode the document is first
+        added to its language's table (unless its digest, `document`, was
+        added before), then scored by l2-normalized tf * idf.
+        """
+        if self.mode == "tf":
+            return tf_keywords(ngram_counts, top_n)
+        
+        with self._lock:
+            table = self._table(language)
+            table.add(ngram_counts, document)
+            weights = [(term, count * table.idf(term)) for term, count in ngram_counts.items()]
+            if table.unsaved >= self.save_every:
+                table.prune(self.max_terms)
+                self._save(language, table)
+        
+        norm = math.sqrt(sum(weight * weight for _, weight in weights))
+        if not norm:
+            return []
+        return [(term, weight / norm) for term, weight in heapq.nlargest(top_n, weights, key=lambda x: x[1])]
+    
+    def for_document(self, document: Optional[str]) -> "DocumentKeywords":
+        """This engine's keywords() for one document, identified by its content digest."""
+        return DocumentKeywords(self, document)
+    
+    def idf(self, language: str, term: str) -> float:
+        """Current inverse document frequency of a term in a language's corpus."""
+        with self._lock:
+            return self._table(language).idf(term)
+    
+    def save(self) -> None:
+        """Persist every table with documents added since its last save."""
+        with self._lock:
+            for language, table in self.tables.items():
+                if table.unsaved:
+                    self._save(language, table)
+    
+    def close(self) -> None:
+        self.save()
+    
+    def _table(self, language: str) -> IdfTable:
+        """Return a language's table, loading its persisted copy on first use."""
+        table = self.tables.get(language)
+        if table is None:
+            table = IdfTable()
+            file = self._file(language)
+            if file is not None and file.exists():
+                try:
+                    table = IdfTable.from_bytes(file.read_bytes())
+                except Exception as e:
+                    logger.warning(f"Ignoring unreadable IDF table {file}: {e}")
+            self.tables[language] = table
+        return table
+    
+    def _file(self, language: str) -> Optional[Path]:
+        if self.path is None:
+            return None
+        return self.path / f"{re.sub(r'[^A-Za-z0-9_-]', '_', language)}.idf"
+    
+    def _save(self, language: str, table: IdfTable) -> None:
+        """Atomically replace a table's file (called with the lock held)."""
+        table.unsaved = 0
+        file = self._file(language)
+        if file is None:
+            return
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file.with_suffix('.tmp')
+        tmp_path.write_bytes(table.to_bytes())
+        os.replace(tmp_path, file)
+
+@dataclass
+class DocumentKeywords:
+    """A KeywordEngine bound to one document, for analysis code that ranks keywords by language alone."""
+    engine: KeywordEngine
+    document: Optional[str]
+    
+    def keywords(self, language: str, ngram_counts: Dict[str, int], top_n: int = 10) -> List[Tuple[str, float]]:
+        return self.engine.keywords(language, ngram_counts, top_n, self.document)
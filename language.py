@@ -0,0 +1,114 @@
+"""
+Language identification for document analysis.
+
+detect_language wraps langdetect with:
+
+- one DetectorFactory per process, whose profiles are loaded on first use
+  (or ahead of time by warming detector_factory) and which is seeded with
+  LANGUAGE_DETECT_SEED, so the same text always gets the same language;
+- staged sampling: the first LANGUAGE_PROBE_CHARS characters are detected
+  alone and accepted when their top probability reaches LANGUAGE_CONFIDENCE.
+  Only ambiguous probes fall back to the whole sample;
+- optional fast paths that skip langdetect: the language the PDF declares
+  (/Lang in its catalog), or a clear majority of one language's stopwords
+  among the probe's words.
+"""
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional
+
+from config import (
+    LANGUAGE_DETECT_SEED, LANGUAGE_PROBE_CHARS, LANGUAGE_CONFIDENCE, LANGUAGE_FAST_PATH,
+    LANGUAGE_STOPWORD_RATIO, LANGUAGE_STOPWORD_MIN_WORDS
+)
+from text_analysis import NLTK_LANGUAGES, load_stopwords
+from tokenizer import tokenize
+
+if TYPE_CHECKING:
+    from langdetect.detector_factory import DetectorFactory
+
+@lru_cache(maxsize=None)
+def detector_factory() -> "DetectorFactory":
+    """langdetect's language profiles, loaded and seeded once per process."""
+    from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+    factory = DetectorFactory()
+    factory.load_profile(PROFILES_DIRECTORY)
+    factory.set_seed(LANGUAGE_DETECT_SEED)
+    return factory
+
+@lru_cache(maxsize=None)
+def _stopword_sets() -> Dict[str, frozenset]:
+    """
+    Stopwords of every NLTK_LANGUAGES language, or none at all if any list is
+    missing: a vote without some candidates would go to a related language.
+    """
+    sets = {}
+    for language in NLTK_LANGUAGES:
+        try:
+            stopwords = load_stopwords(language)
+        except OSError:
+            stopwords = set()  # corpus partially installed
+        if not stopwords:
+            return {}
+        sets[language] = frozenset(stopwords)
+    return sets
+
+def declared_language(tag: Optional[str]) -> Optional[str]:
+    """
+    The langdetect code for a declared language tag (e.g. "en-US" -> "en",
+    "zh-Hant-TW" -> "zh-tw"), or None if langdetect has no such language.
+    """
+    if not tag:
+        return None
+    subtags = tag.strip().lower().replace('_', '-').split('-')
+    language = subtags[0]
+    if language == 'zh':
+        language = 'zh-tw' if {'tw', 'hk', 'mo', 'hant'} & set(subtags) else 'zh-cn'
+    return language if language in detector_factory().langlist else None
+
+def stopword_language(sample: str) -> Optional[str]:
+    """
+    The language whose stopwords make up at least LANGUAGE_STOPWORD_RATIO of
+    the sample's words and outnumber every other language's two to one, if any.
+    """
+    words = tokenize(sample)
+    if len(words) < LANGUAGE_STOPWORD_MIN_WORDS:
+        return None
+    hits = sorted(
+        ((sum(word in stopwords for word in words), language) for language, stopwords in _stopword_sets().items()),
+        reverse=True
+    )
+    if not hits:
+        return None
+    (best, language), (runner_up, _) = hits[0], hits[1]
+    if best >= LANGUAGE_STOPWORD_RATIO * len(words) and best >= 2 * runner_up:
+        return language
+    return None
+
+def _probabilities(text: str) -> list:
+    """langdetect's likely languages for a text, most probable first."""
+    detector = detector_factory().create()
+    detector.append(text)
+    return detector.get_probabilities()
+
+def detect_language(sample: str, declared: Optional[str] = None, fast_path: bool = LANGUAGE_FAST_PATH) -> str:
+    """
+    Detect the language of a text sample, deterministically. With fast_path,
+    a language declared by the document (a tag such as "en-US") or a clear
+    stopword majority is trusted first. Raises LangDetectException when the
+    sample has no usable features, like langdetect.detect.
+    """
+    from langdetect.lang_detect_exception import LangDetectException
+    probe = sample[:LANGUAGE_PROBE_CHARS]
+    if fast_path:
+        language = declared_language(declared) or stopword_language(probe)
+        if language:
+            return language
+    if len(sample) > len(probe):
+        try:
+            probabilities = _probabilities(probe)
+        except LangDetectException:
+            probabilities = []  # no features in the probe: the whole sample decides
+        if probabilities and probabilities[0].prob >= LANGUAGE_CONFIDENCE:
+            return probabilities[0].lang
+    probabilities = _probabilities(sample)
+    return probabilities[0].lang if probabilities else "unknown"
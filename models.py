@@ -1,7 +1,8 @@
 import dataclasses
 import time
 from dataclasses import dataclass, field
-from typing import Dict, Any, Optional
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
 from enum import Enum
 
 class ExtractionStatus(Enum):
@@ -32,6 +33,7 @@ class PdfMetadata:
     producer: Optional[str] = None
     creation_date: Optional[str] = None
     modification_date: Optional[str] = None
+    language: Optional[str] = None  # as declared by the document (/Lang), e.g. "en-US"
     file_size: int = 0
     page_count: int = 0
     encrypted: bool = False
@@ -44,3 +46,17 @@ class PdfMetadata:
         # Convert Enum to string for serialization
         data['extraction_status'] = self.extraction_status.value
         return data
+
+@dataclass
+class DownloadedPdf:
+    """A downloaded PDF body, held in memory when small or spooled to disk."""
+    source: Union[bytes, Path]
+    size: int
+    sha256: str = ''
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def discard(self) -> None:
+        """Remove the spooled file backing this download, if any."""
+        if isinstance(self.source, Path):
+            self.source.unlink(missing_ok=True)
@@ -1,51 +1,52 @@
 
 import asyncio
-import re
-import nltk
-from collections import Counter
-from typing import Dict, Any, List, Tuple
+import codecs
+import zlib
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterable, Iterator, List, Tuple, Optional, Union
 from concurrent.futures import Executor
+from config import LANGUAGE_SAMPLE_CHARS, TEXT_SCAN_CHUNK
 from models import PdfMetadata, ExtractionStatus
 from exceptions import EncryptedPdfError, ProcessingError
-import fitz
 from utils import setup_logging
-from text_analysis import ContentAnalyzer
+from keywords import KeywordEngine
+from phrases import PhraseCounter, count_phrases
+from text_analysis import ContentAnalyzer, ProfileBuilder, TextProfile
+from tokenizer import TextTokens
+
+if TYPE_CHECKING:
+    import fitz  # loaded on first use, in the process that opens the PDF
 
 logger = setup_logging(__name__)
 
-def process_pdf_content(content: bytes) -> Tuple[str, PdfMetadata]:
+def open_pdf(source: Union[bytes, memoryview, Path]) -> "fitz.Document":
+    """Open PDF bytes, or a spooled file by path without reading it into memory."""
+    import fitz
+    if isinstance(source, Path):
+        return fitz.open(str(source), filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+def process_pdf_content(
+        content: Union[bytes, Path],
+        split_threshold: Optional[int] = None
+    ) -> Tuple[Optional[str], PdfMetadata]:
     """
-    Process PDF content bytes to extract text and metadata.
-    This pure function can be run in a separate process.
+    Process PDF content (bytes, or a Path to a spooled download) to extract
+    text and metadata. This pure function can be run in a separate process.
+    
+    If split_threshold is given and the document has at least that many pages,
+    text extraction is skipped and None is returned in place of the text, so the
+    caller can fan the pages out with extract_page_range.
     """
     try:
-        with fitz.open(stream=content, filetype="pdf") as doc:
+        with open_pdf(content) as doc:
             # 1. Encryption Check (Fail Fast)
             if doc.is_encrypted:
                 # Attempt to authenticate with empty password
                 pass 
 
-            # Extract metadata
-            raw_metadata = doc.metadata
-            metadata_dict = {
-                'title': raw_metadata.get('title'),
-                'author': raw_metadata.get('author'),
-                'subject': raw_metadata.get('subject'),
-                'keywords': raw_metadata.get('keywords'),
-                'creator': raw_metadata.get('creator'),
-                'producer': raw_metadata.get('producer'),
-                'creation_date': raw_metadata.get('creationDate'),
-                'modification_date': raw_metadata.get('modDate'),
-                'file_size': len(content),
-                'page_count': len(doc),
-                'encrypted': doc.is_encrypted,
-                'permissions': {
-                    'print': bool(doc.permissions & fitz.PDF_PERM_PRINT),
-                    'modify': bool(doc.permissions & fitz.PDF_PERM_MODIFY),
-                    'copy': bool(doc.permissions & fitz.PDF_PERM_COPY),
-                    'annotate': bool(doc.permissions & fitz.PDF_PERM_ANNOTATE)
-                }
-            }
+            metadata_dict = read_metadata(doc, content)
             
             # 2. Strict Encryption Stop
             try:
@@ -53,6 +54,10 @@ def process_pdf_content(content: bytes) -> Tuple[str, PdfMetadata]:
             except Exception:
                  raise EncryptedPdfError("PDF is encrypted and cannot be read.")
 
+            # Large documents are extracted page-parallel by the caller
+            if split_threshold and len(doc) >= split_threshold:
+                return None, PdfMetadata(**metadata_dict)
+
             # Extract text
             texts = []
             for page in doc:
@@ -62,15 +67,9 @@ def process_pdf_content(content: bytes) -> Tuple[str, PdfMetadata]:
             full_text = ''.join(texts)
             
             # 3. Determine Status
-            status = ExtractionStatus.SUCCESS
-            if doc.is_encrypted and not full_text.strip():
-                 status = ExtractionStatus.ENCRYPTED 
-            elif not full_text.strip():
-                status = ExtractionStatus.SCANNED
-            
             metadata = PdfMetadata(
                 **metadata_dict,
-                extraction_status=status
+                extraction_status=extraction_status(doc.is_encrypted, full_text)
             )
             
             return full_text, metadata
@@ -80,56 +79,384 @@ def process_pdf_content(content: bytes) -> Tuple[str, PdfMetadata]:
             raise EncryptedPdfError("PDF requires password")
         raise ProcessingError(f"PDF parsing failed: {e}")
 
+def read_metadata(doc: "fitz.Document", content: Union[bytes, Path]) -> Dict[str, Any]:
+    """Document-level metadata fields of an open PDF."""
+    import fitz
+    raw_metadata = doc.metadata
+    return {
+        'title': raw_metadata.get('title'),
+        'author': raw_metadata.get('author'),
+        'subject': raw_metadata.get('subject'),
+        'keywords': raw_metadata.get('keywords'),
+        'creator': raw_metadata.get('creator'),
+        'producer': raw_metadata.get('producer'),
+        'creation_date': raw_metadata.get('creationDate'),
+        'modification_date': raw_metadata.get('modDate'),
+        'language': catalog_language(doc),
+        'file_size': content.stat().st_size if isinstance(content, Path) else len(content),
+        'page_count': len(doc),
+        'encrypted': doc.is_encrypted,
+        'permissions': {
+            'print': bool(doc.permissions & fitz.PDF_PERM_PRINT),
+            'modify': bool(doc.permissions & fitz.PDF_PERM_MODIFY),
+            'copy': bool(doc.permissions & fitz.PDF_PERM_COPY),
+            'annotate': bool(doc.permissions & fitz.PDF_PERM_ANNOTATE)
+        }
+    }
+
+def catalog_language(doc: "fitz.Document") -> Optional[str]:
+    """The natural language a PDF declares in its catalog (/Lang), if any."""
+    try:
+        kind, value = doc.xref_get_key(doc.pdf_catalog(), "Lang")
+    except Exception:
+        return None
+    return value if kind == 'string' and value else None
+
+def extraction_status(encrypted: bool, full_text: str) -> ExtractionStatus:
+    """Classify the outcome of a text extraction."""
+    if encrypted and not full_text.strip():
+        return ExtractionStatus.ENCRYPTED
+    if not full_text.strip():
+        return ExtractionStatus.SCANNED
+    return ExtractionStatus.SUCCESS
+
+def split_page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into at most `parts` contiguous (start, stop) ranges."""
+    size = max(1, -(-page_count // max(1, parts)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def extract_page_range(source: Union[str, Path], start: int, stop: int, size: int = 0) -> List[str]:
+    """
+    Extract the text of pages [start, stop) in a worker process.
+    
+    source is either a Path to a spooled download or the name of a
+    SharedMemory block holding `size` bytes; the document bytes are never pickled.
+    """
+    if isinstance(source, Path):
+        try:
+            with open_pdf(source) as doc:
+                return [doc[number].get_text() for number in range(start, stop)]
+        except Exception as e:
+            raise ProcessingError(f"PDF parsing failed on pages {start}-{stop}: {e}")
+
+    shm = shared_memory.SharedMemory(name=source)
+    try:
+        view = shm.buf[:size]
+        try:
+            with open_pdf(view) as doc:
+                return [doc[number].get_text() for number in range(start, stop)]
+        finally:
+            view.release()
+    except Exception as e:
+        raise ProcessingError(f"PDF parsing failed on pages {start}-{stop}: {e}")
+    finally:
+        shm.close()
+
 def analyze_text_content(
         text: str, 
-        word_or_phrase: str, 
+        word_or_phrase: Optional[str], 
         language: str, 
         analyzer: ContentAnalyzer,
-        stopwords: set
+        stopwords: set,
+        keyword_engine: Optional[KeywordEngine] = None
     ) -> Dict[str, Any]:
     """
     Perform content analysis on text.
     Pure function (mostly, relies on passed analyzer).
+    
+    Keywords are ranked by keyword_engine when given, otherwise by term
+    frequency within the text. Without a word_or_phrase the results are
+    phrase-independent: search_term_count and matching_keywords are left
+    for with_query to add.
     """
+    return analyze_text_profile(text, word_or_phrase, language, analyzer, stopwords, keyword_engine)[0]
+
+def analyze_text_profile(
+        text: str, 
+        word_or_phrase: Optional[str], 
+        language: str, 
+        analyzer: ContentAnalyzer,
+        stopwords: set,
+        keyword_engine: Optional[KeywordEngine] = None
+    ) -> Tuple[Dict[str, Any], TextProfile]:
+    """analyze_text_content, also returning the TextProfile the analysis came from."""
     try:
-        words = nltk.word_tokenize(text.lower())
-        
-        # Count exact occurrences of the search term
-        search_term_count = len(re.findall(
-            rf'\\b{re.escape(word_or_phrase.lower())}\\b', 
-            text.lower()
-        ))
-        
-        # Extract keywords using the passed analyzer
-        # Note: ContentAnalyzer is already initialized with language
-        keywords = analyzer.extract_keywords(text)
-        
-        matching_keywords = [
-            (kw, score) for kw, score in keywords
-            if word_or_phrase.lower() in kw.lower()
-        ]
-        
-        # Filter out non-alphabetic tokens and stopwords for top words
-        top_words = dict(Counter(
-            word for word in words
-            if word.isalpha() and word not in stopwords
-        ).most_common(10))
+        # Tokenize once, then take every count from one profile of the tokens
+        tokens = TextTokens(text)
+        profile = analyzer.profile(tokens)
         
         # Create a preview of the text (first 500 characters)
         text_preview = text[:500] + "..." if len(text) > 500 else text
         
-        return {
-            'language': language,
-            'word_count': len(words),
-            'character_count': len(text),
-            'sentence_count': len(nltk.sent_tokenize(text)),
-            'search_term_count': search_term_count,
-            'keywords': keywords,
-            'matching_keywords': matching_keywords,
-            'readability_score': analyzer.calculate_readability_score(text),
-            'text_preview': text_preview,
-            'top_words': top_words
-        }
+        results = profile_results(
+            profile, language, analyzer, stopwords, keyword_engine, len(text), text_preview
+        )
+        if word_or_phrase is not None:
+            # Count exact occurrences of the search term
+            search_term_count = count_phrases(tokens.lowered, [word_or_phrase])[word_or_phrase]
+            results = with_query(results, word_or_phrase, search_term_count)
+        return results, profile
     except Exception as e:
         logger.error(f"Error in content analysis: {e}")
         raise
+
+def profile_results(
+        profile: TextProfile,
+        language: str,
+        analyzer: ContentAnalyzer,
+        stopwords: set,
+        keyword_engine: Optional[KeywordEngine],
+        character_count: int,
+        text_preview: str
+    ) -> Dict[str, Any]:
+    """Assemble the phrase-independent analysis results of a profiled text."""
+    # Extract keywords using the passed analyzer
+    # Note: ContentAnalyzer is already initialized with language
+    if keyword_engine is not None:
+        keywords = keyword_engine.keywords(language, profile.ngram_counts)
+    else:
+        keywords = analyzer.keywords(profile)
+    
+    return {
+        'language': language,
+        'word_count': profile.word_count,
+        'character_count': character_count,
+        'sentence_count': profile.sentence_count,
+        'keywords': keywords,
+        'readability_score': analyzer.readability(profile),
+        'text_preview': text_preview,
+        # Filter out non-alphabetic tokens and stopwords for top words
+        'top_words': profile.top_words(stopwords)
+    }
+
+def fallback_analysis(word_count: int, character_count: int, text_preview: str) -> Dict[str, Any]:
+    """Results reported when language detection or analysis fails: plain counts only."""
+    return {
+        'language': 'unknown',
+        'word_count': word_count,
+        'character_count': character_count,
+        'sentence_count': 0,
+        'keywords': [],
+        'readability_score': 0.0,
+        'text_preview': text_preview,
+        'top_words': {}
+    }
+
+def with_query(analysis: Dict[str, Any], word_or_phrase: str, search_term_count: int) -> Dict[str, Any]:
+    """
+    A copy of phrase-independent analysis results with the query fields for
+    word_or_phrase (search_term_count and matching_keywords) in place. Results
+    cut short for lack of text carry no query fields.
+    """
+    if 'top_words' not in analysis:
+        return analysis
+    results = {}
+    for key, value in analysis.items():
+        if key in ('search_term_count', 'matching_keywords'):
+            continue
+        results[key] = value
+        if key == 'sentence_count':
+            results['search_term_count'] = search_term_count
+        elif key == 'keywords':
+            results['matching_keywords'] = matching_keywords(value, word_or_phrase)
+    return results
+
+def matching_keywords(keywords: List[Tuple[str, float]], word_or_phrase: str) -> List[Tuple[str, float]]:
+    """The keywords containing the search term."""
+    return [
+        (kw, score) for kw, score in keywords
+        if word_or_phrase.lower() in kw.lower()
+    ]
+
+def document_phrase_counts(
+        full_text: Optional[str],
+        compressed_text: Optional[bytes],
+        phrases: List[str]
+    ) -> Dict[str, int]:
+    """
+    Whole-word occurrences of each phrase in a processed document, whose text
+    is kept either plainly or zlib-compressed (documents without either count 0).
+    Compressed text is decompressed and scanned TEXT_SCAN_CHUNK bytes at a time.
+    """
+    counter = PhraseCounter(phrases)
+    pieces = [full_text] if full_text is not None else decompressed_pieces(compressed_text or b'')
+    for piece in pieces:
+        counter.feed(piece.lower())
+    return counter.counts()
+
+def decompressed_pieces(compressed_text: bytes, size: int = TEXT_SCAN_CHUNK) -> Iterator[str]:
+    """The text of zlib-compressed UTF-8, decompressed and decoded `size` bytes at a time."""
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    compressed = memoryview(compressed_text)
+    for start in range(0, len(compressed), size):
+        data = compressed[start:start + size]
+        while data:
+            yield decoder.decode(decompressor.decompress(data, size))
+            data = decompressor.unconsumed_tail
+    yield decoder.decode(decompressor.flush(), final=True)
+
+class PageStreamAnalysis:
+    """
+    analyze_text_content over a text fed page by page, holding only the pages
+    read before the language is detected and then the unfinished sentence a
+    page ends with (see ProfileBuilder).
+    
+    resolve(sample) maps the first LANGUAGE_SAMPLE_CHARS characters to the
+    language, its ContentAnalyzer and its stopwords. If detection or analysis
+    fails, finish() reports the same plain counts as the full-text path.
+    With keep_text, the text is also kept zlib-compressed (compressed_text)
+    so that later queries can scan it; otherwise `phrases` are counted as the
+    pages go by (phrase_counts).
+    """
+    
+    def __init__(
+        self,
+        word_or_phrase: Optional[str],
+        resolve: Callable[[str], Tuple[str, ContentAnalyzer, set]],
+        keyword_engine: Optional[KeywordEngine] = None,
+        keep_text: bool = False,
+        phrases: Iterable[str] = ()
+    ):
+        self.word_or_phrase = word_or_phrase
+        self.resolve = resolve
+        self.keyword_engine = keyword_engine
+        self.character_count = 0
+        self.has_text = False
+        self._head = ''  # first 501 characters, for the preview
+        self._pending: List[str] = []  # pages read before the language is known
+        self._pending_chars = 0
+        self._builder: Optional[ProfileBuilder] = None
+        self._resolved: Optional[Tuple[str, ContentAnalyzer, set]] = None
+        self._failed = False
+        phrases = list(phrases)
+        if word_or_phrase is not None:
+            phrases.append(word_or_phrase)
+        self._phrases = PhraseCounter(phrases) if phrases else None
+        self.phrase_counts: Dict[str, int] = {}  # set by finish()
+        self._compressor = zlib.compressobj() if keep_text else None
+        self._compressed: List[bytes] = []
+        self.compressed_text: Optional[bytes] = None  # set by finish() with keep_text
+        # Fallback count, kept in case detection or analysis fails
+        self._split_words = 0
+        self._in_word = False
+    
+    def feed(self, page: str) -> None:
+        """Analyze the next page of the text."""
+        if not page:
+            return
+        self.character_count += len(page)
+        if len(self._head) <= 500:
+            self._head += page[:501 - len(self._head)]
+        self.has_text = self.has_text or not page.isspace()
+        self._split_words += len(page.split()) - (self._in_word and not page[0].isspace())
+        self._in_word = not page[-1].isspace()
+        if self._phrases is not None:
+            self._phrases.feed(page.lower())
+        if self._compressor is not None:
+            self._compressed.append(self._compressor.compress(page.encode('utf-8')))
+        if self._failed:
+            return
+        try:
+            if self._builder is not None:
+                self._builder.feed(page)
+                return
+            self._pending.append(page)
+            self._pending_chars += len(page)
+            if self._pending_chars >= LANGUAGE_SAMPLE_CHARS:
+                self._start()
+        except Exception as e:
+            self._fail(e)
+    
+    def finish(self) -> Tuple[Dict[str, Any], Optional[TextProfile]]:
+        """The analysis results of the whole text, and its profile unless analysis failed."""
+        if self._phrases is not None:
+            self.phrase_counts = self._phrases.counts()
+        if self._compressor is not None:
+            self._compressed.append(self._compressor.flush())
+            self.compressed_text = b''.join(self._compressed)
+        # Short-circuit if empty
+        if not self.has_text:
+            return {
+                'language': 'unknown',
+                'word_count': 0,
+                'text_preview': '[No content to analyze]'
+            }, None
+        text_preview = self._head[:500] + "..." if self.character_count > 500 else self._head
+        results, profile = None, None
+        if not self._failed:
+            try:
+                if self._builder is None:
+                    self._start()
+                self._builder.finish()
+                profile = self._builder.profile
+                language, analyzer, stopwords = self._resolved
+                results = profile_results(
+                    profile, language, analyzer, stopwords, self.keyword_engine,
+                    self.character_count, text_preview
+                )
+            except Exception as e:
+                self._fail(e)
+                profile = None
+        if results is None:
+            results = fallback_analysis(self._split_words, self.character_count, text_preview)
+        if self.word_or_phrase is not None:
+            results = with_query(results, self.word_or_phrase, self.phrase_counts[self.word_or_phrase])
+        return results, profile
+    
+    def _start(self) -> None:
+        """Detect the language and analyze the pages read so far."""
+        self._resolved = self.resolve(''.join(self._pending)[:LANGUAGE_SAMPLE_CHARS])
+        self._builder = ProfileBuilder(self._resolved[1])
+        pending, self._pending = self._pending, []
+        for page in pending:
+            self._builder.feed(page)
+    
+    def _fail(self, error: Exception) -> None:
+        logger.error(f"Content analysis failed: {error}")
+        self._failed = True
+        self._builder = None
+        self._pending = []
+
+def analyze_pdf_pages(
+        content: Union[bytes, Path],
+        word_or_phrase: Optional[str],
+        resolve: Callable[[str, Optional[str]], Tuple[str, ContentAnalyzer, set]],
+        keyword_engine: Optional[KeywordEngine] = None,
+        keep_text: bool = False,
+        phrases: Iterable[str] = ()
+    ) -> Tuple[PdfMetadata, Dict[str, Any], Optional[TextProfile], Optional[bytes], Dict[str, int]]:
+    """
+    Extract and analyze a PDF page by page without building its full text
+    (see PageStreamAnalysis). resolve is given the text sample and the
+    language the document declares. Returns the metadata, the analysis results, the
+    text profile (None if the analysis failed or found no text), with
+    keep_text the zlib-compressed text, and the counts of `phrases`.
+    """
+    try:
+        with open_pdf(content) as doc:
+            metadata_dict = read_metadata(doc, content)
+            try:
+                _ = doc.page_count
+            except Exception:
+                raise EncryptedPdfError("PDF is encrypted and cannot be read.")
+            
+            declared = metadata_dict['language']
+            analysis = PageStreamAnalysis(
+                word_or_phrase, lambda sample: resolve(sample, declared), keyword_engine, keep_text, phrases
+            )
+            for page in doc:
+                analysis.feed(page.get_text())
+            
+            # The status only depends on whether any page had non-whitespace text
+            metadata = PdfMetadata(
+                **metadata_dict,
+                extraction_status=extraction_status(doc.is_encrypted, 'text' if analysis.has_text else '')
+            )
+    except Exception as e:
+        if "password" in str(e).lower():
+            raise EncryptedPdfError("PDF requires password")
+        raise ProcessingError(f"PDF parsing failed: {e}")
+    
+    results, profile = analysis.finish()
+    return metadata, results, profile, analysis.compressed_text, analysis.phrase_counts
@@ -13,33 +13,45 @@ import os
 import re
 import time
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from multiprocessing import resource_tracker, shared_memory
 from pathlib import Path
-from typing import Dict, Optional, Any, List
-
-import aiohttp
-import fitz
-import nltk
-from langdetect import detect
+from typing import TYPE_CHECKING, Dict, Optional, Any, Iterable, List, Union, Callable, Awaitable
 
 # Import from modules
 from config import (
     MAX_PDF_SIZE, DOWNLOAD_TIMEOUT, MAX_RETRIES, 
-    BACKOFF_FACTOR, ALLOWED_CONTENT_TYPES
+    BACKOFF_FACTOR, ALLOWED_CONTENT_TYPES, EXECUTOR_BACKEND,
+    PAGE_PARALLEL_THRESHOLD, CHUNK_SIZE, SPOOL_MAX_MEMORY,
+    CONNECTION_LIMIT, CONNECTION_LIMIT_PER_HOST, DNS_CACHE_TTL, KEEPALIVE_TIMEOUT,
+    MAX_CONCURRENT_DOWNLOADS, KEYWORD_MODE, KEEP_FULL_TEXT, LANGUAGE_SAMPLE_CHARS,
+    LANGUAGE_FAST_PATH, WORKER_START_METHOD, WORKER_MAX_TASKS, KEEP_COMPRESSED_TEXT
 )
 from exceptions import (
     ProcessingError, InvalidFileError, EncryptedPdfError, 
     FileTooLargeError
 )
-from models import PdfMetadata, ProcessingStatistics, ExtractionStatus
+from models import PdfMetadata, ProcessingStatistics, ExtractionStatus, DownloadedPdf
 from utils import setup_logging
-from cache import Cache, SimpleMemoryCache
-from text_analysis import ContentAnalyzer
+from cache import Cache, SimpleMemoryCache, SqliteCache
+from text_analysis import ContentAnalyzer, load_stopwords
 from batch import PdfBatch
+from keywords import KeywordEngine
+from language import detect_language
 from search import PdfSearchEngine
-from pdf_ops import process_pdf_content, analyze_text_content
-from validators import validate_pdf_signature, validate_file_size
+from pdf_ops import (
+    process_pdf_content, analyze_text_content, extract_page_range,
+    extraction_status, split_page_ranges, matching_keywords,
+    analyze_pdf_pages, fallback_analysis, with_query, document_phrase_counts
+)
+from validators import validate_pdf_signature, PDF_HEADER_WINDOW
+from spool import PdfSpool
+import workers
+
+if TYPE_CHECKING:
+    import aiohttp
 
 # Configure logging
 logger = setup_logging()
@@ -58,7 +70,20 @@ class PdfProcessor:
         pdf_url: Optional[str] = None,
         cache: Optional[Cache] = None,
         max_workers: Optional[int] = None,
-        storage_path: Optional[Path] = None
+        storage_path: Optional[Path] = None,
+        executor_backend: Optional[str] = None,
+        page_parallel_threshold: Optional[int] = None,
+        connection_limit: Optional[int] = None,
+        connection_limit_per_host: Optional[int] = None,
+        max_downloads: Optional[int] = None,
+        max_cpu_jobs: Optional[int] = None,
+        persistent_cache: bool = False,
+        keyword_mode: Optional[str] = None,
+        keep_full_text: Optional[bool] = None,
+        keep_compressed_text: Optional[bool] = None,
+        language_fast_path: Optional[bool] = None,
+        worker_start_method: Optional[str] = None,
+        max_tasks_per_child: Optional[int] = None
     ):
         """
         Initialize the PDF processor.
@@ -66,125 +91,276 @@ class PdfProcessor:
         Args:
             pdf_url: Optional URL of the PDF to process.
             cache: Optional cache instance.
-            max_workers: Maximum number of threads for text extraction.
+            max_workers: Maximum number of workers for extraction and analysis.
             storage_path: Path to store temporary data.
+            executor_backend: "thread" or "process" pool for CPU-bound work.
+            page_parallel_threshold: Page count from which a single document is
+                extracted page-parallel (process backend only, 0 disables).
+            connection_limit: Total connections in the shared HTTP pool.
+            connection_limit_per_host: Connections per host in the shared HTTP pool.
+            max_downloads: Maximum downloads in flight at once.
+            max_cpu_jobs: Maximum extraction/analysis jobs submitted to the pool
+                at once (defaults to max_workers).
+            persistent_cache: When no cache is given, keep results in a SQLite
+                cache under storage_path instead of in memory.
+            keyword_mode: "tf" ranks keywords by frequency within each document;
+                "idf" ranks them against corpus document frequencies kept per
+                language under storage_path (defaults to KEYWORD_MODE).
+            keep_full_text: Return (and cache) the extracted text as full_text.
+                When False, pages are analyzed as they are extracted and the
+                text is never assembled; full_text is None (defaults to
+                KEEP_FULL_TEXT).
+            keep_compressed_text: With keep_full_text=False, cache the text
+                zlib-compressed so that any later phrase can be counted. When
+                False, only the phrases asked for are counted as the pages are
+                read, and a new phrase downloads the document again (defaults
+                to KEEP_COMPRESSED_TEXT).
+            language_fast_path: Trust the language a PDF declares, or a clear
+                stopword majority, before running statistical detection
+                (defaults to LANGUAGE_FAST_PATH).
+            worker_start_method: "fork", "spawn" or "forkserver" for the
+                process backend's workers. "forkserver" loads the NLP models
+                once in the fork server and forks warm workers from it
+                (defaults to WORKER_START_METHOD, else the platform default).
+            max_tasks_per_child: Replace the process pool once it has been
+                given this many tasks per worker (max_tasks_per_child *
+                max_workers in all), to bound leaks. Running tasks finish in
+                the old workers (defaults to WORKER_MAX_TASKS, None never
+                replaces it).
         """
         self.url = pdf_url
-        self.cache = cache or SimpleMemoryCache()
-        self.max_workers = max_workers or min(32, (multiprocessing.cpu_count() or 1) * 4)
         self.storage_path = storage_path or Path.home() / ".pdfprocessor"
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        # Caches created here are closed with the processor
+        self._owns_cache = cache is None
+        if cache is None:
+            cache = SqliteCache(self.storage_path / "cache.sqlite3") if persistent_cache else SimpleMemoryCache()
+        self.cache = cache
+        self.executor_backend = executor_backend or EXECUTOR_BACKEND
+        if self.executor_backend not in ("thread", "process"):
+            raise ValueError(f"Unknown executor backend: {self.executor_backend}")
+        if self.executor_backend == "process":
+            self.max_workers = max_workers or (multiprocessing.cpu_count() or 1)
+        else:
+            self.max_workers = max_workers or min(32, (multiprocessing.cpu_count() or 1) * 4)
+        self._executor: Optional[Executor] = None
+        self.worker_start_method = worker_start_method or WORKER_START_METHOD
+        self.max_tasks_per_child = max_tasks_per_child or WORKER_MAX_TASKS
+        if self.worker_start_method not in (None, *multiprocessing.get_all_start_methods()):
+            raise ValueError(f"Unknown worker start method: {self.worker_start_method}")
+        self._executor_tasks = 0
+        self.page_parallel_threshold = (
+            PAGE_PARALLEL_THRESHOLD if page_parallel_threshold is None else page_parallel_threshold
+        )
+        self.connection_limit = connection_limit or CONNECTION_LIMIT
+        self.connection_limit_per_host = connection_limit_per_host or CONNECTION_LIMIT_PER_HOST
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.max_downloads = max_downloads or MAX_CONCURRENT_DOWNLOADS
+        self.max_cpu_jobs = max_cpu_jobs or self.max_workers
+        self._slots: Optional[tuple[asyncio.Semaphore, asyncio.Semaphore]] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
         
         self.stats = ProcessingStatistics()
         self._correlation_id = '-'
         
         # Cache for ContentAnalyzer instances (reused across calls)
         self.analyzers: Dict[str, ContentAnalyzer] = {}
+        self.keep_full_text = KEEP_FULL_TEXT if keep_full_text is None else keep_full_text
+        self.keep_compressed_text = KEEP_COMPRESSED_TEXT if keep_compressed_text is None else keep_compressed_text
+        self.language_fast_path = LANGUAGE_FAST_PATH if language_fast_path is None else language_fast_path
+        self.keywords = KeywordEngine(self.storage_path / "keywords", keyword_mode or KEYWORD_MODE)
+    
+    def _get_executor(self) -> Executor:
+        """
+        Return the pool for the next CPU-bound job, creating it on first use.
+        Every job is counted, so call this once per submission. A process pool
+        that has been given max_tasks_per_child jobs per worker is retired
+        first. The retired pool's running jobs finish in its workers, and new
+        jobs go to a fresh pool.
+        """
+        if (
+            self._executor is not None
+            and self.executor_backend == "process"
+            and self.max_tasks_per_child
+            and self._executor_tasks >= self.max_tasks_per_child * self.max_workers
+        ):
+            retired, self._executor = self._executor, None
+            retired.shutdown(wait=False)
+        if self._executor is None:
+            self._executor_tasks = 0
+            if self.executor_backend == "process":
+                # Start the resource tracker before forking so workers share it;
+                # otherwise each worker reports the shared page buffers as leaked
+                resource_tracker.ensure_running()
+                # Workers load the NLP models and warm analyzers as they start; see workers.init_worker
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=self._worker_context(),
+                    initializer=workers.init_worker
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                # Threads share this process's NLP models; load them on a pool
+                # thread while the first job extracts its PDF (not counted:
+                # only process pools are recycled)
+                self._executor.submit(workers.warm_up)
+        self._executor_tasks += 1
+        return self._executor
+    
+    def _worker_context(self) -> Optional[multiprocessing.context.BaseContext]:
+        """The multiprocessing context worker processes start from (None for the default)."""
+        if self.worker_start_method is None:
+            return None
+        context = multiprocessing.get_context(self.worker_start_method)
+        if self.worker_start_method == "forkserver":
+            # Takes effect when this process starts its fork server
+            context.set_forkserver_preload(["preload"])
+        return context
+    
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """
+        Return the shared HTTP session, creating it on first use.
         
-        # Initialize NLTK data at startup
-        self._ensure_nltk_data()
+        Sessions are bound to the event loop they were created in, so a new
+        one is opened if the processor is reused from another loop.
+        """
+        loop = asyncio.get_event_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
     
-    def _ensure_nltk_data(self) -> None:
-        """Ensure all required NLTK data is downloaded."""
-        try:
-            # Check for data presence 
-            nltk.data.find('tokenizers/punkt')
-            nltk.data.find('tokenizers/punkt_tab')
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            logger.info("Downloading required NLTK data...")
-            try:
-                nltk.download('punkt', quiet=True)
-                nltk.download('punkt_tab', quiet=True)
-                nltk.download('stopwords', quiet=True)
-                
-                # Verify download success
-                nltk.data.find('tokenizers/punkt')
-                nltk.data.find('corpora/stopwords')
-            except Exception as e:
-                logger.error(f"Failed to download NLTK data: {e}")
-                raise ProcessingError(f"Critical NLTK data missing and download failed: {e}")
+    def _get_slots(self) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        """
+        Return the (download, cpu) semaphores bounding work in flight.
+        
+        Like the session, they are bound to the loop they were created in.
+        """
+        loop = asyncio.get_event_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = (asyncio.Semaphore(self.max_downloads), asyncio.Semaphore(self.max_cpu_jobs))
+            self._slots_loop = loop
+        return self._slots
+    
+    async def _close_session(self) -> None:
+        if self._session is not None:
+            session, self._session = self._session, None
+            if not session.closed and self._session_loop is asyncio.get_event_loop():
+                await session.close()
+            self._session_loop = None
+    
+    async def close(self) -> None:
+        """Release pooled resources owned by this processor."""
+        await self._close_session()
+        if self._owns_cache:
+            self.cache.close()
+        self.keywords.close()
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_event_loop().run_in_executor(None, executor.shutdown)
+    
+    async def __aenter__(self) -> "PdfProcessor":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
     
     def _get_nltk_stopwords(self, language: str) -> set:
         """
         Map detected language code to NLTK language name and return its stopwords.
         If the mapping is not available, it attempts to use the provided language directly.
         """
-        lang_mapping = {
-            "en": "english",
-            "fr": "french",
-            "de": "german",
-            "es": "spanish",
-            "it": "italian",
-            "pt": "portuguese",
-            "nl": "dutch",
-            "sv": "swedish",
-            "no": "norwegian",
-            "fi": "finnish",
-            "ru": "russian"
-            # Add more mappings as needed
-        }
-        nltk_lang = lang_mapping.get(language, language)
-        try:
-            return set(nltk.corpus.stopwords.words(nltk_lang))
-        except LookupError:
-            logger.warning(f"Stopwords not available for {nltk_lang}, using empty set")
-            return set()
+        return load_stopwords(language)
     
     async def process_url(self, url: str, word_or_phrase: str) -> Dict[str, Any]:
-        """Process a PDF from URL."""
+        """
+        Process a PDF from URL.
+        
+        The analysis is cached independently of word_or_phrase; the search term
+        fields (search_term_count, matching_keywords) are derived from the cached
+        document on every call. Concurrent calls for the same URL share one
+        download and analysis, as do concurrent downloads that turn out to have
+        identical content. A streamed document whose text is not kept (see
+        keep_compressed_text) is downloaded again for a phrase it was not
+        streamed with.
+        """
+        document = await self._get_document(url, [word_or_phrase])
+        counts = await self._count_phrases(document, [word_or_phrase])
+        results = {key: value for key, value in document.items() if key not in self._RECORD_ONLY}
+        results['analysis'] = with_query(document['analysis'], word_or_phrase, counts[word_or_phrase])
+        return results
+    
+    async def query_url(self, url: str, phrases: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Count many phrases in a PDF at once. The document is processed (or taken
+        from the cache) as by process_url, and its text is scanned a single time
+        for all phrases. Returns each phrase's search_term_count and
+        matching_keywords.
+        """
+        phrases = list(phrases)
+        document = await self._get_document(url, phrases)
+        counts = await self._count_phrases(document, phrases)
+        keywords = document['analysis'].get('keywords', [])
+        return {
+            phrase: {
+                'search_term_count': count,
+                'matching_keywords': matching_keywords(keywords, phrase)
+            }
+            for phrase, count in counts.items()
+        }
+    
+    # Fields of a cached record that are not part of process_url's results
+    _RECORD_ONLY = ('compressed_text', 'phrase_counts', 'validators')
+    
+    @staticmethod
+    def _can_count(document: Dict[str, Any], phrases: List[str]) -> bool:
+        """Whether a processed document kept its text, or counted these phrases while streaming."""
+        if document.get('full_text') is not None or document.get('compressed_text') is not None:
+            return True
+        return set(phrases) <= document.get('phrase_counts', {}).keys()
+    
+    async def _count_phrases(self, document: Dict[str, Any], phrases: List[str]) -> Dict[str, int]:
+        """Whole-word occurrences of each phrase in a processed document's text."""
+        if document.get('full_text') is None and document.get('compressed_text') is None:
+            return {phrase: document['phrase_counts'][phrase] for phrase in phrases}
+        return await asyncio.get_event_loop().run_in_executor(
+            None, document_phrase_counts, document.get('full_text'), document.get('compressed_text'), phrases
+        )
+    
+    async def _get_document(self, url: str, phrases: List[str]) -> Dict[str, Any]:
+        """
+        The phrase-independent results for a URL, from the cache or freshly
+        processed, able to count `phrases` (see _can_count).
+        """
         self._correlation_id = hashlib.md5(url.encode()).hexdigest()[:8]
         self.stats.start_time = time.time()
         
         try:
             # Check cache
-            cache_key = f"pdf_analysis_{hashlib.md5(url.encode()).hexdigest()}"
+            url_digest = hashlib.md5(url.encode()).hexdigest()
+            cache_key = f"pdf_analysis_{url_digest}"
             cached_result = self.cache.get(cache_key)
-            if cached_result:
+            if cached_result and self._can_count(cached_result, phrases):
                 logger.info("Returning cached result")
                 return cached_result
             
-            # Download and validate
-            content = await self._download_pdf(url)
-            
-            # Processing Phase
-            text, metadata = await self._process_pdf(content)
-            
-            # If failed or scanned, skip analysis but return metadata
-            if metadata.extraction_status != ExtractionStatus.SUCCESS:
-                logger.warning(f"Analysis skipped due to status: {metadata.extraction_status.value}")
-                analysis_results = {
-                    'language': 'unknown',
-                    'word_count': 0,
-                    'keywords': [],
-                    'text_preview': '[Analysis skipped: No extractable text found]'
-                }
-            else:
-                # Analyze content
-                analysis_results = await self._analyze_content(text, word_or_phrase)
-            
-            # Update statistics
-            self.stats.end_time = time.time()
-            self.stats.processing_time = self.stats.end_time - self.stats.start_time
-            self.stats.total_words = analysis_results.get('word_count', 0)
-            
-            # Format timestamps for presentation
-            stats_dict = dataclasses.asdict(self.stats)
-            stats_dict['start_time'] = datetime.fromtimestamp(self.stats.start_time).isoformat()
-            stats_dict['end_time'] = datetime.fromtimestamp(self.stats.end_time).isoformat() if self.stats.end_time else None
-            
-            # Prepare results without the full text
-            results = {
-                "metadata": metadata.to_dict(),
-                "analysis": analysis_results,
-                "statistics": stats_dict,
-                "full_text": text
-            }
-            
-            # Cache results
-            self.cache.put(cache_key, results)
-            
-            return results
+            document = await self._single_flight(
+                cache_key,
+                lambda: self._fetch_and_process(url, url_digest, phrases)
+            )
+            if not self._can_count(document, phrases):
+                # A coalesced call streamed other phrases: stream it again for these
+                document = await self._fetch_and_process(url, url_digest, phrases)
+            return document
             
         except ProcessingError as e:
             logger.error(f"Processing error: {e}")
@@ -193,47 +369,239 @@ class PdfProcessor:
             logger.error(f"Unexpected error: {e}")
             raise ProcessingError(f"Failed to process PDF: {str(e)}")
     
-    async def _download_pdf(self, url: str) -> bytes:
-        """Download PDF with strict validation."""
-        async with aiohttp.ClientSession() as session:
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Enforce strict size check if Content-Length is available
-                    async with session.get(url, timeout=DOWNLOAD_TIMEOUT) as response:
-                        response.raise_for_status()
-                        
-                        content_length = response.headers.get("Content-Length")
-                        if content_length and int(content_length) > MAX_PDF_SIZE:
-                            raise FileTooLargeError(f"File size exceeds limit ({content_length} bytes)")
-                        
-                        # Validate content type (advisory check)
-                        content_type = response.headers.get("Content-Type", "").split(";")[0]
-                        if content_type not in ALLOWED_CONTENT_TYPES:
-                             logger.warning(f"Advisory: Unexpected content type {content_type}")
+    async def _single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() at most once at a time per key; concurrent callers await
+        the same task. The task is shielded, so one caller being cancelled does
+        not cancel the work for the others.
+        """
+        task = self._in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_event_loop():
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._end_flight, key))
+        return await asyncio.shield(task)
+    
+    def _end_flight(self, key: str, task: asyncio.Future) -> None:
+        """Forget a finished task, unless a newer one has taken its key."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+    
+    async def _fetch_and_process(self, url: str, url_digest: str, phrases: List[str]) -> Dict[str, Any]:
+        """
+        Download (or revalidate) a URL and analyze it unless its content is
+        cached with the means to count `phrases`.
+        """
+        cache_key = f"pdf_analysis_{url_digest}"
+        
+        # An expired result can be revalidated instead of re-downloaded; the
+        # record keeps the validators of every URL it was downloaded from
+        stale_result = self.cache.get_stale(cache_key)
+        if stale_result and not self._can_count(stale_result, phrases):
+            stale_result = None  # a 304 could not answer these phrases
+        validators = stale_result.get('validators', {}).get(url_digest) if stale_result else None
+        
+        # Download and validate
+        download = await self._download_pdf(url, validators)
+        if download is None:
+            logger.info("Remote PDF not modified, reusing cached result")
+            self.cache.put(cache_key, stale_result)
+            return stale_result
+        
+        try:
+            # The same document fetched from another URL (e.g. a mirror) is a hit too
+            content_key = f"pdf_content_{download.sha256}"
+            cached_result = self.cache.get(content_key)
+            if cached_result and self._can_count(cached_result, phrases):
+                logger.info("Returning cached result for identical content")
+                results = cached_result
+            else:
+                results = await self._single_flight(
+                    content_key,
+                    lambda: self._process_download(download, phrases)
+                )
+                if not self._can_count(results, phrases):
+                    results = await self._process_download(download, phrases)
+        finally:
+            # No-op for the download that was processed (it is discarded there)
+            download.discard()
+        
+        if download.etag or download.last_modified:
+            results.setdefault('validators', {})[url_digest] = {
+                'etag': download.etag,
+                'last_modified': download.last_modified
+            }
+            self.cache.put(content_key, results)  # persistent caches store the record once more
+        self.cache.put(cache_key, results)
+        return results
+    
+    async def _process_download(self, download: DownloadedPdf, phrases: List[str]) -> Dict[str, Any]:
+        """
+        Extract and analyze a downloaded PDF, caching the result under its
+        content hash. A streamed document that does not keep its text counts
+        `phrases` as it goes, adding to the counts cached for the same content.
+        """
+        # Processing Phase
+        try:
+            if self.keep_full_text:
+                text, metadata = await self._process_pdf(download.source)
+                compressed_text = None
+            else:
+                # Pages are analyzed as they are extracted; no full text is built
+                text = None
+                metadata, streamed_analysis, compressed_text, phrase_counts = await self._stream_pdf(
+                    download.source, [] if self.keep_compressed_text else phrases, download.sha256
+                )
+        finally:
+            download.discard()
+        
+        # If failed or scanned, skip analysis but return metadata
+        if metadata.extraction_status != ExtractionStatus.SUCCESS:
+            logger.warning(f"Analysis skipped due to status: {metadata.extraction_status.value}")
+            analysis_results = {
+                'language': 'unknown',
+                'word_count': 0,
+                'keywords': [],
+                'text_preview': '[Analysis skipped: No extractable text found]'
+            }
+        elif text is None:
+            analysis_results = streamed_analysis
+        else:
+            # Analyze content
+            analysis_results = await self._analyze_content(text, metadata.language, download.sha256)
+        
+        # Update statistics
+        self.stats.end_time = time.time()
+        self.stats.processing_time = self.stats.end_time - self.stats.start_time
+        self.stats.total_words = analysis_results.get('word_count', 0)
+        
+        # Format timestamps for presentation
+        stats_dict = dataclasses.asdict(self.stats)
+        stats_dict['start_time'] = datetime.fromtimestamp(self.stats.start_time).isoformat()
+        stats_dict['end_time'] = datetime.fromtimestamp(self.stats.end_time).isoformat() if self.stats.end_time else None
+        
+        # Prepare phrase-independent results; streamed documents keep their
+        # text compressed for later phrase counts, or the counts made so far
+        content_key = f"pdf_content_{download.sha256}"
+        results = {
+            "metadata": metadata.to_dict(),
+            "analysis": analysis_results,
+            "statistics": stats_dict,
+            "full_text": text
+        }
+        if compressed_text is not None:
+            results["compressed_text"] = compressed_text
+        elif text is None:
+            counted = self.cache.get_stale(content_key) or {}
+            results["phrase_counts"] = {**counted.get('phrase_counts', {}), **phrase_counts}
+        
+        # Cache results under the content hash (callers add the URL key)
+        self.cache.put(content_key, results)
+        
+        return results
+    
+    async def _download_pdf(
+        self,
+        url: str,
+        validators: Optional[Dict[str, Optional[str]]] = None
+    ) -> Optional[DownloadedPdf]:
+        """
+        Stream a PDF download with strict validation.
+        
+        The body is read in CHUNK_SIZE pieces: the signature is checked as soon
+        as the header window has arrived and the size limit is enforced while
+        streaming. Bodies larger than SPOOL_MAX_MEMORY are spooled to a file
+        under storage_path instead of being held in memory.
+        
+        With validators (the 'etag'/'last_modified' of a previous download) the
+        request is conditional, and None is returned if the server answers
+        304 Not Modified.
+        """
+        download_slots, _ = self._get_slots()
+        async with download_slots:
+            return await self._download_with_retries(url, validators)
+    
+    async def _download_with_retries(
+        self,
+        url: str,
+        validators: Optional[Dict[str, Optional[str]]]
+    ) -> Optional[DownloadedPdf]:
+        session = self._get_session()
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        
+        for attempt in range(MAX_RETRIES):
+            try:
+                # Enforce strict size check if Content-Length is available
+                async with session.get(url, timeout=DOWNLOAD_TIMEOUT, headers=headers) as response:
+                    if response.status == 304 and headers:
+                        return None
+                    response.raise_for_status()
+                    
+                    content_length = response.headers.get("Content-Length")
+                    if content_length and int(content_length) > MAX_PDF_SIZE:
+                        raise FileTooLargeError(f"File size exceeds limit ({content_length} bytes)")
+                    
+                    # Validate content type (advisory check)
+                    content_type = response.headers.get("Content-Type", "").split(";")[0]
+                    if content_type not in ALLOWED_CONTENT_TYPES:
+                         logger.warning(f"Advisory: Unexpected content type {content_type}")
 
-                        content = await response.read()
-                        
-                        if not validate_file_size(content):
-                            raise FileTooLargeError("File size exceeds limit after download")
-                            
-                        if not validate_pdf_signature(content):
-                            raise InvalidFileError("File does not have a valid PDF signature (%PDF-)")
-                        
-                        return content
-                        
-                except ProcessingError:
-                    raise  # Re-raise known errors immediately
-                except Exception as e:
-                    if attempt == MAX_RETRIES - 1:
-                        raise ProcessingError(f"Failed to download PDF: {str(e)}")
-                    await asyncio.sleep(BACKOFF_FACTOR ** attempt)
-    
-    async def _process_pdf(self, content: bytes) -> tuple[str, PdfMetadata]:
+                    download = await self._stream_body(response)
+                    download.etag = response.headers.get("ETag")
+                    download.last_modified = response.headers.get("Last-Modified")
+                    return download
+                    
+            except ProcessingError:
+                raise  # Re-raise known errors immediately
+            except Exception as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise ProcessingError(f"Failed to download PDF: {str(e)}")
+                await asyncio.sleep(BACKOFF_FACTOR ** attempt)
+    
+    async def _stream_body(self, response: "aiohttp.ClientResponse") -> DownloadedPdf:
+        """Read a response body chunk by chunk into a spool, validating as it arrives."""
+        spool = PdfSpool(self.storage_path / "spool", SPOOL_MAX_MEMORY)
+        header = b''
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if len(header) < PDF_HEADER_WINDOW:
+                    header += chunk[:PDF_HEADER_WINDOW - len(header)]
+                    if len(header) == PDF_HEADER_WINDOW and not validate_pdf_signature(header):
+                        raise InvalidFileError("File does not have a valid PDF signature (%PDF-)")
+                
+                spool.write(chunk)
+                if spool.size > MAX_PDF_SIZE:
+                    raise FileTooLargeError(f"File size exceeds limit ({MAX_PDF_SIZE} bytes)")
+            
+            # Bodies shorter than the header window are validated once complete
+            if not validate_pdf_signature(header):
+                raise InvalidFileError("File does not have a valid PDF signature (%PDF-)")
+            
+            return spool.finish()
+        except BaseException:
+            spool.discard()
+            raise
+    
+    async def _process_pdf(self, content: Union[bytes, Path]) -> tuple[str, PdfMetadata]:
         """Process PDF content with encryption and text checks."""
         loop = asyncio.get_event_loop()
+        _, cpu_slots = self._get_slots()
+        # Splitting pages only pays off when workers are separate processes
+        split_threshold = self.page_parallel_threshold if self.executor_backend == "process" else None
         try:
-             # Run the pure function in executor
-            full_text, metadata = await loop.run_in_executor(None, process_pdf_content, content)
+            async with cpu_slots:
+                 # Run the pure function in executor
+                full_text, metadata = await loop.run_in_executor(
+                    self._get_executor(), process_pdf_content, content, split_threshold
+                )
+                if full_text is None:
+                    full_text = await self._extract_pages_parallel(content, metadata.page_count)
+                    metadata.extraction_status = extraction_status(metadata.encrypted, full_text)
             
             # Update stats based on results
             self.stats.total_pages = metadata.page_count
@@ -243,8 +611,97 @@ class PdfProcessor:
         except Exception as e:
             raise ProcessingError(f"PDF parsing failed: {e}")
     
-    async def _analyze_content(self, text: str, word_or_phrase: str) -> Dict[str, Any]:
-        """Perform content analysis with improved search term counting and output formatting."""
+    async def _stream_pdf(
+            self,
+            content: Union[bytes, Path],
+            phrases: List[str],
+            digest: Optional[str] = None
+        ) -> tuple[PdfMetadata, Dict[str, Any], Optional[bytes], Dict[str, int]]:
+        """
+        Extract and analyze a PDF page by page in one job, without assembling
+        its text. Also returns the text zlib-compressed if keep_compressed_text,
+        and the counts of `phrases`. `digest` identifies the content to the
+        corpus IDF tables, which count each document once.
+        """
+        loop = asyncio.get_event_loop()
+        _, cpu_slots = self._get_slots()
+        try:
+            async with cpu_slots:
+                if self.executor_backend == "process":
+                    # Corpus IDF tables live in this process: rank the worker's n-gram counts here
+                    metadata, analysis, ngram_counts, compressed_text, phrase_counts = await loop.run_in_executor(
+                        self._get_executor(),
+                        workers.analyze_pdf,
+                        content,
+                        self.keywords.mode == "idf",
+                        self.language_fast_path,
+                        self.keep_compressed_text,
+                        phrases
+                    )
+                    if ngram_counts is not None:
+                        analysis['keywords'] = self.keywords.keywords(analysis['language'], ngram_counts, document=digest)
+                else:
+                    metadata, analysis, _, compressed_text, phrase_counts = await loop.run_in_executor(
+                        self._get_executor(),
+                        analyze_pdf_pages,
+                        content,
+                        None,
+                        self._resolve_language,
+                        self.keywords.for_document(digest),
+                        self.keep_compressed_text,
+                        phrases
+                    )
+        except Exception as e:
+            raise ProcessingError(f"PDF parsing failed: {e}")
+        
+        self.stats.total_pages = metadata.page_count
+        self.stats.processed_pages += metadata.page_count
+        return metadata, analysis, compressed_text, phrase_counts
+    
+    def _resolve_language(self, sample: str, declared: Optional[str] = None) -> tuple[str, ContentAnalyzer, set]:
+        """Detect a text's language from its sample; return the analyzer and stopwords for it."""
+        language = detect_language(sample, declared, self.language_fast_path)
+        return language, self._get_analyzer(language), self._get_nltk_stopwords(language)
+    
+    def _get_analyzer(self, language: str) -> ContentAnalyzer:
+        """Get or create the ContentAnalyzer for a language (Singleton/Cache pattern)."""
+        if language not in self.analyzers:
+            logger.info(f"Initializing ContentAnalyzer for language: {language}")
+            self.analyzers[language] = ContentAnalyzer(language)
+        return self.analyzers[language]
+    
+    async def _extract_pages_parallel(self, content: Union[bytes, Path], page_count: int) -> str:
+        """Extract page ranges in parallel workers that share one copy of the bytes."""
+        loop = asyncio.get_event_loop()
+        ranges = split_page_ranges(page_count, self.max_workers)
+        
+        if isinstance(content, Path):
+            # Spooled downloads are already shared through the page cache
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(self._get_executor(), extract_page_range, content, start, stop)
+                for start, stop in ranges
+            ))
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(1, len(content)))
+            try:
+                shm.buf[:len(content)] = content
+                chunks = await asyncio.gather(*(
+                    loop.run_in_executor(self._get_executor(), extract_page_range, shm.name, start, stop, len(content))
+                    for start, stop in ranges
+                ))
+            finally:
+                shm.close()
+                shm.unlink()
+        # Ranges are gathered in submission order, so pages stay in order
+        return ''.join(text for chunk in chunks for text in chunk)
+    
+    async def _analyze_content(self, text: str, declared: Optional[str] = None,
+                               digest: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Perform the phrase-independent content analysis of a document's text.
+        Its language is detected in the pool too, off the event loop; declared
+        is the language the document claims (see language.detect_language).
+        """
         try:
             # Short-circuit if empty
             if not text.strip():
@@ -253,48 +710,53 @@ class PdfProcessor:
                     'word_count': 0, 
                     'text_preview': '[No content to analyze]'
                 }
-                
-            # Detect language using a snippet
-            language = detect(text[:10000]) if text.strip() else "unknown"
-            
-            # Get or create analyzer (Singleton/Cache pattern)
-            if language not in self.analyzers:
-                logger.info(f"Initializing ContentAnalyzer for language: {language}")
-                self.analyzers[language] = ContentAnalyzer(language)
             
-            analyzer = self.analyzers[language]
-            
-            # Get stopwords for this language (helper method)
-            stopwords = self._get_nltk_stopwords(language)
-            
-            # Perform analysis in executor
             loop = asyncio.get_event_loop()
+            _, cpu_slots = self._get_slots()
             
-            # Pass all pure data needed for analysis
-            return await loop.run_in_executor(
-                None, 
-                analyze_text_content, 
-                text, 
-                word_or_phrase, 
-                language, 
-                analyzer, 
-                stopwords
-            )
+            if self.executor_backend == "process":
+                # Worker processes hold their own analyzers and stopwords,
+                # so only the text is sent across
+                if self.keywords.mode == "tf":
+                    async with cpu_slots:
+                        return await loop.run_in_executor(
+                            self._get_executor(),
+                            workers.analyze_text,
+                            text,
+                            None,
+                            None,
+                            declared,
+                            self.language_fast_path
+                        )
+                # Corpus IDF tables live in this process: rank the worker's n-gram counts here
+                async with cpu_slots:
+                    result, ngram_counts = await loop.run_in_executor(
+                        self._get_executor(),
+                        workers.analyze_text_ngrams,
+                        text,
+                        None,
+                        None,
+                        declared,
+                        self.language_fast_path
+                    )
+                result['keywords'] = self.keywords.keywords(result['language'], ngram_counts, document=digest)
+                return result
+            
+            async with cpu_slots:
+                return await loop.run_in_executor(self._get_executor(), self._analyze_text, text, declared, digest)
             
         except Exception as e:
             logger.error(f"Content analysis failed: {e}")
-            return {
-                'language': 'unknown',
-                'word_count': len(text.split()),
-                'character_count': len(text),
-                'sentence_count': 0,
-                'search_term_count': text.lower().count(word_or_phrase.lower()),
-                'keywords': [],
-                'matching_keywords': [],
-                'readability_score': 0.0,
-                'text_preview': text[:500] + "..." if len(text) > 500 else text,
-                'top_words': {}
-            }
+            return fallback_analysis(
+                len(text.split()),
+                len(text),
+                text[:500] + "..." if len(text) > 500 else text
+            )
+    
+    def _analyze_text(self, text: str, declared: Optional[str], digest: Optional[str] = None) -> Dict[str, Any]:
+        """Detect a text's language and analyze it with the cached analyzer and stopwords (runs in the pool)."""
+        language, analyzer, stopwords = self._resolve_language(text[:LANGUAGE_SAMPLE_CHARS], declared)
+        return analyze_text_content(text, None, language, analyzer, stopwords, self.keywords.for_document(digest))
     
     def main(self, word_or_phrase: str) -> Dict[str, Any]:
         """
@@ -308,7 +770,15 @@ class PdfProcessor:
         """
         if not self.url:
             raise ValueError("PDF URL not provided.")
-        return asyncio.run(self.process_url(self.url, word_or_phrase))
+        
+        async def run() -> Dict[str, Any]:
+            try:
+                return await self.process_url(self.url, word_or_phrase)
+            finally:
+                # The session cannot outlive the loop asyncio.run creates
+                await self._close_session()
+        
+        return asyncio.run(run())
     
     def __call__(self, word_or_phrase: str) -> Dict[str, Any]:
         """
@@ -380,6 +850,7 @@ def print_search_results(search_results: List[Dict[str, Any]]) -> None:
 
 def setup_nltk_data() -> None:
     """Download required NLTK data."""
+    import nltk
     required_packages = ['punkt', 'stopwords', 'averaged_perceptron_tagger']
     for package in required_packages:
         try:
@@ -431,6 +902,8 @@ async def main():
     except Exception as e:
         print(f"Error: {e}")
         logger.error(f"Processing failed: {e}")
+    finally:
+        await processor.close()
 
 if __name__ == "__main__":
     # Run the example
@@ -0,0 +1,140 @@
+"""
+Counting many search phrases in one pass over a text.
+
+PhraseCounter counts, for every phrase at once, the non-overlapping
+whole-word occurrences re.findall(rf'\b{re.escape(phrase)}\b', text) would
+find in a lowercased text. Phrases are split into their runs of word
+characters and compiled into an Aho-Corasick automaton over those terms, so
+the text is tokenized once (by the C regex engine) and each token advances
+the automaton a single step, however many phrases there are. A term-level
+match is a candidate; it counts once the surrounding characters agree with
+the phrase (punctuation, spacing and word boundaries). Phrases without any
+word character are counted with their regex instead.
+
+Text may be fed in consecutive pieces, e.g. as pages are extracted: the
+last characters of each piece are carried over so that occurrences spanning
+two pieces are found.
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from tokenizer import TOKEN_PATTERN
+
+WORD_CHAR = re.compile(r'\w')
+
+def _is_word(char: str) -> bool:
+    return WORD_CHAR.match(char) is not None
+
+class PhraseCounter:
+    """Whole-word occurrence counts of many phrases in one lowercased text."""
+    
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = list(dict.fromkeys(phrases))
+        self._counts: Dict[str, int] = dict.fromkeys(self.phrases, 0)
+        self._last_end: Dict[str, int] = {}  # end of each phrase's last counted occurrence
+        self._patterns: List[Tuple[str, "re.Pattern"]] = []
+        # Automaton over terms: goto edges, failure links and, per state, the
+        # phrases ending there as (phrase, lowered phrase, offset of its first term, term count)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int, int]]] = [[]]
+        longest = 0
+        for phrase in self.phrases:
+            lowered = phrase.lower()
+            longest = max(longest, len(lowered))
+            terms = [(match.group(), match.start()) for match in TOKEN_PATTERN.finditer(lowered)]
+            if not terms:
+                if lowered:
+                    self._patterns.append((phrase, re.compile(rf'\b{re.escape(lowered)}\b')))
+                continue
+            state = 0
+            for term, _ in terms:
+                state = self._goto[state].setdefault(term, len(self._goto))
+                if state == len(self._goto):
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+            self._out[state].append((phrase, lowered, terms[0][1], len(terms)))
+        self._link()
+        # Characters kept from the previous piece: a whole occurrence plus the
+        # characters on either side that decide its word boundaries
+        self._reach = longest + 2
+        self._buffer = ''
+        self._offset = 0  # text offset of _buffer[0]
+        self._counted = 0  # occurrences ending by this text offset have been counted
+    
+    def _link(self) -> None:
+        """Set the failure links (breadth-first) and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for term, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and term not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(term, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+    
+    def feed(self, lowered: str) -> None:
+        """Count the occurrences completed by the next piece of lowercased text."""
+        self._buffer += lowered
+        # The character after an occurrence must be known to settle its end boundary
+        self._scan(len(self._buffer) - 1)
+        keep = min(len(self._buffer), self._reach)
+        self._offset += len(self._buffer) - keep
+        self._buffer = self._buffer[len(self._buffer) - keep:]
+    
+    def counts(self) -> Dict[str, int]:
+        """Occurrences of each phrase in all the text fed so far, which is taken to end here."""
+        self._scan(len(self._buffer))
+        return dict(self._counts)
+    
+    def _scan(self, limit: int) -> None:
+        """Count the occurrences ending after text offset _counted and by _offset + limit."""
+        buffer, offset = self._buffer, self._offset
+        matches = list(TOKEN_PATTERN.finditer(buffer))
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        state = 0
+        for index, match in enumerate(matches):
+            term = match.group()
+            if not state and term not in root:
+                continue
+            while state and term not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(term, 0)
+            for phrase, lowered, lead, term_count in out[state]:
+                start = matches[index - term_count + 1].start() - lead
+                self._consider(phrase, lowered, start, limit)
+        for phrase, pattern in self._patterns:
+            for match in pattern.finditer(buffer):
+                self._consider(phrase, match.group(), match.start(), limit)
+        self._counted = max(self._counted, offset + limit)
+    
+    def _consider(self, phrase: str, lowered: str, start: int, limit: int) -> None:
+        """Count one candidate occurrence at buffer offset start if it is new and whole."""
+        buffer, offset = self._buffer, self._offset
+        end = start + len(lowered)
+        if start < 0 or end > limit or offset + end <= self._counted:
+            return
+        if offset + start < self._last_end.get(phrase, 0) or buffer[start:end] != lowered:
+            return
+        if start > 0:
+            before = _is_word(buffer[start - 1])
+        elif offset == 0:
+            before = False
+        else:
+            return  # starts before the carried characters, so it was settled earlier
+        after = _is_word(buffer[end]) if end < len(buffer) else False
+        if before == _is_word(lowered[0]) or after == _is_word(lowered[-1]):
+            return
+        self._counts[phrase] += 1
+        self._last_end[phrase] = offset + end
+
+def count_phrases(lowered: str, phrases: Iterable[str]) -> Dict[str, int]:
+    """Whole-word occurrences of each phrase in a lowercased text, in one pass."""
+    counter = PhraseCounter(phrases)
+    counter.feed(lowered)
+    return counter.counts()
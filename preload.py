@@ -0,0 +1,13 @@
+"""
+Forkserver preload hook for the worker pool.
+
+With worker_start_method="forkserver", PdfProcessor names this module in
+set_forkserver_preload. The fork server imports it once, before forking any
+worker, so NLTK, the Punkt model, stopwords, the language profiles and the
+analyzers of the most common languages are loaded in that template process
+and every worker forked from it starts warm. Workers replaced after
+max_tasks_per_child tasks are forked warm too.
+"""
+import workers
+
+workers.init_worker()
@@ -0,0 +1,79 @@
+"""
+Query parsing for PdfSearchEngine.
+
+Besides plain words, a query may contain quoted phrases ("who is john galt")
+that must occur as consecutive tokens, and proximity clauses (john NEAR/3
+galt) whose terms must occur within k tokens of each other in any order.
+Both are answered from positional postings.
+
+Documents and queries share one tokenizer (tokenizer.py): runs of word
+characters, lowercased, whose match spans also locate tokens for snippets.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Sequence
+
+from tokenizer import tokenize
+
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+NEAR_PATTERN = re.compile(r'NEAR/(\d+)$')
+
+@dataclass
+class ProximityClause:
+    """Terms that must occur together: as a phrase (ordered) or within `slop` tokens."""
+    terms: List[str]
+    slop: int = 0
+    ordered: bool = True
+    
+    def matches(self, positions: Sequence[Sequence[int]]) -> bool:
+        """Check the clause against each term's sorted positions in one document."""
+        if self.ordered:
+            first, rest = positions[0], [set(term_positions) for term_positions in positions[1:]]
+            return any(
+                all(start + offset in later for offset, later in enumerate(rest, 1))
+                for start in first
+            )
+        return _within(positions[0], positions[1], self.slop)
+
+@dataclass
+class ParsedQuery:
+    """Scoring terms (all query tokens, deduplicated) and positional constraints."""
+    terms: List[str] = field(default_factory=list)
+    clauses: List[ProximityClause] = field(default_factory=list)
+
+def _within(left: Sequence[int], right: Sequence[int], distance: int) -> bool:
+    """Whether any two positions from sorted lists are at most `distance` apart."""
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if abs(left[i] - right[j]) <= distance:
+            return True
+        if left[i] < right[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+def parse_query(query: str, tokenize: Callable[[str], List[str]] = tokenize) -> ParsedQuery:
+    """Split a query into scoring terms, quoted phrases and NEAR/k clauses."""
+    parsed = ParsedQuery()
+    operands: List[List[str]] = []  # token groups in query order, for NEAR
+    pending_near = None
+    
+    for phrase, word in QUERY_PATTERN.findall(query):
+        near = NEAR_PATTERN.match(word) if word else None
+        if near and operands:
+            pending_near = int(near.group(1))
+            continue
+        
+        tokens = tokenize(phrase if phrase else word)
+        if not tokens:
+            continue
+        parsed.terms.extend(token for token in tokens if token not in parsed.terms)
+        if phrase and len(tokens) > 1:
+            parsed.clauses.append(ProximityClause(tokens))
+        if pending_near is not None:
+            parsed.clauses.append(ProximityClause([operands[-1][-1], tokens[0]], slop=pending_near, ordered=False))
+            pending_near = None
+        operands.append(tokens)
+    
+    return parsed
@@ -0,0 +1,136 @@
+"""
+BM25 scoring and WAND top-k retrieval over index cursors.
+
+WAND keeps the query's cursors ordered by current doc id and only fully
+scores a document once the summed score upper bounds of the cursors at or
+before it can beat the current k-th best score. Cursors are moved past
+everything else with skip-based advance(), so most postings of frequent
+terms are never decoded.
+"""
+import heapq
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import BM25_K1, BM25_B
+from index import PostingCursor, EXHAUSTED
+
+@dataclass
+class CollectionStatistics:
+    """Corpus-wide BM25 inputs; shards add theirs up so scores stay comparable."""
+    max_doc: int = 0  # doc ids including tombstones, the population doc_freqs count
+    live_count: int = 0
+    total_length: int = 0
+    doc_freqs: Dict[str, int] = field(default_factory=dict)
+    
+    @property
+    def average_length(self) -> float:
+        return self.total_length / self.live_count if self.live_count else 0.0
+    
+    def __add__(self, other: 'CollectionStatistics') -> 'CollectionStatistics':
+        doc_freqs = dict(self.doc_freqs)
+        for term, doc_freq in other.doc_freqs.items():
+            doc_freqs[term] = doc_freqs.get(term, 0) + doc_freq
+        return CollectionStatistics(
+            self.max_doc + other.max_doc,
+            self.live_count + other.live_count,
+            self.total_length + other.total_length,
+            doc_freqs
+        )
+
+class BM25:
+    """Okapi BM25 term weighting."""
+    
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+    
+    @staticmethod
+    def idf(doc_count: int, doc_freq: int) -> float:
+        """Non-negative BM25 inverse document frequency."""
+        return math.log(1.0 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+    
+    def score(self, idf: float, freq: int, doc_length: int, average_length: float) -> float:
+        """Score contribution of one term occurring freq times in a document."""
+        norm = 1.0 - self.b + self.b * (doc_length / average_length if average_length else 1.0)
+        return idf * freq * (self.k1 + 1.0) / (freq + self.k1 * norm)
+    
+    def upper_bound(self, idf: float, max_freq: int) -> float:
+        """Largest score a term can contribute (max frequency, zero length)."""
+        return idf * max_freq * (self.k1 + 1.0) / (max_freq + self.k1 * (1.0 - self.b))
+
+class TermScorer:
+    """A query term's cursor together with its idf and score upper bound."""
+    
+    __slots__ = ('cursor', 'idf', 'max_score')
+    
+    def __init__(self, cursor: PostingCursor, idf: float, max_score: float):
+        self.cursor = cursor
+        self.idf = idf
+        self.max_score = max_score
+
+class _Worst:
+    """Heap entry tie key that puts the larger tie key first, so heap[0] is the worst entry."""
+    
+    __slots__ = ('key',)
+    
+    def __init__(self, key: Any):
+        self.key = key
+    
+    def __lt__(self, other: '_Worst') -> bool:
+        return self.key > other.key
+
+def wand_top_k(scorers: List[TermScorer], k: int,
+               score_doc: Callable[[int, List[TermScorer]], float],
+               accept: Callable[[int], bool] = lambda doc: True,
+               tie_key: Optional[Callable[[int], Any]] = None) -> List[Tuple[float, int]]:
+    """
+    Return up to k (score, doc) pairs, best first (ties by lower doc id, or
+    by lower tie_key(doc) when given).
+    
+    score_doc(doc, matched) computes the full score of doc from the scorers
+    whose cursors sit on it; accept(doc) filters out e.g. deleted documents.
+    """
+    if k <= 0:
+        return []
+    key = tie_key or (lambda doc: doc)
+    heap: List[Tuple[float, _Worst, int]] = []  # min-heap: worst score, then largest tie key
+    threshold = 0.0
+    active = [scorer for scorer in scorers if scorer.cursor.doc != EXHAUSTED]
+    
+    while active:
+        active.sort(key=lambda scorer: scorer.cursor.doc)
+        
+        # Find the pivot: the first cursor where the bounds so far can beat the
+        # threshold. Later doc ids lose ties, so only a tie_key needs equal bounds.
+        bound = 0.0
+        pivot = None
+        for position, scorer in enumerate(active):
+            bound += scorer.max_score
+            if bound > threshold or (tie_key is not None and bound == threshold):
+                pivot = position
+                break
+        if pivot is None:
+            break
+        pivot_doc = active[pivot].cursor.doc
+        
+        if active[0].cursor.doc == pivot_doc:
+            matched = [scorer for scorer in active if scorer.cursor.doc == pivot_doc]
+            if accept(pivot_doc):
+                score = score_doc(pivot_doc, matched)
+                if len(heap) < k:
+                    heapq.heappush(heap, (score, _Worst(key(pivot_doc)), pivot_doc))
+                elif score > heap[0][0] or (score == heap[0][0] and key(pivot_doc) < heap[0][1].key):
+                    heapq.heapreplace(heap, (score, _Worst(key(pivot_doc)), pivot_doc))
+                if len(heap) == k:
+                    threshold = heap[0][0]
+            for scorer in matched:
+                scorer.cursor.next()
+        else:
+            # Nothing before the pivot can make the top k on its own: skip ahead
+            for scorer in active[:pivot]:
+                scorer.cursor.advance(pivot_doc)
+        
+        active = [scorer for scorer in active if scorer.cursor.doc != EXHAUSTED]
+    
+    return [(score, doc) for score, _, doc in sorted(heap, key=lambda item: (-item[0], item[1].key))]
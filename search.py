@@ -1,102 +1,418 @@
+import asyncio
 import hashlib
-import nltk
-from collections import defaultdict
-from typing import Dict, Any, List, Set
-from typing import Dict, Any, List, Set
+import heapq
+import os
+from bisect import bisect_left
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Set, Optional, Tuple, Union, Iterable, AsyncIterable
+from config import SEGMENT_FLUSH_DOCS, SEGMENT_MERGE_FACTOR, BULK_BATCH_DOCS, BULK_PARALLEL_MIN_DOCS
+from index import IndexReader, InvertedIndex, PostingCursor, invert
+from query import ParsedQuery, parse_query
+from ranking import BM25, CollectionStatistics, TermScorer, wand_top_k
+from docstore import ContentStore
+from segments import Segment, SegmentStore, write_index_segment
+from tokenizer import TextTokens
+from snippets import best_window, render_snippet
 from utils import setup_logging
 
 logger = setup_logging(__name__)
 
+def _bulk_entry(item: tuple) -> Optional[Tuple[str, Dict[str, Any], Dict[str, Any], str]]:
+    """Unpack a (url, result[, error]) item into add_document arguments; None if it failed."""
+    url, result = item[0], item[1]
+    if result is None or (len(item) > 2 and item[2]):
+        return None
+    return url, result.get('analysis', {}), result.get('metadata', {}), result.get('full_text', '')
+
+class _BulkLoad:
+    """
+    One add_documents run: the tokenizing pool and the documents awaiting
+    publication, as segments for a persistent engine or else as a staging
+    index, so a failed load never reaches the engine. The pool is only
+    started by the first batch of at least BULK_PARALLEL_MIN_DOCS documents
+    and is then reused for the rest of the run.
+    """
+    
+    def __init__(self, engine: 'PdfSearchEngine', workers: Optional[int]):
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.segments: List[Segment] = []
+        self.keys: Set[str] = set()
+        self.count = 0
+        # Staged in-memory documents, merged into the engine by finish()
+        self.index = InvertedIndex()
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.contents = ContentStore()
+    
+    def add_batch(self, items: List[tuple]) -> None:
+        entries = [entry for entry in map(_bulk_entry, items) if entry is not None]
+        contents = [
+            full_text if full_text else analysis_results.get('text_preview', '')
+            for _, analysis_results, _, full_text in entries
+        ]
+        if self.pool is None and self.workers > 1 and len(contents) >= BULK_PARALLEL_MIN_DOCS:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        if self.pool is not None:
+            inverted = self.pool.map(invert, contents, chunksize=max(1, len(contents) // (self.workers * 4)))
+        else:
+            inverted = map(invert, contents)
+        
+        engine = self.engine
+        persistent = engine.store is not None
+        index = InvertedIndex() if persistent else self.index
+        documents = {} if persistent else self.documents
+        # A persistent load's records are compressed once, into the segment
+        store = ContentStore(level=0) if persistent else self.contents
+        batch = []
+        for (url, analysis_results, metadata, _), content, (terms, freqs, gaps, token_starts) in zip(entries, contents, inverted):
+            doc_id = hashlib.md5(url.encode()).hexdigest()
+            documents[doc_id] = engine._document_fields(url, analysis_results, metadata)
+            store.put(doc_id, content, token_starts)
+            batch.append((doc_id, terms, freqs, gaps))
+        index.add_batch(batch)
+        self.count += len(batch)
+        
+        if persistent and batch:
+            # A document repeated across batches keeps only its latest version
+            for segment in self.segments:
+                for doc_id in self.keys.intersection(documents):
+                    segment.delete(doc_id)
+            path = engine.store.new_segment_path()
+            write_index_segment(path, index, documents, store)
+            self.segments.append(Segment(path))
+            self.keys.update(documents)
+    
+    def finish(self) -> None:
+        self._shutdown()
+        engine = self.engine
+        if engine.store is not None:
+            for doc_id in self.keys:
+                engine.index.delete(doc_id)
+                engine.documents.pop(doc_id, None)
+                engine.contents.remove(doc_id)
+            engine.store.publish(self.segments, replaced=self.keys)
+        else:
+            engine.documents.update(self.documents)
+            engine.contents.merge(self.contents)
+            engine.index.merge(self.index)
+    
+    def abort(self) -> None:
+        self._shutdown()
+        for segment in self.segments:
+            segment.close()
+            self.engine.store.release(segment.path)
+        self.segments = []
+    
+    def _shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
 class PdfSearchEngine:
-    """Search engine for processed PDF content."""
+    """
+    Search engine for processed PDF content.
     
-    def __init__(self):
-        self.index = defaultdict(list)
+    Documents are indexed into an in-memory buffer (`index`/`documents`,
+    with content compressed in `contents`).
+    With a `path`, commit() writes the buffer out as an immutable,
+    memory-mapped segment; a later engine opened on the same path answers
+    queries straight from the segments without re-indexing anything.
+    """
+    
+    def __init__(self, path: Optional[Union[str, Path]] = None, ranking: Optional[BM25] = None,
+                 flush_threshold: int = SEGMENT_FLUSH_DOCS, merge_factor: int = SEGMENT_MERGE_FACTOR):
+        self.index = InvertedIndex()
         self.documents: Dict[str, Dict[str, Any]] = {}
+        self.contents = ContentStore()
+        self.ranking = ranking or BM25()
+        self.flush_threshold = flush_threshold
+        self.store = SegmentStore(Path(path), merge_factor) if path is not None else None
     
-    def add_document(self, url: str, analysis_results: Dict[str, Any], metadata: Dict[str, Any], full_text: str = "") -> None:
-        """Add a document to the search index using analysis results."""
+    def add_document(self, url: str, analysis_results: Dict[str, Any], metadata: Dict[str, Any], full_text: str = "",
+                     tokens: Optional[TextTokens] = None) -> None:
+        """
+        Add a document to the search index using analysis results. `tokens`
+        may pass on the tokenization of full_text made during analysis.
+        """
         doc_id = hashlib.md5(url.encode()).hexdigest()
         
         # Use full text if available, otherwise fallback to preview
         content = full_text if full_text else analysis_results.get('text_preview', '')
+        if tokens is None or tokens.text != content:
+            tokens = TextTokens(content)
+        
+        # Record term positions, and token offsets for snippets
+        terms, freqs, gaps, token_starts = invert(tokens)
+        self.documents[doc_id] = self._document_fields(url, analysis_results, metadata)
+        self.contents.put(doc_id, content, token_starts)
+        
+        # Index term frequencies and positions (replaces any earlier version)
+        self._delete_committed(doc_id)
+        self.index.add_batch([(doc_id, terms, freqs, gaps)])
         
-        self.documents[doc_id] = {
+        if self.store is not None and len(self.index) >= self.flush_threshold:
+            self.commit()
+    
+    @staticmethod
+    def _document_fields(url: str, analysis_results: Dict[str, Any], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             'url': url,
             'metadata': metadata,
-            'content': content,
             'keywords': analysis_results.get('keywords', []),
             'matching_keywords': analysis_results.get('matching_keywords', []),
             'search_term_count': analysis_results.get('search_term_count', 0),
             'language': analysis_results.get('language', 'unknown')
         }
+    
+    def add_documents(self, documents: Iterable[tuple], batch_size: int = BULK_BATCH_DOCS,
+                      workers: Optional[int] = None) -> int:
+        """
+        Bulk-index processed documents and return how many were indexed.
         
-        # Index words from content
-        words = set(word.lower() for word in nltk.word_tokenize(content))
-        for word in words:
-            self.index[word].append(doc_id)
+        `documents` yields (url, result) pairs or the (url, result, error)
+        triples of PdfBatch.process_stream, where result is a
+        PdfProcessor.process_url result; failed entries are skipped. Text is
+        tokenized and inverted in `workers` processes (in this process for
+        batches below BULK_PARALLEL_MIN_DOCS), postings are appended
+        per term for each batch of `batch_size` documents, and for a
+        persistent engine the batches' segments are published in a single
+        atomic commit.
+        """
+        load = _BulkLoad(self, workers)
+        try:
+            batch = []
+            for item in documents:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    load.add_batch(batch)
+                    batch = []
+            if batch:
+                load.add_batch(batch)
+            load.finish()
+        except BaseException:
+            load.abort()
+            raise
+        return load.count
+    
+    async def add_document_stream(self, documents: AsyncIterable[tuple], batch_size: int = BULK_BATCH_DOCS,
+                                  workers: Optional[int] = None) -> int:
+        """
+        Bulk-index an async stream such as PdfBatch.process_stream output, as
+        add_documents does. Batches are indexed off the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        load = _BulkLoad(self, workers)
+        try:
+            batch = []
+            async for item in documents:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    await loop.run_in_executor(None, load.add_batch, batch)
+                    batch = []
+            if batch:
+                await loop.run_in_executor(None, load.add_batch, batch)
+            await loop.run_in_executor(None, load.finish)
+        except BaseException:
+            load.abort()
+            raise
+        return load.count
+    
+    def remove_document(self, url: str) -> bool:
+        """Remove a document from the index. Returns False if it was not indexed."""
+        doc_id = hashlib.md5(url.encode()).hexdigest()
+        self.documents.pop(doc_id, None)
+        self.contents.remove(doc_id)
+        removed = self.index.delete(doc_id)
+        return self._delete_committed(doc_id) or removed
+    
+    def _delete_committed(self, doc_id: str) -> bool:
+        """Tombstone a document in the on-disk segments (persisted on commit)."""
+        if self.store is None:
+            return False
+        return any(segment.delete(doc_id) for segment in self.store.snapshot())
+    
+    def commit(self) -> None:
+        """Write buffered documents as a new segment and persist deletes atomically."""
+        if self.store is None:
+            return
+        if len(self.index):
+            path = self.store.new_segment_path()
+            write_index_segment(path, self.index, self.documents, self.contents)
+            self.store.add(Segment(path))
+        self.store.commit()
+        self.index = InvertedIndex()
+        self.documents = {}
+        self.contents = ContentStore()
+        self.store.maybe_merge()
+    
+    def close(self) -> None:
+        """Commit pending changes and release the segment files."""
+        if self.store is not None:
+            self.commit()
+            self.store.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __len__(self) -> int:
+        return sum(len(reader) for reader in self._readers())
+    
+    def _readers(self) -> List[IndexReader]:
+        segments: List[IndexReader] = self.store.snapshot() if self.store is not None else []
+        return segments + [self.index]
+    
+    def _stored_fields(self, reader: IndexReader, doc: int) -> Dict[str, Any]:
+        if isinstance(reader, Segment):
+            return reader.document(doc)
+        return self.documents[reader.key_of(doc)]
+    
+    def term_statistics(self, query: str) -> CollectionStatistics:
+        """BM25 statistics of this index for the terms of a query."""
+        readers = self._readers()
+        return CollectionStatistics(
+            max_doc=sum(reader.max_doc for reader in readers),
+            live_count=sum(len(reader) for reader in readers),
+            total_length=sum(reader.total_length for reader in readers),
+            doc_freqs={
+                word: sum(reader.doc_freq(word) for reader in readers)
+                for word in parse_query(query).terms
+            }
+        )
     
     def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search for documents matching query."""
-        query_words = set(word.lower() for word in nltk.word_tokenize(query))
+        """
+        Search for documents matching query.
         
-        # Calculate document scores
-        doc_scores = defaultdict(float)
+        Quoted phrases ("who is john galt") and proximity clauses
+        (john NEAR/3 galt) restrict results to documents where the terms
+        occur together; all query words contribute to the score.
+        """
+        return [result for _, _, result in self.scored_search(query, limit)]
+    
+    def scored_search(self, query: str, limit: int = 10,
+                      statistics: Optional[CollectionStatistics] = None) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """
+        Search returning (unrounded score, doc id, result) triples, ordered by
+        score and then doc id. `statistics` overrides this index's own BM25
+        statistics, e.g. with totals across shards.
+        """
+        parsed = parse_query(query)
+        query_words = set(parsed.terms)
+        
+        # Rank with BM25 over collection-wide statistics; WAND lets each
+        # segment skip documents that cannot reach its top k
+        readers = self._readers()
+        if statistics is None:
+            statistics = self.term_statistics(query)
+        average_length = statistics.average_length
+        idfs = {}
         for word in query_words:
-            matching_docs = self.index.get(word, [])
-            word_score = 1.0 / (len(matching_docs) if matching_docs else 1.0)
-            for doc_id in matching_docs:
-                doc_scores[doc_id] += word_score
-        
-        # Sort documents by score
-        sorted_docs = sorted(
-            doc_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:limit]
+            doc_freq = statistics.doc_freqs.get(word, 0)
+            if doc_freq:
+                idfs[word] = self.ranking.idf(statistics.max_doc, doc_freq)
+        
+        # Equal scores are ordered by doc id, so shards merge into the same order
+        candidates: List[Tuple[float, str, int, int]] = []
+        for position, reader in enumerate(readers):
+            candidates.extend(
+                (score, reader.key_of(doc), position, doc)
+                for score, doc in self._search_reader(reader, parsed, idfs, average_length, limit)
+            )
+        sorted_docs = heapq.nsmallest(limit, candidates, key=lambda item: (-item[0], item[1]))
         
         # Format results
         results = []
-        for doc_id, score in sorted_docs:
-            doc = self.documents[doc_id]
-            snippet = self._generate_snippet(doc['content'], query_words)
+        for score, doc_id, position, doc_number in sorted_docs:
+            doc = self._stored_fields(readers[position], doc_number)
+            snippet, highlights = self._generate_snippet(readers[position], doc_number, doc, query_words)
             
-            results.append({
+            results.append((score, doc_id, {
                 'url': doc['url'],
                 'metadata': doc['metadata'],
                 'relevance_score': round(score, 3),
                 'snippet': snippet,
+                'highlights': highlights,
                 'language': doc['language'],
                 'search_term_count': doc['search_term_count'],
                 'matching_keywords': [
                     {'keyword': kw, 'score': score}
                     for kw, score in doc['matching_keywords']
                 ]
-            })
+            }))
         
         return results
     
-    def _generate_snippet(self, content: str, query_words: Set[str], 
-                         context_words: int = 10) -> str:
-        """Generate a relevant text snippet containing query words."""
-        words = content.split()
-        best_snippet = ""
-        max_matches = 0
-        
-        # Slide a window over the text to find the best matching context
-        for i in range(len(words)):
-            window = words[i:i + context_words * 2]
-            if not window:
-                break
-            
-            # Count query word matches in this window
-            matches = sum(1 for word in window 
-                         if word.lower() in query_words)
-            
-            # Update best snippet if this window has more matches
-            if matches > max_matches:
-                max_matches = matches
-                best_snippet = ' '.join(window)
+    def _search_reader(self, reader: IndexReader, parsed: ParsedQuery, idfs: Dict[str, float],
+                       average_length: float, limit: int) -> List[Tuple[float, int]]:
+        """Top-k BM25 matches of one segment (or the in-memory buffer)."""
+        scorers = []
+        for word, idf in idfs.items():
+            postings = reader.lookup(word)
+            if postings is not None:
+                scorers.append(TermScorer(PostingCursor(postings), idf, self.ranking.upper_bound(idf, postings.max_freq)))
+        
+        def score_doc(doc: int, matched: List[TermScorer]) -> float:
+            length = reader.doc_lengths[doc]
+            return sum(
+                self.ranking.score(scorer.idf, scorer.cursor.freq, length, average_length)
+                for scorer in matched
+            )
+        
+        if not parsed.clauses:
+            return wand_top_k(scorers, limit, score_doc, accept=reader.is_live, tie_key=reader.key_of)
+        
+        # Positional query: only documents containing every clause term are
+        # candidates; their positions decide the match, then all terms score it
+        clause_terms = {term for clause in parsed.clauses for term in clause.terms}
+        position_cursors = {term: reader.cursor(term) for term in clause_terms}
+        top: List[Tuple[float, int]] = []
+        for doc in reader.intersect(clause_terms):
+            for cursor in position_cursors.values():
+                cursor.advance(doc)
+            if not all(
+                clause.matches([position_cursors[term].positions() for term in clause.terms])
+                for clause in parsed.clauses
+            ):
+                continue
+            matched = [scorer for scorer in scorers if scorer.cursor.advance(doc) == doc]
+            top.append((score_doc(doc, matched), doc))
+        return heapq.nsmallest(limit, top, key=lambda item: (-item[0], reader.key_of(item[1])))
+    
+    def _generate_snippet(self, reader: IndexReader, doc: int, fields: Dict[str, Any],
+                          query_words: Set[str], context_words: int = 10) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Generate a relevant text snippet containing query words, plus the
+        (start, end) offsets of the highlighted matches within it.
+        
+        Match positions come from the positional postings, so the cost depends
+        on the window and the number of matches, not the document length.
+        """
+        match_lists = []
+        for word in query_words:
+            cursor = reader.cursor(word)
+            if cursor is not None and cursor.advance(doc) == doc:
+                match_lists.append(cursor.positions())
+        matches = list(heapq.merge(*match_lists))
+        
+        # Find the window with the most query word matches
+        width = context_words * 2
+        first, count = best_window(matches, width)
+        if not count:
+            return "", []
+        
+        # Only now is the document's content block decompressed
+        if isinstance(reader, Segment):
+            content, token_starts = reader.content(doc)
+        else:
+            content, token_starts = self.contents.get(reader.key_of(doc))
+        text = lambda start, end: content[start:end].decode()
         
-        # Add ellipsis if we have a snippet
-        return f"{best_snippet}..." if best_snippet else ""
+        in_window = set(matches[bisect_left(matches, first):bisect_left(matches, first + width)])
+        snippet, highlights = render_snippet(token_starts, len(content), text, first, width, in_window)
+        # Add ellipsis since the snippet is an excerpt
+        return f"{snippet}...", highlights
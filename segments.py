@@ -0,0 +1,550 @@
+"""
+Immutable, memory-mapped search index segments.
+
+A segment is a single file holding a term dictionary, the postings of every
+term and a doc store: stored fields, plus each document's UTF-8 content and
+token byte offsets in zlib-compressed blocks (docstore.py), so a snippet
+decompresses a single block. Sections are raw uint32/uint64 arrays
+that are read in place through memoryviews over an mmap, so opening a
+segment costs a header parse and queries only touch the pages they need.
+
+A SegmentStore owns a directory of segments plus a manifest naming the live
+segments and their tombstone files. The manifest is replaced atomically on
+commit, so readers always see a consistent set. Small segments are merged
+into larger ones on a background thread.
+"""
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Iterable, Iterator, Sequence, Set, Tuple
+
+from config import DOCSTORE_CACHE_BLOCKS
+from docstore import BlockWriter, ContentStore, decode_record
+from index import IndexReader, InvertedIndex, PostingList, SKIP_INTERVAL
+from utils import setup_logging
+
+logger = setup_logging(__name__)
+
+# Sections are stored in native byte order; the magic records which one
+MAGIC = b'PDFSEG2' + (b'L' if sys.byteorder == 'little' else b'B')
+SECTIONS = (
+    'doc_lengths',  # uint32 token count per doc id
+    'key_offsets',  # uint64 offsets into keys, doc_count + 1 entries
+    'keys',  # UTF-8 document keys in doc id order
+    'key_order',  # uint32 doc ids sorted by key, for binary search
+    'term_offsets',  # uint64 offsets into terms, term_count + 1 entries
+    'terms',  # UTF-8 terms in byte order
+    'term_postings',  # uint64 offset of each term's postings
+    'term_counts',  # uint32 postings per term
+    'term_max_freqs',  # uint32 highest term frequency per term
+    'postings',  # per term: deltas, freqs, skip docs and skip positions (uint32 each)
+    'term_positions',  # uint64 offsets into positions, term_count + 1 entries
+    'positions',  # per term: gap-encoded token positions (uint32)
+    'doc_offsets',  # uint64 offsets into docs, doc_count + 1 entries
+    'docs',  # stored fields, one JSON object per doc id
+    'content_offsets',  # uint64 offset of each doc's content record once decompressed, doc_count + 1 entries
+    'token_offsets',  # uint64 index of each doc's first token, doc_count + 1 entries
+    'block_starts',  # uint64 decompressed offset of each content block, block_count + 1 entries
+    'block_offsets',  # uint64 offsets into blocks, block_count + 1 entries
+    'blocks',  # zlib-compressed content records (docstore.encode_record)
+)
+HEADER = struct.Struct('=8s3Q' + 'QQ' * len(SECTIONS))
+MANIFEST = 'manifest.json'
+
+def _offsets(chunks: Sequence[bytes]) -> array:
+    offsets = array('Q', [0])
+    for chunk in chunks:
+        offsets.append(offsets[-1] + len(chunk))
+    return offsets
+
+def _read_back(file) -> Iterator[bytes]:
+    file.seek(0)
+    return iter(lambda: file.read(1 << 20), b'')
+
+def write_segment(path: Path, keys: Sequence[str], doc_lengths: Sequence[int],
+                  postings: Iterable[Tuple[str, PostingList]],
+                  stored: Iterable[Tuple[bytes, bytes, int]]) -> None:
+    """
+    Write a segment file atomically.
+    
+    Doc ids are 0..len(keys)-1; `postings` must be sorted by UTF-8 encoded
+    term and `stored` yields (encoded fields, content record, token count)
+    per doc id.
+    """
+    sections: Dict[str, Tuple[int, int]] = {}
+    tmp_path = path.with_suffix('.tmp')
+    
+    with open(tmp_path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        
+        def section(name: str, chunks: Iterable) -> None:
+            f.write(bytes(-f.tell() % 8))  # keep sections 8-byte aligned
+            start = f.tell()
+            for chunk in chunks:
+                f.write(chunk)
+            sections[name] = (start, f.tell() - start)
+        
+        encoded_keys = [key.encode() for key in keys]
+        section('doc_lengths', [array('I', doc_lengths)])
+        section('key_offsets', [_offsets(encoded_keys)])
+        section('keys', encoded_keys)
+        section('key_order', [array('I', sorted(range(len(keys)), key=encoded_keys.__getitem__))])
+        
+        # Stream the postings, collecting the (small) term dictionary alongside
+        terms: List[bytes] = []
+        term_postings = array('Q')
+        term_counts = array('I')
+        term_max_freqs = array('I')
+        term_positions = array('Q', [0])
+        f.write(bytes(-f.tell() % 8))
+        postings_start = f.tell()
+        with tempfile.TemporaryFile(dir=path.parent) as positions:
+            for term, term_list in postings:
+                terms.append(term.encode())
+                term_postings.append(f.tell() - postings_start)
+                term_counts.append(len(term_list))
+                term_max_freqs.append(term_list.max_freq)
+                f.write(term_list.deltas)
+                f.write(term_list.freqs)
+                f.write(term_list.skip_docs)
+                f.write(term_list.skip_positions)
+                positions.write(term_list.positions)
+                term_positions.append(positions.tell())
+            sections['postings'] = (postings_start, f.tell() - postings_start)
+            section('positions', _read_back(positions))
+        section('term_positions', [term_positions])
+        
+        section('term_offsets', [_offsets(terms)])
+        section('terms', terms)
+        section('term_postings', [term_postings])
+        section('term_counts', [term_counts])
+        section('term_max_freqs', [term_max_freqs])
+        
+        # Fields and compressed content blocks are streamed side by side
+        doc_offsets = array('Q', [0])
+        content_offsets = array('Q', [0])
+        token_offsets = array('Q', [0])
+        block_starts = array('Q', [0])
+        block_offsets = array('Q', [0])
+        f.write(bytes(-f.tell() % 8))
+        docs_start = f.tell()
+        with tempfile.TemporaryFile(dir=path.parent) as blocks:
+            def emit(block: bytes) -> None:
+                blocks.write(block)
+                block_offsets.append(blocks.tell())
+                block_starts.append(block_starts[-1] + len(writer.buffer))
+            
+            writer = BlockWriter(emit)
+            for fields, record, token_count in stored:
+                f.write(fields)
+                doc_offsets.append(doc_offsets[-1] + len(fields))
+                block, offset = writer.add(record)
+                content_offsets.append(block_starts[block] + offset + len(record))
+                token_offsets.append(token_offsets[-1] + token_count)
+            writer.flush()
+            sections['docs'] = (docs_start, f.tell() - docs_start)
+            section('blocks', _read_back(blocks))
+        section('doc_offsets', [doc_offsets])
+        section('content_offsets', [content_offsets])
+        section('token_offsets', [token_offsets])
+        section('block_starts', [block_starts])
+        section('block_offsets', [block_offsets])
+        
+        table = [value for name in SECTIONS for value in sections[name]]
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(keys), len(terms), sum(doc_lengths), *table))
+        f.flush()
+        os.fsync(f.fileno())
+    
+    os.replace(tmp_path, path)
+
+def encode_document(fields: dict) -> bytes:
+    """Serialize a document's stored fields for the doc store."""
+    return json.dumps(fields, default=str).encode()
+
+class Segment(IndexReader):
+    """A read-only, memory-mapped segment. Deletes are tracked as tombstones."""
+    
+    def __init__(self, path: Path, deleted: Iterable[int] = ()):
+        self.path = path
+        self.name = path.stem
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        
+        magic, self.doc_count, self.term_count, total_length, *table = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a search segment (or was written with another byte order)")
+        views = {
+            name: self._buffer[offset:offset + size]
+            for name, offset, size in zip(SECTIONS, table[::2], table[1::2])
+        }
+        self.doc_lengths = views['doc_lengths'].cast('I')
+        self._key_offsets = views['key_offsets'].cast('Q')
+        self._keys = views['keys']
+        self._key_order = views['key_order'].cast('I')
+        self._term_offsets = views['term_offsets'].cast('Q')
+        self._terms = views['terms']
+        self._term_postings = views['term_postings'].cast('Q')
+        self._term_counts = views['term_counts'].cast('I')
+        self._term_max_freqs = views['term_max_freqs'].cast('I')
+        self._postings = views['postings']
+        self._term_positions = views['term_positions'].cast('Q')
+        self._positions = views['positions']
+        self._doc_offsets = views['doc_offsets'].cast('Q')
+        self._docs = views['docs']
+        self._content_offsets = views['content_offsets'].cast('Q')
+        self._token_offsets = views['token_offsets'].cast('Q')
+        self._block_starts = views['block_starts'].cast('Q')
+        self._block_offsets = views['block_offsets'].cast('Q')
+        self._blocks = views['blocks']
+        self._block = lru_cache(maxsize=DOCSTORE_CACHE_BLOCKS)(self._decompress)
+        
+        self._deleted: Set[int] = set(deleted)
+        self.total_length = total_length - sum(self.doc_lengths[doc] for doc in self._deleted)
+        self.deletes_dirty = False  # tombstones not yet persisted
+    
+    def __len__(self) -> int:
+        return self.doc_count - len(self._deleted)
+    
+    def _term_at(self, position: int) -> bytes:
+        return self._terms[self._term_offsets[position]:self._term_offsets[position + 1]].tobytes()
+    
+    def _postings_at(self, position: int) -> PostingList:
+        count = self._term_counts[position]
+        start = self._term_postings[position]
+        skips = -(-count // SKIP_INTERVAL)
+        freqs_start = start + 4 * count
+        skips_start = freqs_start + 4 * count
+        skip_positions_start = skips_start + 4 * skips
+        return PostingList.from_buffers(
+            self._postings[start:freqs_start].cast('I'),
+            self._postings[freqs_start:skips_start].cast('I'),
+            self._postings[skips_start:skip_positions_start].cast('I'),
+            self._postings[skip_positions_start:skip_positions_start + 4 * skips].cast('I'),
+            self._positions[self._term_positions[position]:self._term_positions[position + 1]].cast('I'),
+            self._term_max_freqs[position]
+        )
+    
+    def lookup(self, term: str) -> Optional[PostingList]:
+        """Binary-search the term dictionary."""
+        target = term.encode()
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.term_count and self._term_at(low) == target:
+            return self._postings_at(low)
+        return None
+    
+    def terms(self) -> Iterator[Tuple[str, PostingList]]:
+        """Yield every (term, postings) pair in term order."""
+        for position in range(self.term_count):
+            yield self._term_at(position).decode(), self._postings_at(position)
+    
+    def _key_at(self, doc: int) -> str:
+        return self._keys[self._key_offsets[doc]:self._key_offsets[doc + 1]].tobytes().decode()
+    
+    def key_of(self, doc: int) -> Optional[str]:
+        """Return the external key of a live doc id (None if deleted)."""
+        return None if doc in self._deleted else self._key_at(doc)
+    
+    def doc_of(self, key: str) -> Optional[int]:
+        """Return the live doc id of a key, by binary search over the sorted keys."""
+        low, high = 0, self.doc_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(self._key_order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.doc_count:
+            doc = self._key_order[low]
+            if self._key_at(doc) == key and doc not in self._deleted:
+                return doc
+        return None
+    
+    def delete(self, key: str) -> bool:
+        """Tombstone a document; returns False if it is not live in this segment."""
+        doc = self.doc_of(key)
+        if doc is None:
+            return False
+        self.delete_doc(doc)
+        return True
+    
+    def delete_doc(self, doc: int) -> None:
+        if doc not in self._deleted:
+            self._deleted.add(doc)
+            self.total_length -= self.doc_lengths[doc]
+            self.deletes_dirty = True
+    
+    def raw_document(self, doc: int) -> bytes:
+        return self._docs[self._doc_offsets[doc]:self._doc_offsets[doc + 1]].tobytes()
+    
+    def document(self, doc: int) -> dict:
+        """Load a document's stored fields."""
+        return json.loads(self.raw_document(doc))
+    
+    def _decompress(self, block: int) -> bytes:
+        return zlib.decompress(self._blocks[self._block_offsets[block]:self._block_offsets[block + 1]])
+    
+    def record(self, doc: int) -> Tuple[bytes, int]:
+        """A document's encoded content record and token count."""
+        start, end = self._content_offsets[doc], self._content_offsets[doc + 1]
+        if start == end:
+            return b'', 0
+        block = bisect_right(self._block_starts, start) - 1
+        offset = start - self._block_starts[block]
+        return (
+            self._block(block)[offset:offset + end - start],
+            self._token_offsets[doc + 1] - self._token_offsets[doc]
+        )
+    
+    def content(self, doc: int) -> Tuple[bytes, array]:
+        """Decompress a document's (UTF-8 content, token byte offsets)."""
+        return decode_record(*self.record(doc))
+    
+    def close(self) -> None:
+        """Unmap the file. Views still held by callers keep the mapping alive until dropped."""
+        self._buffer.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+def write_index_segment(path: Path, index: InvertedIndex, documents: Dict[str, dict], contents: ContentStore) -> None:
+    """
+    Write the live documents of an in-memory index as a segment: their
+    stored fields as JSON and their content records as they are in `contents`.
+    """
+    if index._deleted:
+        index.compact()
+    keys = list(index._doc_keys)
+    
+    def stored() -> Iterator[Tuple[bytes, bytes, int]]:
+        for key in keys:
+            yield (encode_document(documents[key]), *contents.record(key))
+    
+    write_segment(
+        path,
+        keys,
+        index.doc_lengths,
+        sorted(index.postings.items(), key=lambda item: item[0].encode()),
+        stored()
+    )
+
+def merge_segments(path: Path, segments: Sequence[Segment], deleted: Sequence[Set[int]]) -> List[Dict[int, int]]:
+    """
+    Merge segments into a new segment at path, dropping the given deleted docs.
+    Returns one old -> new doc id map per source segment.
+    """
+    remaps: List[Dict[int, int]] = []
+    keys: List[str] = []
+    lengths = array('I')
+    for segment, dropped in zip(segments, deleted):
+        remap = {}
+        for doc in range(segment.doc_count):
+            if doc not in dropped:
+                remap[doc] = len(keys)
+                keys.append(segment._key_at(doc))
+                lengths.append(segment.doc_lengths[doc])
+        remaps.append(remap)
+    
+    def merged_postings() -> Iterator[Tuple[str, PostingList]]:
+        def stream(source: int, segment: Segment):
+            for term, postings in segment.terms():
+                yield term.encode(), source, term, postings
+        
+        streams = [stream(source, segment) for source, segment in enumerate(segments)]
+        current, merged = None, None
+        for encoded, source, term, postings in heapq.merge(*streams):
+            if encoded != current:
+                if merged is not None and len(merged):
+                    yield current.decode(), merged
+                current, merged = encoded, PostingList()
+            remap = remaps[source]
+            for doc, freq, gaps in postings.entries():
+                new_doc = remap.get(doc)
+                if new_doc is not None:
+                    merged.append_encoded(new_doc, freq, gaps)
+        if merged is not None and len(merged):
+            yield current.decode(), merged
+    
+    stored = (
+        (segment.raw_document(doc), *segment.record(doc))
+        for segment, remap in zip(segments, remaps)
+        for doc in remap
+    )
+    write_segment(path, keys, lengths, merged_postings(), stored)
+    return remaps
+
+class SegmentStore:
+    """A directory of segments tracked by an atomically replaced manifest."""
+    
+    def __init__(self, path: Path, merge_factor: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.merge_factor = merge_factor
+        self._lock = threading.RLock()
+        self._merge_thread: Optional[threading.Thread] = None
+        self._reserved: Set[str] = set()  # segments being written, not yet published
+        
+        manifest_path = self.path / MANIFEST
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        self.generation = manifest.get('generation', 0)
+        self._next_segment = manifest.get('next_segment', 1)
+        self._deletes_files: Dict[str, Optional[str]] = {}
+        self.segments: List[Segment] = []
+        for entry in manifest.get('segments', []):
+            deleted = array('I')
+            if entry['deletes']:
+                deleted.frombytes((self.path / entry['deletes']).read_bytes())
+            self.segments.append(Segment(self.path / f"{entry['name']}.seg", deleted))
+            self._deletes_files[entry['name']] = entry['deletes']
+        self._collect_garbage()
+    
+    def new_segment_path(self) -> Path:
+        """Reserve a segment file name; it is kept from garbage collection until published."""
+        with self._lock:
+            name = f"seg_{self._next_segment:06d}"
+            self._next_segment += 1
+            self._reserved.add(name)
+        return self.path / f"{name}.seg"
+    
+    def release(self, path: Path) -> None:
+        """Give up a reserved segment that will not be published."""
+        with self._lock:
+            self._reserved.discard(path.stem)
+        path.unlink(missing_ok=True)
+    
+    def snapshot(self) -> List[Segment]:
+        with self._lock:
+            return list(self.segments)
+    
+    def add(self, segment: Segment) -> None:
+        with self._lock:
+            self.segments.append(segment)
+            self._reserved.discard(segment.name)
+    
+    def publish(self, segments: List[Segment], replaced: Iterable[str]) -> None:
+        """
+        Atomically add new segments, tombstoning the keys they replace in the
+        existing ones, and commit.
+        """
+        with self._lock:
+            replaced = list(replaced)
+            for segment in self.segments:
+                for key in replaced:
+                    segment.delete(key)
+            for segment in segments:
+                self.add(segment)
+            self.commit()
+        self.maybe_merge()
+    
+    def commit(self) -> None:
+        """Persist pending tombstones and atomically publish the segment list."""
+        with self._lock:
+            self.generation += 1
+            for segment in self.segments:
+                if segment.deletes_dirty:
+                    name = f"{segment.name}.{self.generation}.del"
+                    tmp_path = self.path / f"{name}.tmp"
+                    tmp_path.write_bytes(array('I', sorted(segment._deleted)).tobytes())
+                    os.replace(tmp_path, self.path / name)
+                    self._deletes_files[segment.name] = name
+                    segment.deletes_dirty = False
+            manifest = {
+                'generation': self.generation,
+                'next_segment': self._next_segment,
+                'segments': [
+                    {'name': segment.name, 'deletes': self._deletes_files.get(segment.name)}
+                    for segment in self.segments
+                ]
+            }
+            tmp_path = self.path / f"{MANIFEST}.tmp"
+            tmp_path.write_text(json.dumps(manifest))
+            os.replace(tmp_path, self.path / MANIFEST)
+            self._collect_garbage()
+    
+    def _collect_garbage(self) -> None:
+        """Remove segment and tombstone files the manifest no longer references."""
+        referenced = {f"{segment.name}.seg" for segment in self.segments}
+        referenced.update(name for name in self._deletes_files.values() if name)
+        for file in self.path.iterdir():
+            if file.name == MANIFEST or file.name in referenced or file.stem in self._reserved:
+                continue
+            try:
+                file.unlink()
+            except OSError:
+                pass  # still mapped on platforms that forbid it; retried next commit
+    
+    def maybe_merge(self) -> None:
+        """Merge the smallest segments in the background once there are too many."""
+        with self._lock:
+            if len(self.segments) <= self.merge_factor:
+                return
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+            victims = sorted(self.segments, key=lambda segment: segment.doc_count)[:self.merge_factor]
+            deleted = [set(segment._deleted) for segment in victims]
+            path = self.new_segment_path()
+            self._merge_thread = threading.Thread(
+                target=self._merge, args=(victims, deleted, path), name="segment-merge", daemon=True
+            )
+            self._merge_thread.start()
+    
+    def _merge(self, victims: List[Segment], deleted: List[Set[int]], path: Path) -> None:
+        try:
+            remaps = merge_segments(path, victims, deleted)
+            merged = Segment(path)
+        except Exception as e:
+            logger.error(f"Segment merge failed: {str(e)}")
+            self.release(path)
+            with self._lock:
+                self._merge_thread = None
+            return
+        
+        with self._lock:
+            # Carry over deletes that happened while the merge was running
+            for segment, dropped, remap in zip(victims, deleted, remaps):
+                for doc in segment._deleted - dropped:
+                    merged.delete_doc(remap[doc])
+            position = self.segments.index(victims[0])
+            self.segments = [segment for segment in self.segments if segment not in victims]
+            self.segments.insert(min(position, len(self.segments)), merged)
+            self._reserved.discard(merged.name)
+            for segment in victims:
+                self._deletes_files.pop(segment.name, None)
+            self._merge_thread = None
+            self.commit()
+            logger.info(f"Merged {len(victims)} segments into {merged.name}")
+            self.maybe_merge()
+    
+    def wait_for_merges(self) -> None:
+        """Block until background merging has finished."""
+        while True:
+            with self._lock:
+                thread = self._merge_thread
+            if thread is None or not thread.is_alive():
+                return
+            thread.join()
+    
+    def close(self) -> None:
+        self.wait_for_merges()
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+            self.segments = []
@@ -0,0 +1,134 @@
+"""
+Hash-partitioned search across several PdfSearchEngine shards.
+
+Each shard is an ordinary PdfSearchEngine owned by a single-worker executor,
+a separate process by default, so shards index and search in parallel on
+their own cores and memory. Queries run in two rounds: the shards' BM25
+statistics are summed first, then every shard ranks with the global numbers.
+That makes per-shard scores directly comparable, and merging the per-shard
+top-k lists gives the same ranking as one engine holding every document.
+"""
+import hashlib
+import heapq
+import uuid
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import reduce
+from operator import add
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+
+from config import SEARCH_SHARDS, SHARD_MAX_PENDING
+from ranking import CollectionStatistics
+from search import PdfSearchEngine
+
+# Engines hosted by this process, keyed by shard id (one per worker process,
+# or every shard of a thread-backed ShardedSearchEngine)
+_engines: Dict[str, PdfSearchEngine] = {}
+
+def _open_shard(shard_id: str, path: Optional[str], options: Dict[str, Any]) -> None:
+    _engines[shard_id] = PdfSearchEngine(path=path, **options)
+
+def _call_shard(shard_id: str, method: str, *args):
+    return getattr(_engines[shard_id], method)(*args)
+
+def _close_shard(shard_id: str) -> None:
+    _engines.pop(shard_id).close()
+
+class ShardedSearchEngine:
+    """PdfSearchEngine-compatible index partitioned across worker shards."""
+    
+    def __init__(self, shards: Optional[int] = None, path: Optional[Union[str, Path]] = None,
+                 backend: str = "process", **options):
+        """
+        Args:
+            shards: Number of hash partitions (defaults to SEARCH_SHARDS)
+            path: Directory for persistent shards (one subdirectory each)
+            backend: "process" for a worker process per shard, or "thread"
+            options: Further PdfSearchEngine arguments for every shard
+        """
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown executor backend: {backend}")
+        self.shard_count = shards or SEARCH_SHARDS
+        self._shard_ids = [f"{uuid.uuid4().hex}-{n}" for n in range(self.shard_count)]
+        self._executors: List[Executor] = []
+        self._pending: deque = deque()
+        
+        for n, shard_id in enumerate(self._shard_ids):
+            shard_path = str(Path(path) / f"shard_{n:03d}") if path is not None else None
+            if backend == "process":
+                executor = ProcessPoolExecutor(
+                    max_workers=1, initializer=_open_shard, initargs=(shard_id, shard_path, options)
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"search-shard-{n}")
+                executor.submit(_open_shard, shard_id, shard_path, options).result()
+            self._executors.append(executor)
+    
+    def shard_for(self, url: str) -> int:
+        """Stable shard number of a URL (independent of PYTHONHASHSEED)."""
+        return int(hashlib.md5(url.encode()).hexdigest()[:8], 16) % self.shard_count
+    
+    def _submit(self, shard: int, method: str, *args) -> Future:
+        return self._executors[shard].submit(_call_shard, self._shard_ids[shard], method, *args)
+    
+    def _broadcast(self, method: str, *args) -> List[Any]:
+        self._drain()
+        futures = [self._submit(shard, method, *args) for shard in range(self.shard_count)]
+        return [future.result() for future in futures]
+    
+    def _drain(self) -> None:
+        """Wait for queued updates so reads see them (re-raising their errors)."""
+        while self._pending:
+            self._pending.popleft().result()
+    
+    def add_document(self, url: str, analysis_results: Dict[str, Any], metadata: Dict[str, Any], full_text: str = "") -> None:
+        """Queue a document on its shard; indexing runs in the background."""
+        self._pending.append(self._submit(self.shard_for(url), 'add_document', url, analysis_results, metadata, full_text))
+        while len(self._pending) > SHARD_MAX_PENDING:
+            self._pending.popleft().result()
+    
+    def remove_document(self, url: str) -> bool:
+        self._drain()
+        return self._submit(self.shard_for(url), 'remove_document', url).result()
+    
+    def commit(self) -> None:
+        self._broadcast('commit')
+    
+    def __len__(self) -> int:
+        return sum(self._broadcast('__len__'))
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Fan the query out to every shard and merge their top-k lists."""
+        statistics = reduce(add, self._broadcast('term_statistics', query), CollectionStatistics())
+        shard_results = self._broadcast('scored_search', query, limit, statistics)
+        # Same order as one engine: score descending, then doc id
+        merged = heapq.nsmallest(
+            limit,
+            (entry for results in shard_results for entry in results),
+            key=lambda entry: (-entry[0], entry[1])
+        )
+        return [result for _, _, result in merged]
+    
+    def close(self) -> None:
+        """Commit and close every shard, then stop the workers."""
+        if not self._executors:
+            return
+        try:
+            self._drain()
+        finally:
+            futures = [
+                executor.submit(_close_shard, shard_id)
+                for executor, shard_id in zip(self._executors, self._shard_ids)
+            ]
+            for future in futures:
+                future.result()
+            for executor in self._executors:
+                executor.shutdown()
+            self._executors = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,56 @@
+"""
+Snippet construction from indexed token positions.
+
+The positions of the query terms in a document come straight from the
+positional postings, so choosing the best window is a two-pointer pass over
+those positions, and rendering it only touches the window's own tokens via
+their recorded start offsets. Neither step depends on document length.
+"""
+import re
+from typing import Callable, List, Sequence, Set, Tuple
+
+from tokenizer import TOKEN_PATTERN
+
+WHITESPACE = re.compile(r'\s+')
+
+def best_window(matches: Sequence[int], width: int) -> Tuple[int, int]:
+    """
+    Return (first token, match count) of the width-token window that covers
+    the most of the sorted match positions; the earliest such window wins.
+    """
+    best_start, best_count = -1, 0
+    end = 0
+    for index, start in enumerate(matches):
+        while end < len(matches) and matches[end] < start + width:
+            end += 1
+        if end - index > best_count:
+            best_start, best_count = start, end - index
+    return best_start, best_count
+
+def render_snippet(token_starts: Sequence[int], length: int, text: Callable[[int, int], str],
+                   first: int, width: int, matches: Set[int]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Render tokens first..first+width-1 and the highlight spans of the matched ones.
+    
+    token_starts holds each token's start offset and length is the content
+    length, in whatever units text(start, end) slices by (bytes for the doc
+    store's UTF-8 content). Whitespace between tokens is collapsed to single
+    spaces.
+    """
+    last = min(first + width, len(token_starts))
+    pieces: List[str] = []
+    highlights: List[Tuple[int, int]] = []
+    offset = 0
+    for position in range(first, last):
+        end = token_starts[position + 1] if position + 1 < len(token_starts) else length
+        piece = text(token_starts[position], end)
+        token_end = TOKEN_PATTERN.match(piece).end()
+        if position in matches:
+            highlights.append((offset, offset + token_end))
+        pieces.append(piece[:token_end])
+        offset += token_end
+        if position + 1 < last:
+            gap = WHITESPACE.sub(' ', piece[token_end:])
+            pieces.append(gap)
+            offset += len(gap)
+    return ''.join(pieces), highlights
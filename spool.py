@@ -0,0 +1,58 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from models import DownloadedPdf
+
+class PdfSpool:
+    """
+    Accumulate a streamed download in memory, rolling over to a temporary
+    file once it grows past max_memory bytes.
+
+    Spooled files are named, so worker processes and fitz can open them by
+    path instead of receiving (and copying) the whole body.
+    """
+
+    def __init__(self, directory: Path, max_memory: int):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = None
+        self._path: Optional[Path] = None
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk, rolling over to disk when the memory budget is exceeded."""
+        self.size += len(chunk)
+        self._digest.update(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._buffer += chunk
+        if len(self._buffer) > self.max_memory:
+            self._rollover()
+
+    def _rollover(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(suffix=".pdf", dir=self.directory)
+        self._path = Path(name)
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+    def finish(self) -> DownloadedPdf:
+        """Close the spool and hand over its content."""
+        if self._file is not None:
+            self._file.close()
+            return DownloadedPdf(source=self._path, size=self.size, sha256=self._digest.hexdigest())
+        return DownloadedPdf(source=bytes(self._buffer), size=self.size, sha256=self._digest.hexdigest())
+
+    def discard(self) -> None:
+        """Drop any buffered data, removing the spooled file if one was created."""
+        if self._file is not None:
+            self._file.close()
+            self._path.unlink(missing_ok=True)
+        self._buffer = bytearray()
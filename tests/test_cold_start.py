@@ -0,0 +1,38 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from tokenizer import ensure_nltk_data
+
+REPO = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("nltk", "sklearn", "scipy", "numpy", "fitz", "aiohttp", "langdetect")
+IMPORT_BUDGET = 0.5  # seconds; importing these eagerly took about 1.6s
+
+def _run(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, check=True
+    ).stdout
+
+def test_import_and_construction_stay_light():
+    """Importing pdf_processor and creating a processor load no heavy dependency."""
+    output = _run(
+        "import sys, tempfile, time\n"
+        "from pathlib import Path\n"
+        "start = time.perf_counter()\n"
+        "import pdf_processor\n"
+        "elapsed = time.perf_counter() - start\n"
+        "pdf_processor.PdfProcessor(storage_path=Path(tempfile.mkdtemp()))\n"
+        f"print(elapsed, *[m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    ).split()
+    assert output[1:] == []
+    assert float(output[0]) < IMPORT_BUDGET
+
+def test_nltk_data_is_checked_once_per_process(monkeypatch):
+    import nltk
+    ensure_nltk_data()
+    find = MagicMock(side_effect=nltk.data.find)
+    monkeypatch.setattr(nltk.data, "find", find)
+    for _ in range(3):
+        ensure_nltk_data()
+    find.assert_not_called()
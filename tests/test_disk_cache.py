@@ -0,0 +1,65 @@
+import pytest
+import time
+from unittest.mock import patch
+from cache import SqliteCache
+from pdf_processor import PdfProcessor
+
+def test_values_survive_reopen(tmp_path):
+    """A new cache instance on the same file sees earlier results."""
+    path = tmp_path / "cache.sqlite3"
+    cache = SqliteCache(path)
+    cache.put("key", {"analysis": {"keywords": [("pdf", 0.5)]}})
+    cache.close()
+
+    reopened = SqliteCache(path)
+    assert reopened.get("key") == {"analysis": {"keywords": [("pdf", 0.5)]}}
+    assert reopened.get("missing") is None
+
+def test_entries_expire(tmp_path):
+    """Entries older than the TTL are misses, but stay readable as stale until the window ends."""
+    cache = SqliteCache(tmp_path / "cache.sqlite3", ttl_seconds=10, stale_ttl_seconds=10)
+    cache.put("key", "value")
+    with patch("cache.time.time", return_value=time.time() + 11):
+        assert cache.get("key") is None
+        assert cache.get_stale("key") == "value"
+    with patch("cache.time.time", return_value=time.time() + 21):
+        assert cache.get_stale("key") is None
+    assert cache.get_stale("key") is None
+
+def test_identical_values_share_storage(tmp_path):
+    """Keys holding the same value store one compressed blob."""
+    cache = SqliteCache(tmp_path / "cache.sqlite3")
+    cache.put("url", {"text": "x" * 1000})
+    cache.put("content", {"text": "x" * 1000})
+    assert cache._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 1
+
+    cache.invalidate("url")
+    assert cache.get("content") == {"text": "x" * 1000}
+    cache.invalidate("content")
+    assert cache._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 0
+
+def test_size_based_eviction(tmp_path):
+    """Least recently used entries are evicted once max_bytes is exceeded."""
+    cache = SqliteCache(tmp_path / "cache.sqlite3", max_bytes=600)
+    for name in ("a", "b", "c"):
+        # Incompressible-ish payloads of ~250 bytes each
+        cache.put(name, name.encode() * 4 + bytes(range(250)))
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+@pytest.mark.asyncio
+async def test_content_hash_hit_from_mirror(mock_aioresponse, pdf_factory, tmp_path):
+    """The same bytes fetched from another URL reuse the cached analysis."""
+    content = pdf_factory(text="Mirrored document.", pages=1)
+    for url in ("http://origin.com/doc.pdf", "http://mirror.com/doc.pdf"):
+        mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(storage_path=tmp_path, persistent_cache=True) as processor:
+        assert isinstance(processor.cache, SqliteCache)
+        first = await processor.process_url("http://origin.com/doc.pdf", "mirrored")
+        with patch.object(processor, "_process_pdf") as process:
+            second = await processor.process_url("http://mirror.com/doc.pdf", "mirrored")
+        process.assert_not_called()
+
+    assert second == first
@@ -33,6 +33,7 @@ async def test_golden_contract(mock_aioresponse, pdf_factory):
     # But usually we want to snapshot everything except timestamps.
     
     result = await processor.process_url(url, "consistency")
+    await processor.close()
     
     # Normalize result for snapshot (remove varying timestamps/paths)
     snapshot = _normalize_result(result)
@@ -13,8 +13,8 @@ async def test_pipeline_valid_pdf(mock_aioresponse, pdf_factory):
     # Mock download
     mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
     
-    processor = PdfProcessor()
-    result = await processor.process_url(url, "test")
+    async with PdfProcessor() as processor:
+        result = await processor.process_url(url, "test")
     
     assert result['metadata']['extraction_status'] == ExtractionStatus.SUCCESS.value
     assert result['analysis']['language'] != 'unknown'
@@ -28,9 +28,9 @@ async def test_pipeline_invalid_file(mock_aioresponse):
     
     mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
     
-    processor = PdfProcessor()
-    with pytest.raises(InvalidFileError):
-        await processor.process_url(url, "test")
+    async with PdfProcessor() as processor:
+        with pytest.raises(InvalidFileError):
+            await processor.process_url(url, "test")
 
 @pytest.mark.asyncio
 async def test_pipeline_failed_download_retry(mock_aioresponse):
@@ -42,12 +42,12 @@ async def test_pipeline_failed_download_retry(mock_aioresponse):
     mock_aioresponse.get(url, exception=Exception("Network fail"))
     mock_aioresponse.get(url, exception=Exception("Network fail"))
     
-    processor = PdfProcessor()
-    # Speed up retries
-    processor.BACKOFF_FACTOR = 0 
-    
-    with pytest.raises(ProcessingError) as exc:
-        await processor.process_url(url, "test")
+    async with PdfProcessor() as processor:
+        # Speed up retries
+        processor.BACKOFF_FACTOR = 0 
+        
+        with pytest.raises(ProcessingError) as exc:
+            await processor.process_url(url, "test")
     
     assert "Failed to download PDF" in str(exc.value)
 
@@ -60,8 +60,8 @@ async def test_pipeline_empty_scanned_pdf(mock_aioresponse, pdf_factory):
     
     mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
     
-    processor = PdfProcessor()
-    result = await processor.process_url(url, "test")
+    async with PdfProcessor() as processor:
+        result = await processor.process_url(url, "test")
     
     assert result['metadata']['extraction_status'] == ExtractionStatus.SCANNED.value
     assert result['analysis']['word_count'] == 0
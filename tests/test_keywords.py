@@ -0,0 +1,83 @@
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from cache import SimpleMemoryCache
+from keywords import IdfTable, KeywordEngine
+from pdf_processor import PdfProcessor
+from text_analysis import ContentAnalyzer
+from tokenizer import TextTokens
+
+CORPUS = [
+    "The search engine ranks documents. The engine stores postings for every document.",
+    "A document about readability: sentences, syllables and words per sentence.",
+    "Keyword extraction weighs every document term against the corpus of documents.",
+    "The engine caches results; the cache evicts the oldest document first.",
+]
+
+@pytest.fixture
+def analyzer():
+    return ContentAnalyzer("en")
+
+def _counts(analyzer, text):
+    return analyzer.profile(TextTokens(text)).ngram_counts
+
+def test_tf_mode_matches_analyzer(analyzer):
+    """TF mode ranks exactly as the per-document analyzer does."""
+    engine = KeywordEngine(mode="tf")
+    for text in CORPUS:
+        profile = analyzer.profile(TextTokens(text))
+        assert engine.keywords("en", profile.ngram_counts) == analyzer.keywords(profile)
+    assert not engine.tables
+
+def test_idf_mode_matches_corpus_vectorizer(analyzer):
+    """The latest document scores as a TfidfVectorizer fitted on the whole corpus would."""
+    engine = KeywordEngine(mode="idf")
+    for text in CORPUS:
+        keywords = engine.keywords("en", _counts(analyzer, text), top_n=5)
+    reference = TfidfVectorizer(stop_words=analyzer.stop_words, ngram_range=(1, 2))
+    row = reference.fit_transform(CORPUS).toarray()[-1]
+    expected = dict(zip(reference.get_feature_names_out(), row))
+    assert [score for _, score in keywords] == pytest.approx(sorted(expected.values(), reverse=True)[:5])
+    for term, score in keywords:
+        assert score == pytest.approx(expected[term])
+    # "document" occurs everywhere, so it drops below distinctive terms
+    assert engine.idf("en", "document") < engine.idf("en", "cache")
+
+def test_idf_tables_persist_per_language(analyzer, tmp_path):
+    engine = KeywordEngine(tmp_path, mode="idf", save_every=2)
+    for text in CORPUS[:3]:
+        engine.keywords("en", _counts(analyzer, text))
+    engine.keywords("fr", {"moteur": 2})
+    assert (tmp_path / "en.idf").exists()  # saved automatically after two documents
+    engine.close()
+
+    reopened = KeywordEngine(tmp_path, mode="idf")
+    assert reopened.idf("en", "document") == engine.idf("en", "document")
+    assert reopened.tables["en"].documents == 3
+    assert reopened.idf("fr", "moteur") == engine.idf("fr", "moteur")
+
+def test_same_document_counted_once(analyzer):
+    """A table counts a content digest once, and keeps the digests it has counted."""
+    table = IdfTable()
+    counts = _counts(analyzer, CORPUS[0])
+    assert table.add(counts, "a" * 64)
+    assert not table.add(counts, "a" * 64)
+    assert table.add(counts)  # without a digest every call counts
+    assert table.documents == 2
+    assert IdfTable.from_bytes(table.to_bytes()).seen == {"a" * 64}
+
+@pytest.mark.asyncio
+async def test_reprocessed_bytes_counted_once(mock_aioresponse, pdf_factory, tmp_path):
+    """Analyzing the same PDF again after a cache miss does not inflate document frequencies."""
+    url = "http://example.com/engine.pdf"
+    content = pdf_factory(text="The engine stores postings for every document.", pages=1)
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"}, repeat=True)
+    async with PdfProcessor(storage_path=tmp_path, keyword_mode="idf") as processor:
+        for _ in range(2):
+            processor.cache = SimpleMemoryCache(sweep_interval=0)
+            await processor.process_url(url, "engine")
+        assert processor.keywords.tables["en"].documents == 1
+
+def test_unknown_keyword_mode_rejected():
+    with pytest.raises(ValueError):
+        KeywordEngine(mode="bm25")
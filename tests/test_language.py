@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+import fitz
+import pytest
+
+import language
+from config import LANGUAGE_PROBE_CHARS
+from language import declared_language, detect_language, stopword_language
+from pdf_processor import PdfProcessor
+
+ENGLISH = (
+    "The committee reviewed the annual report and agreed that the results were better "
+    "than expected. Several members asked whether the budget would be published before "
+    "the next meeting, and the chair promised to circulate it within two weeks. "
+) * 20
+SPANISH = "El comité revisó el informe anual y acordó que los resultados fueron mejores de lo esperado. "
+
+def test_detection_is_deterministic():
+    samples = [ENGLISH[:300], SPANISH, "Data 2024: revenue, cost, margin."]
+    def probabilities():
+        return [[(lang.lang, lang.prob) for lang in language._probabilities(sample)] for sample in samples]
+    first = probabilities()
+    for _ in range(5):
+        assert probabilities() == first
+
+def test_confident_probe_skips_the_full_sample():
+    with patch.object(language, "_probabilities", wraps=language._probabilities) as spy:
+        assert detect_language(ENGLISH[:10000]) == "en"
+    assert [len(call.args[0]) for call in spy.call_args_list] == [LANGUAGE_PROBE_CHARS]
+
+def test_declared_language_tags():
+    assert declared_language("en-US") == "en"
+    assert declared_language("pt_BR") == "pt"
+    assert declared_language("zh-Hant-TW") == "zh-tw"
+    assert declared_language("zh") == "zh-cn"
+    assert declared_language("x-klingon") is None
+    assert declared_language(None) is None
+
+def test_fast_path_trusts_declared_language():
+    assert detect_language(ENGLISH, "fr-FR") == "en"
+    assert detect_language(ENGLISH, "fr-FR", fast_path=True) == "fr"
+    assert detect_language(ENGLISH, "x-klingon", fast_path=True) == "en"
+
+def test_stopword_vote_needs_a_clear_majority():
+    sets = {"en": frozenset({"the", "and", "that", "than", "would", "be", "to", "it"}),
+            "es": frozenset({"el", "y", "que", "los", "de", "lo"})}
+    with patch.object(language, "_stopword_sets", return_value=sets):
+        assert stopword_language(ENGLISH) == "en"
+        assert stopword_language(SPANISH * 3) == "es"
+        assert stopword_language("report " * 40) is None
+        assert stopword_language("the report") is None  # too few words to judge
+
+def _pdf_declaring(lang, text):
+    doc = fitz.open()
+    doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), text)
+    doc.xref_set_key(doc.pdf_catalog(), "Lang", f"({lang})")
+    return doc.tobytes()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("keep_full_text", [True, False])
+async def test_processor_uses_declared_language_on_fast_path(mock_aioresponse, tmp_path, keep_full_text):
+    url = "http://example.com/declared.pdf"
+    content = _pdf_declaring("es-ES", ENGLISH[:2000])
+    for _ in range(2):
+        mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(storage_path=tmp_path / "detect", keep_full_text=keep_full_text) as processor:
+        detected = await processor.process_url(url, "report")
+    async with PdfProcessor(storage_path=tmp_path / "fast", keep_full_text=keep_full_text,
+                            language_fast_path=True) as processor:
+        declared = await processor.process_url(url, "report")
+
+    assert detected['metadata']['language'] == declared['metadata']['language'] == "es-ES"
+    assert detected['analysis']['language'] == "en"
+    assert declared['analysis']['language'] == "es"
@@ -0,0 +1,62 @@
+import fitz
+import pytest
+
+from pdf_ops import PageStreamAnalysis, analyze_text_content, fallback_analysis, with_query
+from pdf_processor import PdfProcessor
+from text_analysis import ContentAnalyzer, load_stopwords
+
+PAGES = [
+    "Mr. Smith reviewed the search engine on page one. It ranks documents with BM25.\n",
+    "The index stores postings; each posting lists documents and posi",
+    "tions. Dr. Jones asked whether the U.S. office\n",
+    "agreed. Search results are cached. Was the search engine fast? Yes!\n",
+    "1. Extraction. 2. Analysis. The search engine wins.\n",
+]
+
+def _resolve(sample):
+    return "en", ContentAnalyzer("en"), load_stopwords("en")
+
+def _multi_page_pdf(pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), text)
+    return doc.tobytes()
+
+def test_page_stream_matches_full_text_analysis():
+    """Feeding pages one at a time gives the results of analyzing their concatenation."""
+    language, analyzer, stopwords = _resolve("")
+    stream = PageStreamAnalysis("search engine", _resolve)
+    for page in PAGES * 3:
+        stream.feed(page)
+    result, profile = stream.finish()
+    assert result == analyze_text_content("".join(PAGES * 3), "search engine", language, analyzer, stopwords)
+    assert profile.word_count == result['word_count']
+
+def test_page_stream_falls_back_when_detection_fails():
+    def fail(sample):
+        raise ValueError("no features in text")
+    stream = PageStreamAnalysis("engine", fail)
+    for page in PAGES:
+        stream.feed(page)
+    text = "".join(PAGES)
+    expected = fallback_analysis(len(text.split()), len(text), text)
+    assert stream.finish() == (with_query(expected, "engine", 3), None)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["thread", "process"])
+async def test_processor_streams_pages_without_full_text(mock_aioresponse, tmp_path, backend):
+    """keep_full_text=False reports the same analysis and never returns the text."""
+    url = f"http://example.com/{backend}-stream.pdf"
+    content = _multi_page_pdf(PAGES)
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(storage_path=tmp_path / "full") as full:
+        expected = await full.process_url(url, "search")
+    async with PdfProcessor(executor_backend=backend, max_workers=1, storage_path=tmp_path / "stream", keep_full_text=False) as streaming:
+        result = await streaming.process_url(url, "search")
+
+    assert result['full_text'] is None
+    assert result['metadata'] == expected['metadata']
+    assert result['analysis'] == expected['analysis']
+    assert result['analysis']['word_count'] > 0
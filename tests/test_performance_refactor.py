@@ -20,18 +20,18 @@ class TestPerformanceRefactor(unittest.TestCase):
         
         try:
             # First call
-            loop.run_until_complete(processor._analyze_content("Hello world this is a test.", "test"))
+            loop.run_until_complete(processor._analyze_content("Hello world this is a test."))
             self.assertIn("en", processor.analyzers)
             self.assertEqual(len(processor.analyzers), 1)
             first_analyzer = processor.analyzers["en"]
             
             # Second call (same language)
-            loop.run_until_complete(processor._analyze_content("Another english text.", "test"))
+            loop.run_until_complete(processor._analyze_content("Another english text."))
             self.assertEqual(len(processor.analyzers), 1)
             self.assertIs(processor.analyzers["en"], first_analyzer, "Should reuse the exact same instance")
             
             # Third call (different language)
-            loop.run_until_complete(processor._analyze_content("Hola mundo esto es una prueba.", "prueba"))
+            loop.run_until_complete(processor._analyze_content("Hola mundo esto es una prueba."))
             self.assertEqual(len(processor.analyzers), 2)
             self.assertIn("es", processor.analyzers)
             
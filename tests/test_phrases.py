@@ -0,0 +1,109 @@
+import hashlib
+import random
+import re
+import zlib
+from unittest.mock import patch
+
+import pytest
+
+from pdf_ops import decompressed_pieces, document_phrase_counts
+from pdf_processor import PdfProcessor
+from phrases import PhraseCounter, count_phrases
+
+TEXT = (
+    "The search engine indexes documents. A search-engine query; search engines rank.\n"
+    "Mr. Smith's engine -- the SEARCH ENGINE -- ran at 10:30 p.m. on 3,36 pages (e.g. page 2).\n"
+    "engine engine engineering re-engine .. ... search  engine searchengine"
+).lower()
+
+PHRASES = [
+    "search engine", "engine", "engine engine", "search", "e.g.", "p.m.", "--", "..",
+    "10:30", "smith's", "re-engine", "search-engine", "pages (e.g", "absent", "Search Engine"
+]
+
+def _regex_counts(lowered, phrases):
+    return {phrase: len(re.findall(rf'\b{re.escape(phrase.lower())}\b', lowered)) for phrase in phrases}
+
+def test_counts_match_whole_word_regex():
+    assert count_phrases(TEXT, PHRASES) == _regex_counts(TEXT, PHRASES)
+
+def test_occurrences_spanning_fed_pieces_are_counted():
+    expected = _regex_counts(TEXT, PHRASES)
+    for seed in range(20):
+        rng = random.Random(seed)
+        cuts = sorted(rng.sample(range(1, len(TEXT)), rng.randint(1, 40)))
+        counter = PhraseCounter(PHRASES)
+        for start, end in zip([0] + cuts, cuts + [len(TEXT)]):
+            counter.feed(TEXT[start:end])
+        assert counter.counts() == expected
+
+def test_many_phrases_in_one_pass():
+    words = re.findall(r'\w+', TEXT)
+    rng = random.Random(0)
+    phrases = [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(300)] + words
+    assert count_phrases(TEXT, phrases) == _regex_counts(TEXT, phrases)
+
+def test_compressed_text_is_scanned_in_pieces():
+    """Kept text is decompressed piecewise, even through multi-byte characters, with the same counts."""
+    text = ("Café engine, naïve search engine — ünïcode engine. " * 50).lower()
+    compressed = zlib.compress(text.encode('utf-8'))
+    pieces = list(decompressed_pieces(compressed, size=7))
+    assert "".join(pieces) == text
+    assert max(len(piece.encode("utf-8")) for piece in pieces) <= 7 + 3  # plus a split character
+    assert document_phrase_counts(None, compressed, PHRASES) == count_phrases(text, PHRASES)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("keep_full_text", [True, False])
+async def test_processor_answers_new_phrases_from_cache(mock_aioresponse, pdf_factory, tmp_path, keep_full_text):
+    """The cached analysis serves any phrase; query_url counts many at once."""
+    url = "http://example.com/phrases.pdf"
+    mock_aioresponse.get(url, body=pdf_factory(text="The search engine ranks. Search engines index; the engine wins."),
+                         headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(storage_path=tmp_path, keep_full_text=keep_full_text, keep_compressed_text=True) as processor:
+        download = processor._download_pdf
+        with patch.object(processor, "_download_pdf", side_effect=download) as spy:
+            first = await processor.process_url(url, "search engine")
+            second = await processor.process_url(url, "engine")
+            queries = await processor.query_url(url, ["engine", "search engine", "ranks", "absent"])
+
+        assert spy.call_count == 1
+
+    assert first['analysis']['search_term_count'] == 1
+    assert second['analysis']['search_term_count'] == 2
+    assert 'compressed_text' not in second
+    assert {phrase: query['search_term_count'] for phrase, query in queries.items()} == {
+        "engine": 2, "search engine": 1, "ranks": 1, "absent": 0
+    }
+    assert queries["engine"]['matching_keywords'] == second['analysis']['matching_keywords']
+
+@pytest.mark.asyncio
+async def test_streamed_text_is_not_kept_by_default(mock_aioresponse, pdf_factory, tmp_path):
+    """Without a kept copy, phrases are counted while streaming; a new phrase streams the document again."""
+    url = "http://example.com/streamed.pdf"
+    content = pdf_factory(text="The search engine ranks. Search engines index; the engine wins.")
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"}, repeat=True)
+
+    async with PdfProcessor(storage_path=tmp_path, keep_full_text=False) as processor:
+        download = processor._download_pdf
+        with patch.object(processor, "_download_pdf", side_effect=download) as spy:
+            first = await processor.process_url(url, "search engine")
+            again = await processor.process_url(url, "search engine")
+            assert spy.call_count == 1
+            second = await processor.process_url(url, "engine")
+            queries = await processor.query_url(url, ["engine", "search engine", "ranks"])
+            assert spy.call_count == 3
+            await processor.process_url(url, "ranks")
+            assert spy.call_count == 3  # counted with the query
+
+        record = processor.cache.get(f"pdf_analysis_{hashlib.md5(url.encode()).hexdigest()}")
+        assert 'compressed_text' not in record
+        assert record['phrase_counts'] == {"search engine": 1, "engine": 2, "ranks": 1}
+
+    assert first == again
+    assert first['analysis']['search_term_count'] == 1
+    assert second['analysis']['search_term_count'] == 2
+    assert 'phrase_counts' not in second
+    assert {phrase: query['search_term_count'] for phrase, query in queries.items()} == {
+        "engine": 2, "search engine": 1, "ranks": 1
+    }
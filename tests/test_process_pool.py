@@ -0,0 +1,159 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+import fitz
+import workers
+from pdf_processor import PdfProcessor
+from models import ExtractionStatus
+from pdf_ops import process_pdf_content, split_page_ranges
+
+def test_unknown_backend_rejected():
+    """Only thread and process backends are supported."""
+    with pytest.raises(ValueError):
+        PdfProcessor(executor_backend="gpu")
+
+def test_unknown_worker_start_method_rejected():
+    with pytest.raises(ValueError):
+        PdfProcessor(executor_backend="process", worker_start_method="vfork")
+
+def _preloaded():
+    """Whether this worker was forked from a fork server that ran the preload hook."""
+    return "preload" in sys.modules and bool(workers._analyzers)
+
+def test_worker_reuses_analyzer():
+    """Worker-side analyzers are created once per language and reused."""
+    workers._analyzers.clear()
+    workers.analyze_text("Hello world this is a test.", "test", "en")
+    first = workers.get_analyzer("en")
+    workers.analyze_text("Another english text.", "test", "en")
+    assert workers.get_analyzer("en") is first
+    assert len(workers._analyzers) == 1
+
+@pytest.mark.asyncio
+async def test_process_backend_matches_thread_backend(mock_aioresponse, pdf_factory):
+    """The process pool produces the same results as the thread pool."""
+    url = "http://example.com/pool.pdf"
+    content = pdf_factory(text="Process pools share nothing but results.", pages=3)
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(executor_backend="thread") as threaded:
+        expected = await threaded.process_url(url, "pools")
+    async with PdfProcessor(executor_backend="process", max_workers=2) as pooled:
+        result = await pooled.process_url(url, "pools")
+        # Analyzers live in the workers, not in the coordinating process
+        assert pooled.analyzers == {}
+
+    assert pooled._executor is None
+    assert result['metadata']['extraction_status'] == ExtractionStatus.SUCCESS.value
+    assert result['analysis'] == expected['analysis']
+    assert result['full_text'] == expected['full_text']
+
+@pytest.mark.asyncio
+async def test_process_backend_ranks_idf_keywords_in_parent(mock_aioresponse, pdf_factory, tmp_path):
+    """Workers return n-gram counts; the parent's corpus table ranks them as the thread backend does."""
+    url = "http://example.com/idf.pdf"
+    content = pdf_factory(text="Corpus statistics rank distinctive keywords above common ones.", pages=2)
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(executor_backend="thread", storage_path=tmp_path / "t", keyword_mode="idf") as threaded:
+        expected = await threaded.process_url(url, "keywords")
+    async with PdfProcessor(executor_backend="process", max_workers=1, storage_path=tmp_path / "p", keyword_mode="idf") as pooled:
+        result = await pooled.process_url(url, "keywords")
+        assert pooled.keywords.tables["en"].documents == 1
+
+    assert result['analysis'] == expected['analysis']
+    assert result['analysis']['matching_keywords']
+    assert (tmp_path / "p" / "keywords" / "en.idf").exists()
+
+@pytest.mark.asyncio
+async def test_forkserver_workers_start_warm_and_are_recycled(mock_aioresponse, pdf_factory, tmp_path):
+    """Forkserver workers inherit the preloaded models; pools are replaced after max_tasks_per_child jobs per worker."""
+    urls = [f"http://example.com/forkserver-{i}.pdf" for i in range(2)]
+    for i, url in enumerate(urls):
+        content = pdf_factory(text=f"Warm workers fork quickly, document {i}.", pages=2)
+        mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+        mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(executor_backend="thread", storage_path=tmp_path / "t") as threaded:
+        expected = [await threaded.process_url(url, "workers") for url in urls]
+    async with PdfProcessor(executor_backend="process", max_workers=1, storage_path=tmp_path / "p",
+                            worker_start_method="forkserver", max_tasks_per_child=2) as pooled:
+        first = await pooled.process_url(urls[0], "workers")
+        pool = pooled._executor
+        assert pool.submit(_preloaded).result()
+        second = await pooled.process_url(urls[1], "workers")
+        assert pooled._executor is not pool
+
+    assert [first['analysis'], second['analysis']] == [result['analysis'] for result in expected]
+
+@pytest.mark.asyncio
+async def test_every_submission_counts_toward_recycling(mock_aioresponse, pdf_factory, tmp_path):
+    """Page-range jobs are counted one by one, so no pool is given more than max_tasks_per_child per worker."""
+    url = "http://example.com/recycled-pages.pdf"
+    mock_aioresponse.get(url, body=pdf_factory(text="Recycled page", pages=6), headers={"Content-Type": "application/pdf"})
+    given = {}
+
+    async with PdfProcessor(executor_backend="process", max_workers=3, storage_path=tmp_path,
+                            page_parallel_threshold=2, max_tasks_per_child=1) as processor:
+        get_executor = processor._get_executor
+        def counting_get_executor():
+            executor = get_executor()
+            given[executor] = given.get(executor, 0) + 1
+            return executor
+        with patch.object(processor, "_get_executor", side_effect=counting_get_executor):
+            result = await processor.process_url(url, "page")
+
+    assert result['analysis']['search_term_count'] == 6
+    assert sum(given.values()) == 5  # metadata, three page ranges, analysis
+    assert sorted(given.values()) == [2, 3]
+
+@pytest.mark.asyncio
+async def test_pool_starts_with_the_first_cpu_job(mock_aioresponse, tmp_path):
+    """A download that fails, or a cached URL, does not start the worker pool."""
+    url = "http://example.com/not-a-pdf"
+    mock_aioresponse.get(url, body=b"<html>nope</html>", headers={"Content-Type": "text/html"})
+
+    async with PdfProcessor(executor_backend="process", storage_path=tmp_path) as processor:
+        with pytest.raises(Exception):
+            await processor.process_url(url, "x")
+        assert processor._executor is None
+
+def test_thread_pool_warms_up_in_background():
+    """Creating the thread pool starts loading the NLP models without counting a job."""
+    processor = PdfProcessor(executor_backend="thread")
+    with patch.object(workers, "warm_up") as warm_up:
+        executor = processor._get_executor()
+        executor.shutdown(wait=True)
+    warm_up.assert_called_once_with()
+    assert processor._executor_tasks == 1
+
+def test_split_page_ranges_cover_all_pages():
+    """Ranges are contiguous, ordered and cover every page exactly once."""
+    assert split_page_ranges(10, 3) == [(0, 4), (4, 8), (8, 10)]
+    assert split_page_ranges(2, 8) == [(0, 1), (1, 2)]
+    assert split_page_ranges(0, 4) == []
+
+def test_split_threshold_defers_extraction(pdf_factory):
+    """Documents at or above the threshold return metadata only."""
+    content = pdf_factory(text="Deferred", pages=4)
+    text, metadata = process_pdf_content(content, split_threshold=4)
+    assert text is None
+    assert metadata.page_count == 4
+
+@pytest.mark.asyncio
+async def test_page_parallel_extraction_preserves_order():
+    """Page-parallel extraction reassembles pages in document order."""
+    doc = fitz.open()
+    for number in range(12):
+        doc.new_page().insert_text((50, 50), f"Page {number}")
+    content = doc.tobytes()
+    expected, expected_metadata = process_pdf_content(content)
+
+    async with PdfProcessor(executor_backend="process", max_workers=3, page_parallel_threshold=5) as processor:
+        text, metadata = await processor._process_pdf(content)
+
+    assert text == expected
+    assert metadata == expected_metadata
@@ -0,0 +1,68 @@
+import pytest
+import time
+from unittest.mock import patch
+from yarl import URL
+from cache import SimpleMemoryCache, approximate_size
+from pdf_processor import PdfProcessor
+
+@pytest.mark.asyncio
+async def test_expired_entry_revalidated_with_etag(mock_aioresponse, pdf_factory):
+    """A 304 answer to a conditional request reuses the stored analysis."""
+    url = "http://example.com/nightly.pdf"
+    content = pdf_factory(text="Unchanged nightly report.", pages=1)
+    mock_aioresponse.get(url, body=content, headers={
+        "Content-Type": "application/pdf",
+        "ETag": '"v1"',
+        "Last-Modified": "Wed, 01 Jul 2026 00:00:00 GMT"
+    })
+    mock_aioresponse.get(url, status=304)
+
+    cache = SimpleMemoryCache(ttl_seconds=10, sweep_interval=0)
+    async with PdfProcessor(cache=cache) as processor:
+        first = await processor.process_url(url, "report")
+        with patch("cache.time.time", return_value=time.time() + 11), \
+                patch.object(processor, "_process_pdf") as process:
+            second = await processor.process_url(url, "report")
+        process.assert_not_called()
+
+    assert second == first
+    conditional = mock_aioresponse.requests[("GET", URL(url))][1]
+    assert conditional.kwargs['headers'] == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': "Wed, 01 Jul 2026 00:00:00 GMT"
+    }
+
+@pytest.mark.asyncio
+async def test_changed_document_is_reprocessed(mock_aioresponse, pdf_factory):
+    """A full response to a conditional request is analyzed again."""
+    url = "http://example.com/changing.pdf"
+    mock_aioresponse.get(url, body=pdf_factory(text="First edition."),
+                         headers={"Content-Type": "application/pdf", "ETag": '"v1"'})
+    mock_aioresponse.get(url, body=pdf_factory(text="Second edition."),
+                         headers={"Content-Type": "application/pdf", "ETag": '"v2"'})
+
+    cache = SimpleMemoryCache(ttl_seconds=10, sweep_interval=0)
+    async with PdfProcessor(cache=cache) as processor:
+        await processor.process_url(url, "edition")
+        with patch("cache.time.time", return_value=time.time() + 11):
+            second = await processor.process_url(url, "edition")
+
+    assert "Second edition." in second['full_text']
+
+@pytest.mark.asyncio
+async def test_processed_url_uses_one_cache_entry(mock_aioresponse, pdf_factory):
+    """The URL key, the content key and the validators share one record, counted once."""
+    url = "http://example.com/budget.pdf"
+    mock_aioresponse.get(url, body=pdf_factory(text="One record per document."),
+                         headers={"Content-Type": "application/pdf", "ETag": '"v1"'})
+
+    cache = SimpleMemoryCache(sweep_interval=0)
+    async with PdfProcessor(cache=cache) as processor:
+        result = await processor.process_url(url, "record")
+
+    stats = cache.stats()
+    record = cache.get_stale(next(key for key in cache._cache if key.startswith("pdf_analysis_")))
+    assert (stats['entries'], stats['values']) == (2, 1)
+    assert stats['bytes'] == approximate_size(record)
+    assert list(record['validators'].values()) == [{'etag': '"v1"', 'last_modified': None}]
+    assert 'validators' not in result
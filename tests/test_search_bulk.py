@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+import pytest
+
+import search
+from config import BULK_PARALLEL_MIN_DOCS
+from search import PdfSearchEngine
+
+TEXTS = {
+    "http://a.com": "Who is John Galt? John Galt is a man.",
+    "http://b.com": "John Smith wrote this about galt mining",
+    "http://c.com": "Atlas shrugged, and nobody knew who John was",
+}
+
+def _result(url):
+    return {'analysis': {'language': 'en'}, 'metadata': {'title': url}, 'full_text': TEXTS[url]}
+
+def _summary(results):
+    return [(r['url'], r['relevance_score'], r['snippet'], r['highlights']) for r in results]
+
+def test_bulk_matches_per_document_indexing(tmp_path):
+    """add_documents ranks and renders results exactly like add_document."""
+    single = PdfSearchEngine()
+    for url in TEXTS:
+        single.add_document(url, {'language': 'en'}, {'title': url}, TEXTS[url])
+    
+    bulk = PdfSearchEngine()
+    assert bulk.add_documents([(url, _result(url)) for url in TEXTS], batch_size=2, workers=1) == 3
+    with PdfSearchEngine(path=tmp_path) as persistent:
+        persistent.add_documents([(url, _result(url)) for url in TEXTS], batch_size=2, workers=1)
+        for query in ("john galt", '"john galt"', "who NEAR/3 john"):
+            expected = _summary(single.search(query))
+            assert _summary(bulk.search(query)) == expected
+            assert _summary(persistent.search(query)) == expected
+
+@pytest.mark.parametrize("parallel_min_docs", [1, BULK_PARALLEL_MIN_DOCS])
+def test_bulk_accepts_process_stream_items(monkeypatch, parallel_min_docs):
+    """Failed (url, None, error) entries are skipped; large enough batches tokenize in a pool."""
+    monkeypatch.setattr(search, "BULK_PARALLEL_MIN_DOCS", parallel_min_docs)
+    items = [("http://a.com", _result("http://a.com"), None), ("http://bad.com", None, "timeout"),
+             ("http://b.com", _result("http://b.com"), None)]
+    engine = PdfSearchEngine()
+    with patch.object(search, "ProcessPoolExecutor", wraps=search.ProcessPoolExecutor) as pool:
+        assert engine.add_documents(items, workers=2) == 2
+    assert pool.call_count == (1 if parallel_min_docs == 1 else 0)
+    assert {r['url'] for r in engine.search("john")} == {"http://a.com", "http://b.com"}
+
+def test_bulk_load_publishes_atomically(tmp_path):
+    """Bulk segments replace earlier versions and become visible in one commit."""
+    with PdfSearchEngine(path=tmp_path) as engine:
+        engine.add_document("http://a.com", {}, {}, "stale alpha")
+        engine.commit()
+        engine.add_document("http://b.com", {}, {}, "buffered beta")
+        generation = engine.store.generation
+        items = [(url, _result(url)) for url in TEXTS] + [("http://a.com", {'analysis': {}, 'metadata': {}, 'full_text': "fresh alpha"})]
+        assert engine.add_documents(items, batch_size=2, workers=1) == 4
+        assert engine.store.generation == generation + 1
+        assert engine.search("stale") == []
+        assert engine.search("buffered") == []
+    
+    with PdfSearchEngine(path=tmp_path) as reopened:
+        assert len(reopened) == 3
+        assert [r['url'] for r in reopened.search("alpha")] == ["http://a.com"]
+        assert {r['url'] for r in reopened.search("john")} == {"http://b.com", "http://c.com"}
+
+def test_failed_bulk_load_leaves_index_unchanged(tmp_path):
+    """An error mid-load discards the segments written so far."""
+    def items():
+        yield "http://a.com", _result("http://a.com")
+        yield "http://b.com", _result("http://b.com")
+        raise RuntimeError("source failed")
+    
+    with PdfSearchEngine(path=tmp_path) as engine:
+        with pytest.raises(RuntimeError):
+            engine.add_documents(items(), batch_size=1, workers=1)
+        assert len(engine) == 0
+        assert list(tmp_path.glob("*.seg")) == []
+
+def test_failed_in_memory_bulk_load_leaves_index_unchanged():
+    """An in-memory engine keeps its earlier documents and gains none of a failed load's batches."""
+    def items():
+        yield "http://a.com", {'analysis': {}, 'metadata': {}, 'full_text': "fresh alpha"}
+        yield "http://b.com", _result("http://b.com")
+        raise RuntimeError("source failed")
+    
+    engine = PdfSearchEngine()
+    engine.add_document("http://a.com", {}, {}, "stale alpha")
+    with pytest.raises(RuntimeError):
+        engine.add_documents(items(), batch_size=1, workers=1)
+    assert len(engine) == 1
+    assert [r['url'] for r in engine.search("stale")] == ["http://a.com"]
+    assert engine.search("fresh") == engine.search("john") == []
+    
+    assert engine.add_documents([(url, _result(url)) for url in TEXTS], batch_size=2, workers=1) == 3
+    assert len(engine) == 3
+    assert engine.search("stale") == []
+
+@pytest.mark.asyncio
+async def test_add_document_stream():
+    """Async streams are batched and indexed off the event loop."""
+    async def stream():
+        for url in TEXTS:
+            yield url, _result(url), None
+    
+    engine = PdfSearchEngine()
+    assert await engine.add_document_stream(stream(), batch_size=2, workers=1) == 3
+    assert len(engine) == 3
+    assert [r['url'] for r in engine.search('"john galt"')] == ["http://a.com"]
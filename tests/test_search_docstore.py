@@ -0,0 +1,51 @@
+from array import array
+
+from docstore import ContentStore
+from index import invert
+from search import PdfSearchEngine
+
+def _put(store, key, text):
+    store.put(key, text, invert(text)[3])
+
+def test_content_store_round_trip():
+    """Content and token byte offsets survive compression across many blocks."""
+    store = ContentStore(block_size=256)
+    texts = {f"doc{n}": f"Café {n} naïve résumé " * (n + 1) for n in range(40)}
+    for key, text in texts.items():
+        _put(store, key, text)
+    _put(store, "empty", "")
+    
+    assert len(store._blocks) > 1
+    for key, text in texts.items():
+        content, starts = store.get(key)
+        assert content.decode() == text
+        assert [content[start:].decode().split()[0] for start in starts] == text.split()
+    assert store.get("empty") == (b'', array('I'))
+
+def test_content_store_compacts_removed_records():
+    """Replaced and removed records are dropped once they dominate the store."""
+    store = ContentStore(block_size=256)
+    for n in range(50):
+        _put(store, f"doc{n % 5}", f"version {n} " * 20)
+    assert store.remove("doc0")
+    assert not store.remove("doc0")
+    
+    assert len(store) == 4
+    assert store._dead <= store._written // 4
+    assert store.get("doc1")[0].decode() == "version 46 " * 20
+
+def test_content_is_compressed_and_decompressed_lazily(tmp_path):
+    """Segments keep content compressed; a search decompresses only its results' blocks."""
+    text = "the quick brown fox jumps over the lazy dog " * 500
+    with PdfSearchEngine(path=tmp_path) as engine:
+        for n in range(30):
+            engine.add_document(f"http://doc{n}.com", {}, {}, text + f" marker{n}")
+        assert engine.contents.nbytes < 30 * len(text) // 10
+        engine.commit()
+        segment, = engine.store.segments
+        assert len(segment._blocks) < 30 * len(text) // 10
+        
+        result, = engine.search("marker17")
+        assert result['url'] == "http://doc17.com"
+        assert result['snippet'].endswith("marker17...")
+        assert segment._block.cache_info().misses == 1
@@ -0,0 +1,63 @@
+from index import InvertedIndex, PostingCursor, PostingList, SKIP_INTERVAL, EXHAUSTED
+from search import PdfSearchEngine
+
+def _add(engine, url, text):
+    engine.add_document(url, {'language': 'en'}, {'title': url}, full_text=text)
+
+def test_postings_are_delta_encoded_arrays():
+    """Postings store doc id gaps and term frequencies in typed arrays."""
+    index = InvertedIndex()
+    for n in range(3):
+        index.add(f"doc{n}", {"common": n + 1})
+    postings = index.postings["common"]
+    assert postings.deltas.typecode == 'I'
+    assert list(postings.deltas) == [1, 1, 1]
+    assert list(postings) == [(0, 1), (1, 2), (2, 3)]
+
+def test_cursor_advance_skips_blocks():
+    """advance() lands on the first posting at or after the target across skip blocks."""
+    postings = PostingList()
+    for doc in range(0, SKIP_INTERVAL * 6, 3):
+        postings.append(doc, 1)
+    cursor = PostingCursor(postings)
+    assert cursor.advance(SKIP_INTERVAL * 4 + 2) == SKIP_INTERVAL * 4 + 4
+    assert cursor.next() == SKIP_INTERVAL * 4 + 7
+    assert cursor.advance(SKIP_INTERVAL * 6) == EXHAUSTED
+
+def test_intersect_ignores_deleted_documents():
+    """Intersections only return live documents containing every term."""
+    index = InvertedIndex()
+    for n in range(1000):
+        terms = {"all": 1}
+        if n % 7 == 0:
+            terms["seven"] = 1
+        if n % 11 == 0:
+            terms["eleven"] = 1
+        index.add(f"doc{n}", terms)
+    index.delete("doc77")
+    keys = [index.key_of(doc) for doc in index.intersect(["seven", "eleven", "all"])]
+    assert keys == [f"doc{n}" for n in range(0, 1000, 77) if n != 77]
+
+def test_readding_document_replaces_postings():
+    """Re-adding a URL does not duplicate postings or keep stale terms."""
+    engine = PdfSearchEngine()
+    _add(engine, "http://a.com", "alpha beta")
+    _add(engine, "http://a.com", "gamma beta")
+    assert engine.search("alpha") == []
+    results = engine.search("beta")
+    assert [r['url'] for r in results] == ["http://a.com"]
+    assert len(engine.index) == 1
+
+def test_remove_document_and_compaction():
+    """Removed documents disappear from results and compaction keeps the rest."""
+    engine = PdfSearchEngine()
+    for n in range(10):
+        _add(engine, f"http://doc{n}.com", f"shared unique{n}")
+    for n in range(5):
+        assert engine.remove_document(f"http://doc{n}.com")
+    assert not engine.remove_document("http://missing.com")
+
+    urls = {r['url'] for r in engine.search("shared", limit=20)}
+    assert urls == {f"http://doc{n}.com" for n in range(5, 10)}
+    assert engine.index.doc_freq("unique0") == 0
+    assert [r['url'] for r in engine.search("unique7")] == ["http://doc7.com"]
@@ -0,0 +1,44 @@
+from index import InvertedIndex, SKIP_INTERVAL
+from query import parse_query
+from search import PdfSearchEngine
+
+def _add(engine, url, text):
+    engine.add_document(url, {'language': 'en'}, {'title': url}, full_text=text)
+
+def _tokenize(text):
+    return text.lower().split()
+
+def test_parse_query_phrases_and_near():
+    """Quoted phrases become ordered clauses and NEAR/k joins its neighbours."""
+    parsed = parse_query('"who is john galt" atlas NEAR/3 shrugged', _tokenize)
+    assert parsed.terms == ["who", "is", "john", "galt", "atlas", "shrugged"]
+    phrase, near = parsed.clauses
+    assert phrase.terms == ["who", "is", "john", "galt"] and phrase.ordered
+    assert near.terms == ["atlas", "shrugged"] and near.slop == 3 and not near.ordered
+
+def test_cursor_positions_across_blocks():
+    """Positions are decoded correctly for postings past the first skip block."""
+    index = InvertedIndex()
+    for n in range(SKIP_INTERVAL * 2 + 5):
+        index.add(f"doc{n}", {"term": 2}, {"term": [n, n + 10]})
+    cursor = index.cursor("term")
+    cursor.advance(SKIP_INTERVAL + 3)
+    assert cursor.positions() == [SKIP_INTERVAL + 3, SKIP_INTERVAL + 13]
+
+def test_phrase_query_requires_adjacent_terms():
+    """A quoted phrase only matches documents with the words in sequence."""
+    engine = PdfSearchEngine()
+    _add(engine, "http://phrase.com", "people keep asking who is john galt today")
+    _add(engine, "http://scattered.com", "john asked who galt is")
+    assert [r['url'] for r in engine.search('"who is john galt"')] == ["http://phrase.com"]
+    assert {r['url'] for r in engine.search('who is john galt')} == {"http://phrase.com", "http://scattered.com"}
+
+def test_near_query_limits_distance(tmp_path):
+    """NEAR/k matches terms within k tokens in either order, also from segments."""
+    with PdfSearchEngine(path=tmp_path) as engine:
+        _add(engine, "http://close.com", "galt spoke and john listened")
+        _add(engine, "http://far.com", "john went home and much later on galt arrived")
+    with PdfSearchEngine(path=tmp_path) as engine:
+        assert [r['url'] for r in engine.search("john NEAR/3 galt")] == ["http://close.com"]
+        assert {r['url'] for r in engine.search("john NEAR/8 galt")} == {"http://close.com", "http://far.com"}
+        assert engine.search('"galt john"') == []
@@ -0,0 +1,64 @@
+import random
+from index import InvertedIndex
+from ranking import BM25, TermScorer, wand_top_k
+from search import PdfSearchEngine
+
+def _add(engine, url, text):
+    engine.add_document(url, {'language': 'en'}, {'title': url}, full_text=text)
+
+def test_bm25_rewards_frequency_and_short_documents():
+    """Repeated terms rank higher; at equal frequency shorter documents win."""
+    engine = PdfSearchEngine()
+    _add(engine, "http://once.com", "galt appears once among many other words here")
+    _add(engine, "http://often.com", "galt galt galt appears often here")
+    _add(engine, "http://short.com", "galt once")
+    _add(engine, "http://none.com", "nothing relevant")
+    urls = [r['url'] for r in engine.search("galt")]
+    assert urls[0] == "http://often.com"
+    assert urls.index("http://short.com") < urls.index("http://once.com")
+    assert "http://none.com" not in urls
+
+def test_wand_matches_exhaustive_scoring():
+    """WAND top-k returns exactly the exhaustively computed best k."""
+    rng = random.Random(7)
+    vocabulary = [f"t{n}" for n in range(30)]
+    index = InvertedIndex()
+    for n in range(2000):
+        words = rng.choices(vocabulary, weights=range(30, 0, -1), k=rng.randint(5, 60))
+        freqs = {}
+        for word in words:
+            freqs[word] = freqs.get(word, 0) + 1
+        index.add(f"doc{n}", freqs)
+    for n in range(0, 2000, 9):
+        index.delete(f"doc{n}")
+    
+    bm25 = BM25()
+    query = ["t0", "t5", "t17", "t29"]
+    average = index.average_length
+    idfs = {term: bm25.idf(index.max_doc, index.doc_freq(term)) for term in query}
+    
+    exhaustive = {}
+    for term in query:
+        for doc, freq in index.documents(term):
+            exhaustive[doc] = exhaustive.get(doc, 0.0) + bm25.score(idfs[term], freq, index.doc_lengths[doc], average)
+    expected = sorted(exhaustive.items(), key=lambda item: (-item[1], item[0]))[:10]
+    
+    scorers = [
+        TermScorer(index.cursor(term), idfs[term], bm25.upper_bound(idfs[term], index.postings[term].max_freq))
+        for term in query
+    ]
+    def score_doc(doc, matched):
+        return sum(bm25.score(s.idf, s.cursor.freq, index.doc_lengths[doc], average) for s in matched)
+    top = wand_top_k(scorers, 10, score_doc, accept=index.is_live)
+    
+    assert [doc for _, doc in top] == [doc for doc, _ in expected]
+    for (score, _), (_, expected_score) in zip(top, expected):
+        assert abs(score - expected_score) < 1e-9
+
+def test_limit_caps_results():
+    """Only `limit` results are returned."""
+    engine = PdfSearchEngine()
+    for n in range(20):
+        _add(engine, f"http://doc{n}.com", "common term " * (n + 1))
+    assert len(engine.search("common", limit=5)) == 5
+    assert engine.search("common", limit=0) == []
@@ -0,0 +1,58 @@
+from search import PdfSearchEngine
+
+def _add(engine, url, text):
+    engine.add_document(url, {'language': 'en', 'matching_keywords': [('galt', 0.5)]}, {'title': url}, full_text=text)
+
+def test_committed_index_survives_reopen(tmp_path):
+    """A fresh engine answers queries from the committed segments."""
+    with PdfSearchEngine(path=tmp_path) as engine:
+        _add(engine, "http://a.com", "who is john galt")
+        _add(engine, "http://b.com", "john smith wrote this")
+        expected = engine.search("john galt")
+    
+    reopened = PdfSearchEngine(path=tmp_path)
+    assert reopened.documents == {}
+    assert len(reopened) == 2
+    results = reopened.search("john galt")
+    assert [r['url'] for r in results] == [r['url'] for r in expected]
+    assert [r['relevance_score'] for r in results] == [r['relevance_score'] for r in expected]
+    assert results[0]['matching_keywords'] == [{'keyword': 'galt', 'score': 0.5}]
+    reopened.close()
+
+def test_updates_and_deletes_of_committed_documents(tmp_path):
+    """Re-adding or removing a committed document tombstones its old version."""
+    with PdfSearchEngine(path=tmp_path) as engine:
+        _add(engine, "http://a.com", "alpha beta")
+        _add(engine, "http://b.com", "beta gamma")
+        engine.commit()
+        _add(engine, "http://a.com", "delta beta")
+        assert engine.remove_document("http://b.com")
+        assert engine.search("alpha") == []
+        assert engine.search("gamma") == []
+    
+    with PdfSearchEngine(path=tmp_path) as reopened:
+        assert [r['url'] for r in reopened.search("beta")] == ["http://a.com"]
+        assert [r['url'] for r in reopened.search("delta")] == ["http://a.com"]
+        assert reopened.search("alpha") == []
+
+def test_background_merge_compacts_segments(tmp_path):
+    """Small segments are merged once there are more than merge_factor of them."""
+    engine = PdfSearchEngine(path=tmp_path, flush_threshold=2, merge_factor=3)
+    for n in range(12):
+        _add(engine, f"http://doc{n}.com", f"shared word{n}")
+    engine.remove_document("http://doc3.com")
+    engine.commit()
+    engine.store.wait_for_merges()
+    
+    assert len(engine.store.segments) <= 3
+    urls = {r['url'] for r in engine.search("shared", limit=20)}
+    assert urls == {f"http://doc{n}.com" for n in range(12) if n != 3}
+    engine.close()
+    
+    # Only the live segments (and their tombstones) remain on disk
+    with PdfSearchEngine(path=tmp_path) as reopened:
+        names = {f"{segment.name}.seg" for segment in reopened.store.segments}
+        on_disk = {p.name for p in tmp_path.glob("*.seg")}
+        assert on_disk == names
+        assert len(reopened) == 11
+        assert [r['url'] for r in reopened.search("word7")] == ["http://doc7.com"]
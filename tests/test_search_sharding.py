@@ -0,0 +1,64 @@
+import pytest
+from search import PdfSearchEngine
+from sharding import ShardedSearchEngine
+
+TEXTS = [
+    "who is john galt asked the stranger",
+    "john galt built the motor",
+    "the motor of the world stopped",
+    "atlas shrugged under the weight of the world",
+    "dagny taggart ran the railroad",
+    "the railroad carried john across the country",
+    "galt's gulch was hidden in the mountains",
+    "rearden metal was stronger than steel",
+]
+
+def _add(engine, url, text):
+    engine.add_document(url, {'language': 'en'}, {'title': url}, full_text=text)
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        ShardedSearchEngine(backend="gpu")
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_sharded_results_match_single_engine(backend):
+    """Global statistics make the merged ranking match a single engine."""
+    single = PdfSearchEngine()
+    with ShardedSearchEngine(shards=3, backend=backend) as sharded:
+        for n, text in enumerate(TEXTS):
+            _add(single, f"http://doc{n}.com", text)
+            _add(sharded, f"http://doc{n}.com", text)
+        
+        assert len(sharded) == len(TEXTS)
+        assert len({sharded.shard_for(f"http://doc{n}.com") for n in range(len(TEXTS))}) > 1
+        for query in ("john galt", "the motor", '"the world"', "railroad NEAR/3 john"):
+            expected = single.search(query, limit=5)
+            results = sharded.search(query, limit=5)
+            assert [(r['url'], r['relevance_score']) for r in results] == \
+                [(r['url'], r['relevance_score']) for r in expected]
+        
+        assert sharded.remove_document("http://doc1.com")
+        assert "http://doc1.com" not in {r['url'] for r in sharded.search("motor")}
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_sharded_ties_match_single_engine(backend):
+    """Equal scores are ordered by doc id in both, including at the limit."""
+    single = PdfSearchEngine()
+    with ShardedSearchEngine(shards=3, backend=backend) as sharded:
+        for n in range(12):
+            _add(single, f"http://tie{n}.com", "identical wording in every document")
+            _add(sharded, f"http://tie{n}.com", "identical wording in every document")
+        for query in ("wording", '"every document"'):
+            expected = [r['url'] for r in single.search(query, limit=4)]
+            assert [r['url'] for r in sharded.search(query, limit=4)] == expected
+            assert expected != [f"http://tie{n}.com" for n in range(4)]  # not insertion order
+
+def test_persistent_shards_reopen(tmp_path):
+    """Each shard persists under its own directory."""
+    with ShardedSearchEngine(shards=2, path=tmp_path, backend="thread") as sharded:
+        for n, text in enumerate(TEXTS):
+            _add(sharded, f"http://doc{n}.com", text)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["shard_000", "shard_001"]
+    with ShardedSearchEngine(shards=2, path=tmp_path, backend="thread") as reopened:
+        assert len(reopened) == len(TEXTS)
+        assert {r['url'] for r in reopened.search('"john galt"')} == {"http://doc0.com", "http://doc1.com"}
@@ -0,0 +1,34 @@
+import pytest
+from search import PdfSearchEngine
+from snippets import best_window
+
+def _add(engine, url, text):
+    engine.add_document(url, {'language': 'en'}, {'title': url}, full_text=text)
+
+def _highlighted(result):
+    return [result['snippet'][start:end] for start, end in result['highlights']]
+
+def test_best_window_prefers_densest_earliest():
+    """The window covering the most matches wins; ties go to the earliest."""
+    assert best_window([3, 50, 52, 55, 90], 10) == (50, 3)
+    assert best_window([5, 40], 20) == (5, 1)
+    assert best_window([], 20) == (-1, 0)
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_snippet_highlights_matches(tmp_path, persistent):
+    """Snippets come from the densest window and highlight each matched token."""
+    filler = "lorem ipsum dolor sit amet " * 2000
+    text = filler + "Café owners asked:   who is John  Galt? Nobody knew John. " + filler
+    engine = PdfSearchEngine(path=tmp_path if persistent else None)
+    _add(engine, "http://book.com", text)
+    engine.commit()
+    
+    result, = engine.search("john galt")
+    assert result['snippet'].startswith("John Galt? Nobody knew John. lorem")
+    assert result['snippet'].endswith("...")
+    assert _highlighted(result) == ["John", "Galt", "John"]
+    
+    result, = engine.search("café")
+    assert _highlighted(result) == ["Café"]
+    assert result['snippet'].startswith("Café owners asked: who is John Galt?")
+    engine.close()
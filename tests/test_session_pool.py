@@ -0,0 +1,30 @@
+import pytest
+from pdf_processor import PdfProcessor
+
+@pytest.mark.asyncio
+async def test_session_is_shared_across_downloads(mock_aioresponse, pdf_factory):
+    """All downloads go through one pooled session with the configured limits."""
+    content = pdf_factory(text="Pooled connections.", pages=1)
+    for name in ("a", "b"):
+        mock_aioresponse.get(f"http://example.com/{name}.pdf", body=content,
+                             headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(connection_limit=8, connection_limit_per_host=2) as processor:
+        await processor.process_url("http://example.com/a.pdf", "pooled")
+        session = processor._session
+        await processor.process_url("http://example.com/b.pdf", "pooled")
+        assert processor._session is session
+        assert session.connector.limit == 8
+        assert session.connector.limit_per_host == 2
+
+    assert session.closed
+    assert processor._session is None
+
+def test_sync_wrapper_closes_session(mock_aioresponse, pdf_factory):
+    """main() runs its own loop, so it must not leave a session bound to it."""
+    url = "http://example.com/sync.pdf"
+    mock_aioresponse.get(url, body=pdf_factory(text="Sync call."), headers={"Content-Type": "application/pdf"})
+
+    processor = PdfProcessor(pdf_url=url)
+    processor.main("sync")
+    assert processor._session is None
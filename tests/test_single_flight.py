@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from pdf_processor import PdfProcessor
+
+@pytest.mark.asyncio
+async def test_concurrent_same_url_downloads_once(mock_aioresponse, pdf_factory):
+    """Concurrent callers for one URL share a single download and analysis."""
+    url = "http://example.com/popular.pdf"
+    mock_aioresponse.get(url, body=pdf_factory(text="Everyone wants this."),
+                         headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor() as processor:
+        download = processor._download_pdf
+        with patch.object(processor, "_download_pdf", side_effect=download) as spy:
+            results = await asyncio.gather(*(processor.process_url(url, "wants") for _ in range(5)))
+
+        assert spy.call_count == 1
+        assert processor._in_flight == {}
+
+    assert all(result == results[0] for result in results)
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_content_processed_once(mock_aioresponse, pdf_factory):
+    """Different URLs serving the same bytes are analyzed once."""
+    content = pdf_factory(text="Syndicated feed item.")
+    urls = [f"http://mirror{i}.com/item.pdf" for i in range(3)]
+    for url in urls:
+        mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor() as processor:
+        process = processor._process_pdf
+        with patch.object(processor, "_process_pdf", side_effect=process) as spy:
+            results = await asyncio.gather(*(processor.process_url(url, "feed") for url in urls))
+
+    assert spy.call_count == 1
+    assert results[0] == results[1] == results[2]
+
+@pytest.mark.asyncio
+async def test_shared_failure_reaches_every_caller(mock_aioresponse):
+    """A failed shared download raises for all coalesced callers."""
+    url = "http://example.com/broken.pdf"
+    mock_aioresponse.get(url, body=b"<html>nope</html>", headers={"Content-Type": "text/html"})
+
+    async with PdfProcessor() as processor:
+        outcomes = await asyncio.gather(
+            processor.process_url(url, "x"), processor.process_url(url, "x"),
+            return_exceptions=True
+        )
+
+    assert all(isinstance(outcome, Exception) for outcome in outcomes)
+
+@pytest.mark.asyncio
+async def test_finished_flight_keeps_newer_entry(tmp_path):
+    """A finishing task only forgets its own key entry, not a newer one that replaced it."""
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "old"
+
+    async with PdfProcessor(storage_path=tmp_path) as processor:
+        old = asyncio.ensure_future(processor._single_flight("key", work))
+        await asyncio.sleep(0)
+        newer = asyncio.get_event_loop().create_future()
+        processor._in_flight["key"] = newer
+        release.set()
+        assert await old == "old"
+        assert processor._in_flight["key"] is newer
+        newer.cancel()
@@ -59,5 +59,77 @@ class TestBatchStreaming(unittest.TestCase):
         self.assertIn("summary", res)
         self.assertEqual(len(res['results']), 1)
 
+    def test_bounded_in_flight(self):
+        """Verify process_stream never works on more than max_in_flight URLs."""
+        mock_processor = MagicMock()
+        state = {"active": 0, "peak": 0}
+        
+        async def tracked_process(url, phrase):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return {"id": url}
+        
+        mock_processor.process_url = AsyncMock(side_effect=tracked_process)
+        batch = PdfBatch(mock_processor, max_in_flight=3)
+        
+        async def run_test():
+            return [url async for url, _, _ in batch.process_stream((f"http://{i}.com" for i in range(20)), "test")]
+        
+        urls = asyncio.run(run_test())
+        
+        self.assertEqual(len(urls), 20)
+        self.assertEqual(state["peak"], 3)
+        # Streaming does not retain results
+        self.assertEqual(batch.results, {})
+    
+    def test_backpressure_pulls_lazily(self):
+        """Verify input is only pulled as results are consumed (async iterable input)."""
+        mock_processor = MagicMock()
+        mock_processor.process_url = AsyncMock(return_value={"id": "x"})
+        batch = PdfBatch(mock_processor, max_in_flight=2)
+        pulled = []
+        
+        async def url_feed():
+            for i in range(1000):
+                pulled.append(i)
+                yield f"http://{i}.com"
+        
+        async def run_test():
+            stream = batch.process_stream(url_feed(), "test")
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first
+        
+        first = asyncio.run(run_test())
+        
+        self.assertIsNone(first[2])
+        self.assertLessEqual(len(pulled), 3)
+    def test_slow_source_does_not_hold_results(self):
+        """Verify finished results are yielded while the source is still waiting for its next URL."""
+        mock_processor = MagicMock()
+        mock_processor.process_url = AsyncMock(return_value={"id": "x"})
+        batch = PdfBatch(mock_processor, max_in_flight=2)
+        
+        async def slow_feed():
+            yield "http://first.com"
+            await asyncio.sleep(1)
+            yield "http://second.com"
+        
+        async def run_test():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            stream = batch.process_stream(slow_feed(), "test")
+            first = await stream.__anext__()
+            elapsed = loop.time() - start
+            await stream.aclose()
+            return first, elapsed
+        
+        first, elapsed = asyncio.run(run_test())
+        
+        self.assertEqual(first[0], "http://first.com")
+        self.assertLess(elapsed, 0.5)
+
 if __name__ == '__main__':
     unittest.main()
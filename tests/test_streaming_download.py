@@ -0,0 +1,64 @@
+import pytest
+import pdf_processor
+from pdf_processor import PdfProcessor
+from spool import PdfSpool
+from pathlib import Path
+from exceptions import FileTooLargeError, InvalidFileError
+
+def test_spool_stays_in_memory_below_limit(tmp_path):
+    """Small bodies are returned as bytes without touching disk."""
+    spool = PdfSpool(tmp_path, max_memory=16)
+    spool.write(b'%PDF-1.4')
+    download = spool.finish()
+    assert download.source == b'%PDF-1.4'
+    assert download.size == 8
+    assert list(tmp_path.iterdir()) == []
+
+def test_spool_rolls_over_to_disk(tmp_path):
+    """Bodies past the memory budget are written to a named file."""
+    spool = PdfSpool(tmp_path, max_memory=4)
+    spool.write(b'%PDF-')
+    spool.write(b'1.4')
+    download = spool.finish()
+    assert isinstance(download.source, Path)
+    assert download.source.read_bytes() == b'%PDF-1.4'
+    download.discard()
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_spooled_download_is_processed_and_removed(mock_aioresponse, pdf_factory, tmp_path, monkeypatch):
+    """A download spooled to disk is parsed from its file, which is removed afterwards."""
+    monkeypatch.setattr(pdf_processor, "SPOOL_MAX_MEMORY", 64)
+    url = "http://example.com/spooled.pdf"
+    content = pdf_factory(text="Spooled to disk.", pages=2)
+    mock_aioresponse.get(url, body=content, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(storage_path=tmp_path) as processor:
+        result = await processor.process_url(url, "disk")
+
+    assert result['metadata']['file_size'] == len(content)
+    assert 'Spooled to disk.' in result['full_text']
+    assert list((tmp_path / "spool").iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_download_aborts_past_size_limit(mock_aioresponse, pdf_factory, tmp_path, monkeypatch):
+    """The size limit is enforced while streaming, even without Content-Length."""
+    monkeypatch.setattr(pdf_processor, "MAX_PDF_SIZE", 2048)
+    monkeypatch.setattr(pdf_processor, "SPOOL_MAX_MEMORY", 64)
+    url = "http://example.com/huge.pdf"
+    mock_aioresponse.get(url, body=b'%PDF-1.4\n' + b'0' * 8192, headers={"Content-Type": "application/pdf"})
+
+    async with PdfProcessor(storage_path=tmp_path) as processor:
+        with pytest.raises(FileTooLargeError):
+            await processor.process_url(url, "test")
+    assert list((tmp_path / "spool").iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_signature_checked_on_first_chunk(mock_aioresponse, tmp_path):
+    """Non-PDF bodies are rejected once the header window has been read."""
+    url = "http://example.com/page.html"
+    mock_aioresponse.get(url, body=b'<html>' + b' ' * 4096, headers={"Content-Type": "text/html"})
+
+    async with PdfProcessor(storage_path=tmp_path) as processor:
+        with pytest.raises(InvalidFileError):
+            await processor.process_url(url, "test")
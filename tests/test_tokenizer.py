@@ -0,0 +1,47 @@
+import nltk
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from index import invert
+from text_analysis import ContentAnalyzer
+from tokenizer import TextTokens
+
+SAMPLES = [
+    "It's a truth universally acknowledged, that a single man in possession of a good fortune, "
+    "must be in want of a wife. Mr. Bennet didn't reply; his wife's patience -- never great -- "
+    "ran out at 10:30 p.m. on 3.5.2020... She paid $3.88 (roughly 3,36 euros) for the well-known e-mail.",
+    "Can't we? I'm sure they'll come, won't they! 'Tis the U.S. way, e.g. gonna wanna go [now] {or} <never>.",
+    "1. First item\n2. Second item: details\n\n## Heading\n`code` and ```block``` with x='y' and a|b|c ------",
+    "Ünïcödé façade — em dash … and “curly quotes” plus ‘single’ ones: done.",
+]
+
+def _unquoted(tokens):
+    return ['"' if token in ('``', "''") else token for token in tokens]
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_regex_words_match_nltk(text):
+    """The regex tokenizer reproduces nltk.word_tokenize (up to quote spelling)."""
+    assert _unquoted(TextTokens(text).words) == _unquoted(nltk.word_tokenize(text.lower()))
+    assert TextTokens(text, mode="nltk").words == nltk.word_tokenize(text.lower())
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_shared_streams_match_their_consumers(text):
+    """Sentences and vectorizer terms equal what nltk and sklearn would compute."""
+    tokens = TextTokens(text)
+    assert [text[start:end] for start, end in tokens.sentence_spans] == nltk.sent_tokenize(text)
+    assert tokens.vectorizer_terms == TfidfVectorizer().build_analyzer()(text)
+    assert invert(tokens) == invert(text)
+
+def test_keywords_unchanged_by_pretokenized_input():
+    """Keyword scores match a TfidfVectorizer tokenizing the raw text itself."""
+    analyzer = ContentAnalyzer("en")
+    text = " ".join(SAMPLES) * 3
+    reference = TfidfVectorizer(stop_words=analyzer.stop_words, max_features=1000, ngram_range=(1, 2))
+    matrix = reference.fit_transform([text])
+    expected = sorted(zip(reference.get_feature_names_out(), matrix.toarray()[0]), key=lambda x: x[1], reverse=True)[:10]
+    assert analyzer.extract_keywords(text) == expected
+    assert analyzer.extract_keywords(text, tokens=TextTokens(text)) == expected
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        TextTokens("text", mode="fast")
@@ -0,0 +1,73 @@
+import time
+from unittest.mock import patch
+from cache import SimpleMemoryCache, approximate_size
+
+def test_lru_entry_cap():
+    """The least recently used entry is evicted once max_entries is exceeded."""
+    cache = SimpleMemoryCache(max_entries=2, sweep_interval=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_byte_cap_evicts_large_results():
+    """Entries are evicted until the approximate size fits max_bytes."""
+    big = {"full_text": "x" * 10_000}
+    cache = SimpleMemoryCache(max_bytes=approximate_size(big) * 2 + 100, sweep_interval=0)
+    for key in ("a", "b", "c"):
+        cache.put(key, dict(big))
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] <= approximate_size(big) * 2 + 100
+    assert cache.get("a") is None
+
+def test_value_shared_by_keys_is_counted_once():
+    """A value stored under several keys takes one entry and its size once."""
+    record = {"full_text": "x" * 10_000}
+    cache = SimpleMemoryCache(max_entries=1, max_bytes=approximate_size(record) + 100, sweep_interval=0)
+    cache.put("url", record)
+    cache.put("content", record)
+    stats = cache.stats()
+    assert (stats['entries'], stats['values'], stats['bytes']) == (2, 1, approximate_size(record))
+    assert stats['evictions'] == 0
+    cache.invalidate("url")
+    assert cache.stats()['bytes'] == approximate_size(record)
+    cache.invalidate("content")
+    assert cache.stats()['bytes'] == 0
+
+def test_hit_miss_counters():
+    """Hits, misses and expirations are counted."""
+    cache = SimpleMemoryCache(ttl_seconds=10, sweep_interval=0, stale_ttl_seconds=0)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    with patch("cache.time.time", return_value=time.time() + 11):
+        assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 2, 1)
+
+def test_stale_entries_kept_for_revalidation():
+    """Expired entries are misses for get() but still returned by get_stale()."""
+    cache = SimpleMemoryCache(ttl_seconds=10, sweep_interval=0, stale_ttl_seconds=100)
+    cache.put("a", 1)
+    with patch("cache.time.time", return_value=time.time() + 11):
+        assert cache.get("a") is None
+        assert cache.get_stale("a") == 1
+        assert cache.sweep() == 0
+    with patch("cache.time.time", return_value=time.time() + 111):
+        assert cache.get_stale("a") is None
+        assert cache.sweep() == 1
+
+def test_background_sweep_removes_expired():
+    """The sweeper thread drops expired entries nobody reads."""
+    cache = SimpleMemoryCache(ttl_seconds=0, sweep_interval=0.01, stale_ttl_seconds=0)
+    cache.put("a", 1)
+    deadline = time.time() + 2
+    while cache.stats()['entries'] and time.time() < deadline:
+        time.sleep(0.01)
+    cache.close()
+    assert cache.stats()['entries'] == 0
@@ -32,3 +32,32 @@ def test_syllable_count():
     assert analyzer._count_syllables("hello") == 2
     assert analyzer._count_syllables("a") == 1
     assert analyzer._count_syllables("software") == 2 # Approximation logic
+
+def test_bulk_syllable_count_matches_per_word():
+    """The whole-text syllable count equals the per-word sum."""
+    from text_analysis import count_syllables
+    analyzer = ContentAnalyzer("en")
+    text = ("the free eye used a-e bed yes rhythm made. shapes tried 'quoted' "
+            "software hello a xyz queue cafe’s 3.5 -- e ed es mmm aye\nnew\tline")
+    assert count_syllables(text) == sum(analyzer._count_syllables(word) for word in text.split())
+
+def test_profile_matches_separate_passes():
+    """One profile yields the same keywords, readability and top words as the separate calls."""
+    from collections import Counter
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from tokenizer import TextTokens
+    analyzer = ContentAnalyzer("en")
+    # Well over 1000 distinct n-grams, so the feature cap applies
+    text = " ".join(f"alpha{i % 700} beta{i % 13} gamma{i % 3}. Delta {i} sees epsilon." for i in range(900))
+    tokens = TextTokens(text)
+    profile = analyzer.profile(tokens)
+
+    reference = TfidfVectorizer(stop_words=analyzer.stop_words, max_features=1000, ngram_range=(1, 2))
+    matrix = reference.fit_transform([text])
+    expected = sorted(zip(reference.get_feature_names_out(), matrix.toarray()[0]), key=lambda x: x[1], reverse=True)[:10]
+    assert analyzer.keywords(profile) == expected
+    assert analyzer.readability(profile) == analyzer.calculate_readability_score(text)
+    stopwords = set(analyzer.stop_words)
+    assert profile.top_words(stopwords) == dict(Counter(
+        word for word in tokens.words if word.isalpha() and word not in stopwords
+    ).most_common(10))
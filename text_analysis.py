@@ -1,10 +1,91 @@
-import nltk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from typing import List, Tuple
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from config import STREAM_MAX_CARRY
+from tokenizer import TextTokens, ensure_nltk_data
 from utils import setup_logging
 
 logger = setup_logging(__name__)
 
+# Map detected language codes to NLTK corpus language names
+NLTK_LANGUAGES = {
+    "en": "english", "fr": "french", "de": "german", "es": "spanish",
+    "it": "italian", "pt": "portuguese", "nl": "dutch", "sv": "swedish",
+    "no": "norwegian", "fi": "finnish", "ru": "russian"
+}
+
+def load_stopwords(language: str) -> set:
+    """
+    Return the NLTK stopword set for a detected language code.
+    If the mapping is not available, it attempts to use the provided language directly.
+    """
+    import nltk
+    ensure_nltk_data()
+    nltk_lang = NLTK_LANGUAGES.get(language, language)
+    try:
+        return set(nltk.corpus.stopwords.words(nltk_lang))
+    except LookupError:
+        logger.warning(f"Stopwords not available for {nltk_lang}, using empty set")
+        return set()
+
+# Flesch syllable counting over a whole lowercased text at once: a word has
+# one syllable per vowel run, minus one for a silent e/es/ed ending when it
+# has several runs, and at least one
+VOWEL_RUNS = re.compile(r'[aeiouy]+')
+VOWELLESS_WORD = re.compile(r'(?<!\S)[^\saeiouy]+(?!\S)')
+SILENT_E_WORD = re.compile(r'(?<!\S)\S*?[aeiouy][^\saeiouy]+\S*?(?:e|es|ed)(?!\S)')
+
+MAX_FEATURES = 1000  # keyword candidates kept per document, most frequent first
+
+def count_syllables(lowered: str) -> int:
+    """Total syllables of a lowercased text's whitespace-separated words."""
+    return (
+        len(VOWEL_RUNS.findall(lowered))
+        + len(VOWELLESS_WORD.findall(lowered))
+        - len(SILENT_E_WORD.findall(lowered))
+    )
+
+def tf_keywords(ngram_counts: Dict[str, int], top_n: int = 10) -> List[Tuple[str, float]]:
+    """
+    Rank a document's n-grams as a one-document TfidfVectorizer
+    (max_features=MAX_FEATURES) would: every idf is 1, so scores are the
+    l2-normalized counts of the MAX_FEATURES most frequent n-grams.
+    """
+    try:
+        names = sorted(ngram_counts)
+        counts = [ngram_counts[name] for name in names]
+        if len(names) > MAX_FEATURES:
+            # Same (unstable) selection among equal counts as the vectorizer
+            import numpy as np
+            kept = np.sort((-np.array(counts, dtype=np.int64)).argsort()[:MAX_FEATURES])
+            names = [names[index] for index in kept]
+            counts = [counts[index] for index in kept]
+        norm = math.sqrt(sum(count * count for count in counts))
+        scores = [(name, count / norm) for name, count in zip(names, counts)]
+        return sorted(scores, key=lambda x: x[1], reverse=True)[:top_n]
+    except Exception as e:
+        logger.error(f"Keyword extraction failed: {e}")
+        return []
+
+@dataclass
+class TextProfile:
+    """Counts behind a text's analysis, all taken from one tokenization."""
+    word_count: int = 0  # Treebank words
+    sentence_count: int = 0
+    word_counts: Counter = field(default_factory=Counter)  # per word, in order of first occurrence
+    readability_words: int = 0  # whitespace-separated words, as Flesch counts them
+    syllable_count: int = 0
+    ngram_counts: Counter = field(default_factory=Counter)  # non-stop-word term unigrams and bigrams
+    
+    def top_words(self, stopwords: set, n: int = 10) -> Dict[str, int]:
+        """The n most frequent alphabetic non-stopwords (ties in text order)."""
+        return dict(Counter({
+            word: count for word, count in self.word_counts.items()
+            if word.isalpha() and word not in stopwords
+        }).most_common(n))
+
 class ContentAnalyzer:
     """Analyzes text content using various NLP techniques."""
     
@@ -12,48 +93,77 @@ class ContentAnalyzer:
         self.language = language
         
         # Map detected language code to NLTK language name
-        self.lang_mapping = {
-            "en": "english", "fr": "french", "de": "german", "es": "spanish",
-            "it": "italian", "pt": "portuguese", "nl": "dutch", "sv": "swedish",
-            "no": "norwegian", "fi": "finnish", "ru": "russian"
-        }
+        self.lang_mapping = NLTK_LANGUAGES
         nltk_lang = self.lang_mapping.get(language, "english")
         
+        import nltk
+        ensure_nltk_data()
         try:
             self.stop_words = list(nltk.corpus.stopwords.words(nltk_lang))
         except LookupError:
             self.stop_words = 'english'
-            
-        self.vectorizer = TfidfVectorizer(
-            stop_words=self.stop_words, 
-            max_features=1000,
-            ngram_range=(1, 2)
+        if self.stop_words == 'english':
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            self._stop_set = ENGLISH_STOP_WORDS
+        else:
+            self._stop_set = frozenset(self.stop_words)
+    
+    def profile(self, tokens: TextTokens) -> TextProfile:
+        """
+        Gather every count the analysis needs from one tokenization: words,
+        sentences, syllables and the keyword n-grams.
+        """
+        profile = TextProfile(
+            word_count=len(tokens.words),
+            word_counts=Counter(tokens.words),
+            ngram_counts=self._ngram_counts(tokens)
         )
+        self._readability_counts(tokens, profile)
+        return profile
     
-    def extract_keywords(self, text: str, top_n: int = 10) -> List[Tuple[str, float]]:
-        """Extract important keywords using TF-IDF."""
-        try:
-            tfidf_matrix = self.vectorizer.fit_transform([text])
-            feature_names = self.vectorizer.get_feature_names_out()
-            scores = zip(feature_names, tfidf_matrix.toarray()[0])
-            sorted_scores = sorted(scores, key=lambda x: x[1], reverse=True)
-            return sorted_scores[:top_n]
-        except Exception as e:
-            logger.error(f"Keyword extraction failed: {e}")
-            return []
+    def _keyword_terms(self, tokens: TextTokens) -> List[str]:
+        return [term for term in tokens.vectorizer_terms if term not in self._stop_set]
+    
+    def _ngram_counts(self, tokens: TextTokens) -> Counter:
+        """Unigrams and bigrams of the non-stop-word terms, as TfidfVectorizer forms them."""
+        terms = self._keyword_terms(tokens)
+        counts = Counter(terms)
+        counts.update(map(' '.join, zip(terms, terms[1:])))
+        return counts
+    
+    def _readability_counts(self, tokens: TextTokens, profile: TextProfile) -> None:
+        """Add a text's sentences, words and syllables to the profile's readability counts."""
+        profile.sentence_count += len(tokens.sentence_spans)
+        profile.readability_words += len(tokens.text.split())
+        if len(tokens.lowered) == len(tokens.text):
+            profile.syllable_count += count_syllables(tokens.lowered)
+        else:
+            profile.syllable_count += sum(self._count_syllables(word) for word in tokens.text.split())
     
-    def calculate_readability_score(self, text: str) -> float:
+    def extract_keywords(self, text: str, top_n: int = 10, tokens: Optional[TextTokens] = None) -> List[Tuple[str, float]]:
+        """Extract important keywords using TF-IDF (reusing `tokens` of text if given)."""
+        tokens = tokens if tokens is not None else TextTokens(text)
+        return self.keywords(TextProfile(ngram_counts=self._ngram_counts(tokens)), top_n)
+    
+    def keywords(self, profile: TextProfile, top_n: int = 10) -> List[Tuple[str, float]]:
+        """Rank a profiled document's n-grams by term frequency (see tf_keywords)."""
+        return tf_keywords(profile.ngram_counts, top_n)
+    
+    def calculate_readability_score(self, text: str, tokens: Optional[TextTokens] = None) -> float:
         """Calculate text readability using Flesch Reading Ease."""
+        profile = TextProfile()
+        self._readability_counts(tokens if tokens is not None else TextTokens(text), profile)
+        return self.readability(profile)
+    
+    def readability(self, profile: TextProfile) -> float:
+        """Flesch Reading Ease from a text profile."""
         try:
-            words = text.split()
-            sentences = nltk.sent_tokenize(text)
-            
-            if not words or not sentences:
+            if not profile.readability_words or not profile.sentence_count:
                 return 0.0
             
-            word_count = len(words)
-            sentence_count = len(sentences)
-            syllable_count = sum(self._count_syllables(word) for word in words)
+            word_count = profile.readability_words
+            sentence_count = profile.sentence_count
+            syllable_count = profile.syllable_count
             
             score = 206.835 - 1.015 * (word_count / sentence_count)
             if word_count > 0:
@@ -70,7 +180,7 @@ class ContentAnalyzer:
         word = word.lower().strip()
         if not word:
             return 0
-            
+        
         count = 0
         vowels = set("aeiouy")
         prev_char = None
@@ -79,8 +189,75 @@ class ContentAnalyzer:
             if char in vowels and (prev_char is None or prev_char not in vowels):
                 count += 1
             prev_char = char
-            
+        
         if word.endswith(('e', 'es', 'ed')) and count > 1:
             count -= 1
         
         return max(1, count)
+
+class ProfileBuilder:
+    """
+    Build the TextProfile of a text fed in pieces, such as PDF pages.
+    
+    Each piece is profiled up to the last sentence start (after whitespace)
+    on which the text and its lowercased form agree, and the rest is
+    carried into the next piece. The counts equal those of profiling the
+    whole text at once, while only one piece and the carried sentence are
+    held. A carry that grows past max_carry characters without a sentence
+    start is cut at its last whitespace instead.
+    """
+    
+    def __init__(self, analyzer: ContentAnalyzer, max_carry: int = STREAM_MAX_CARRY):
+        self.analyzer = analyzer
+        self.max_carry = max_carry
+        self.profile = TextProfile()
+        self._carry = ''
+        self._unigrams: Counter = Counter()
+        self._bigrams: Counter = Counter()
+        self._last_term: Optional[str] = None
+    
+    def feed(self, text: str) -> Optional[TextTokens]:
+        """Add the next piece of text; returns the tokens profiled now, if any."""
+        tokens = TextTokens(self._carry + text)
+        # Punkt may start a sentence inside a whitespace-delimited word (e.g. after "end.**")
+        starts = {start for start, _ in tokens.sentence_spans[1:] if tokens.text[start - 1].isspace()}
+        aligned = len(tokens.lowered) == len(tokens.text)
+        if aligned:
+            starts.intersection_update(start for start, _ in tokens.word_sentence_spans[1:])
+        cut = max(starts, default=0)
+        if cut and aligned:
+            head = tokens.head(cut)
+        else:
+            if not cut and len(tokens.text) > self.max_carry:
+                cut = max(tokens.text.rfind(' '), tokens.text.rfind('\n')) + 1
+            if not cut:
+                self._carry = tokens.text
+                return None
+            head = TextTokens(tokens.text[:cut])
+        self._carry = tokens.text[cut:]
+        self._add(head)
+        return head
+    
+    def finish(self) -> Optional[TextTokens]:
+        """Profile the carried remainder; returns its tokens, if any."""
+        tokens = TextTokens(self._carry) if self._carry else None
+        self._carry = ''
+        if tokens is not None:
+            self._add(tokens)
+        # Unigrams before bigrams, each in order of first occurrence, as profile() counts them
+        self.profile.ngram_counts = Counter(self._unigrams)
+        self.profile.ngram_counts.update(self._bigrams)
+        return tokens
+    
+    def _add(self, tokens: TextTokens) -> None:
+        profile = self.profile
+        profile.word_count += len(tokens.words)
+        profile.word_counts.update(tokens.words)
+        self.analyzer._readability_counts(tokens, profile)
+        terms = self.analyzer._keyword_terms(tokens)
+        if terms:
+            if self._last_term is not None:
+                self._bigrams[f"{self._last_term} {terms[0]}"] += 1
+            self._unigrams.update(terms)
+            self._bigrams.update(map(' '.join, zip(terms, terms[1:])))
+            self._last_term = terms[-1]
@@ -0,0 +1,187 @@
+"""
+Shared tokenization for text analysis, keyword extraction and search.
+
+A document is tokenized once into a TextTokens whose token streams are
+computed on first use and then shared by every consumer:
+
+- sentence_spans: Punkt sentence boundaries (sentence count, readability);
+- words: Penn Treebank-style tokens of the lowercased text, as
+  nltk.word_tokenize produces them (word count, top words);
+- terms: lowercased runs of word characters and their start offsets, the
+  search index vocabulary. The terms of two or more characters are exactly
+  the tokens of TfidfVectorizer's default token_pattern, so keyword
+  extraction reuses them too.
+
+With TOKENIZER_MODE "regex", words come from one compiled pattern over the
+whole text that applies the Treebank splitting rules (punctuation,
+clitics such as n't and 's, "cannot" and friends) and splits off only the
+periods that end a Punkt sentence of the lowercased text. It yields the same tokens as
+nltk.word_tokenize, except that double quotes are kept as '"' rather than
+rewritten to `` and ''. "nltk" calls nltk.word_tokenize itself.
+
+NLTK (which imports most of scipy) is only loaded once sentences are first
+needed, and its data is checked once per process (ensure_nltk_data).
+"""
+import re
+import threading
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, List, Tuple
+
+from config import TOKENIZER_MODE
+from exceptions import ProcessingError
+from utils import setup_logging
+
+if TYPE_CHECKING:
+    from nltk.tokenize.punkt import PunktTokenizer
+
+logger = setup_logging(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Characters the Treebank rules always split off as tokens of their own
+_SPLIT = "«“‘„»”’\"`;@#$%&?!*()\\[\\]{}<>‒-―"
+_END = rf"(?=[\s{_SPLIT}.]|[:,](?!\d)|$)"
+_CLITIC = rf"(?:'(?:s|m|d|ll|re|ve)|n't|'){_END}"
+WORD_PATTERN = re.compile(rf"""
+    \.{{2,}} | -- | `` | '' | [{_SPLIT}]            # ellipses, dashes, quotes, brackets...
+  | [:,](?!\d)                                    # colons and commas, except in 10:30 or 3,36
+  | {_CLITIC}                                     # n't, 's, 'll... ending a word
+  | \b(?:can(?=not\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)|more(?='n\b)|wan(?=na\s))
+  | (?<!\w)'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)    # opening single quote
+  | (?:(?!{_CLITIC})(?:[^\s{_SPLIT}:,.'-] | [:,](?=\d) | \.(?!\.) | -(?!-) | (?<=\w)'(?!')))+
+  | '
+""", re.VERBOSE | re.IGNORECASE)
+_CLOSERS = frozenset("])}>\"'»”’ \t\n\r\f\v")
+
+_nltk_data_lock = threading.Lock()
+_nltk_data_ready = False
+
+def ensure_nltk_data() -> None:
+    """
+    Ensure the NLTK data analysis needs (Punkt and stopwords) is installed,
+    downloading it if missing. The lookups run once per process.
+    """
+    global _nltk_data_ready
+    with _nltk_data_lock:
+        if _nltk_data_ready:
+            return
+        import nltk
+        try:
+            # Check for data presence
+            nltk.data.find('tokenizers/punkt')
+            nltk.data.find('tokenizers/punkt_tab')
+            nltk.data.find('corpora/stopwords')
+        except LookupError:
+            logger.info("Downloading required NLTK data...")
+            try:
+                nltk.download('punkt', quiet=True)
+                nltk.download('punkt_tab', quiet=True)
+                nltk.download('stopwords', quiet=True)
+                
+                # Verify download success
+                nltk.data.find('tokenizers/punkt')
+                nltk.data.find('corpora/stopwords')
+            except Exception as e:
+                logger.error(f"Failed to download NLTK data: {e}")
+                raise ProcessingError(f"Critical NLTK data missing and download failed: {e}")
+        _nltk_data_ready = True
+
+@lru_cache(maxsize=None)
+def sentence_tokenizer(language: str = "english") -> "PunktTokenizer":
+    """The Punkt model for a language, loaded once per process."""
+    ensure_nltk_data()
+    from nltk.tokenize.punkt import PunktTokenizer
+    return PunktTokenizer(language)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased index terms of a text, in order."""
+    return [match.group().lower() for match in TOKEN_PATTERN.finditer(text)]
+
+def treebank_words(text: str, sentence_spans: List[Tuple[int, int]]) -> List[str]:
+    """
+    Penn Treebank-style tokens of text, given its sentence spans: a period
+    is split off only where it ends a sentence.
+    """
+    cuts = []
+    for start, end in sentence_spans:
+        last = end - 1
+        while last > start and text[last] in _CLOSERS:
+            last -= 1
+        if last > start and text[last] == '.' and text[last - 1] != '.':
+            cuts.append(last)
+    if cuts:
+        text = ' '.join(text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)]))
+    return WORD_PATTERN.findall(text)
+
+class TextTokens:
+    """One text's token streams, each computed on first use."""
+    
+    def __init__(self, text: str, mode: str = TOKENIZER_MODE):
+        if mode not in ("regex", "nltk"):
+            raise ValueError(f"Unknown tokenizer mode: {mode}")
+        self.text = text
+        self.mode = mode
+    
+    @cached_property
+    def lowered(self) -> str:
+        return self.text.lower()
+    
+    @cached_property
+    def sentence_spans(self) -> List[Tuple[int, int]]:
+        """(start, end) offsets of each sentence of the text."""
+        return list(sentence_tokenizer().span_tokenize(self.text))
+    
+    @cached_property
+    def word_sentence_spans(self) -> List[Tuple[int, int]]:
+        """
+        Sentence offsets of the lowercased text. Punkt places some boundaries
+        differently once the text is lowercased (e.g. after "1."), and word
+        tokenization follows these.
+        """
+        return list(sentence_tokenizer().span_tokenize(self.lowered))
+    
+    @cached_property
+    def words(self) -> List[str]:
+        """Treebank-style tokens of the lowercased text."""
+        if self.mode == "nltk":
+            import nltk
+            ensure_nltk_data()
+            return nltk.word_tokenize(self.lowered)
+        return treebank_words(self.lowered, self.word_sentence_spans)
+    
+    def head(self, cut: int) -> "TextTokens":
+        """
+        Tokens of text[:cut], where cut starts a sentence in both the text and
+        its lowercased form; the sentences before it are reused.
+        """
+        head = TextTokens(self.text[:cut], self.mode)
+        head.__dict__['sentence_spans'] = [span for span in self.sentence_spans if span[1] <= cut]
+        head.__dict__['word_sentence_spans'] = [span for span in self.word_sentence_spans if span[1] <= cut]
+        return head
+    
+    @cached_property
+    def _terms(self) -> Tuple[List[str], List[int]]:
+        matches = list(TOKEN_PATTERN.finditer(self.text))
+        starts = [match.start() for match in matches]
+        # Matching the lowercased text at once is much faster, unless
+        # lowercasing changed lengths (e.g. dotted capital I) and with them
+        # the token boundaries
+        terms = TOKEN_PATTERN.findall(self.lowered) if len(self.lowered) == len(self.text) else None
+        if terms is None or len(terms) != len(matches):
+            terms = [match.group().lower() for match in matches]
+        return terms, starts
+    
+    @property
+    def terms(self) -> List[str]:
+        """Lowercased runs of word characters, the search index terms."""
+        return self._terms[0]
+    
+    @property
+    def term_starts(self) -> List[int]:
+        """Character offset of each term in the text."""
+        return self._terms[1]
+    
+    @cached_property
+    def vectorizer_terms(self) -> List[str]:
+        """The terms TfidfVectorizer's default token_pattern would produce."""
+        return [term for term in self.terms if len(term) > 1]
@@ -1,11 +1,14 @@
 from config import MAX_PDF_SIZE
 
+# The standard allows some preamble before the %PDF- marker
+PDF_HEADER_WINDOW = 1024
+
 def validate_pdf_signature(content: bytes) -> bool:
     """
     Validate that the file starts with the PDF magic bytes (%PDF-).
     """
     # Check for %PDF- in the first 1024 bytes (standard allows some preamble)
-    header_check = content[:1024]
+    header_check = content[:PDF_HEADER_WINDOW]
     return b'%PDF-' in header_check
 
 def validate_file_size(content: bytes) -> bool:
@@ -0,0 +1,127 @@
+"""
+Worker-process entry points for CPU-bound PDF work.
+
+These functions are submitted to the ProcessPoolExecutor owned by PdfProcessor.
+Each worker process keeps its own warm ContentAnalyzer instances and stopword
+sets, so only the document payload and the small result objects are pickled
+across the process boundary.
+"""
+from functools import partial
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional, Tuple, Union
+
+from config import LANGUAGE_FAST_PATH, LANGUAGE_SAMPLE_CHARS
+from language import detect_language, detector_factory
+from models import PdfMetadata
+from pdf_ops import analyze_text_content, analyze_text_profile, analyze_pdf_pages
+from text_analysis import ContentAnalyzer, load_stopwords
+from tokenizer import sentence_tokenizer
+from utils import setup_logging
+
+logger = setup_logging(__name__)
+
+# Per-process state, populated lazily (or eagerly by init_worker)
+_analyzers: Dict[str, ContentAnalyzer] = {}
+_stopwords: Dict[str, set] = {}
+
+def warm_up() -> None:
+    """Load NLTK, the Punkt model and the language profiles of this process ahead of the first document."""
+    sentence_tokenizer()
+    detector_factory()
+
+def init_worker(languages: Iterable[str] = ("en",)) -> None:
+    """
+    Process pool initializer: load the NLP models and warm analyzers for the
+    most common languages.
+    """
+    warm_up()
+    for language in languages:
+        get_analyzer(language)
+        get_stopwords(language)
+
+def get_analyzer(language: str) -> ContentAnalyzer:
+    """Return this process's ContentAnalyzer for a language, creating it once."""
+    analyzer = _analyzers.get(language)
+    if analyzer is None:
+        logger.info(f"Initializing ContentAnalyzer for language: {language}")
+        analyzer = _analyzers[language] = ContentAnalyzer(language)
+    return analyzer
+
+def get_stopwords(language: str) -> set:
+    """Return this process's stopword set for a language, loading it once."""
+    stopwords = _stopwords.get(language)
+    if stopwords is None:
+        stopwords = _stopwords[language] = load_stopwords(language)
+    return stopwords
+
+def analyze_text(
+        text: str,
+        word_or_phrase: Optional[str],
+        language: Optional[str] = None,
+        declared: Optional[str] = None,
+        fast_path: bool = LANGUAGE_FAST_PATH
+    ) -> Dict[str, Any]:
+    """
+    Analyze text with the worker's cached analyzer and stopwords. Without a
+    language, it is detected here (see language.detect_language).
+    """
+    if language is None:
+        language = detect_language(text[:LANGUAGE_SAMPLE_CHARS], declared, fast_path)
+    return analyze_text_content(
+        text,
+        word_or_phrase,
+        language,
+        get_analyzer(language),
+        get_stopwords(language)
+    )
+
+def analyze_text_ngrams(
+        text: str,
+        word_or_phrase: Optional[str],
+        language: Optional[str] = None,
+        declared: Optional[str] = None,
+        fast_path: bool = LANGUAGE_FAST_PATH
+    ) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Analyze text as analyze_text does and also return its keyword n-gram
+    counts, so the parent can rank keywords against corpus statistics only it
+    holds.
+    """
+    if language is None:
+        language = detect_language(text[:LANGUAGE_SAMPLE_CHARS], declared, fast_path)
+    result, profile = analyze_text_profile(
+        text,
+        word_or_phrase,
+        language,
+        get_analyzer(language),
+        get_stopwords(language)
+    )
+    return result, profile.ngram_counts
+
+def resolve_language(
+        sample: str,
+        declared: Optional[str] = None,
+        fast_path: bool = LANGUAGE_FAST_PATH
+    ) -> Tuple[str, ContentAnalyzer, set]:
+    """Detect a text's language from its sample and return the worker's analyzer and stopwords for it."""
+    language = detect_language(sample, declared, fast_path)
+    return language, get_analyzer(language), get_stopwords(language)
+
+def analyze_pdf(
+        content: Union[bytes, Path],
+        ngrams: bool = False,
+        fast_path: bool = LANGUAGE_FAST_PATH,
+        keep_text: bool = False,
+        phrases: Iterable[str] = ()
+    ) -> Tuple[PdfMetadata, Dict[str, Any], Optional[Dict[str, int]], Optional[bytes], Dict[str, int]]:
+    """
+    Extract and analyze a PDF page by page inside a worker process; only the
+    results (with keep_text, also the compressed text) cross the process
+    boundary. With ngrams, the keyword n-gram counts are returned too (see
+    analyze_text_ngrams); `phrases` are counted as the pages are read.
+    """
+    metadata, result, profile, compressed_text, phrase_counts = analyze_pdf_pages(
+        content, None, partial(resolve_language, fast_path=fast_path), keep_text=keep_text, phrases=phrases
+    )
+    ngram_counts = profile.ngram_counts if ngrams and profile is not None else None
+    return metadata, result, ngram_counts, compressed_text, phrase_counts